@@ -0,0 +1 @@
+"""性能基准和测试替身(不随程序发布)"""
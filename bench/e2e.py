@@ -0,0 +1,294 @@
+"""端到端基准：在本地NCM替身上无界面驱动搜索、播放、切歌和拖动，统计耗时和请求数并与基线比较
+
+python -m bench.e2e                        # 默认lan网络条件，与bench/baselines/e2e-lan.json比较
+python -m bench.e2e --net wan --rounds 5   # 模拟公网延迟和带宽
+python -m bench.e2e --update-baseline      # 以本次结果作为新基线
+
+有指标超过基线(耗时超出容差或请求数变多)时退出码为1，便于在CI中拦截回归；没有基线时退出码为2。
+基线要在装有真实音频后端的机器上生成，无音频设备的替身环境测出的播放和拖动耗时没有参考价值。
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+from bench.ncm_stub import NcmStub, StubConfig
+
+# 网络条件预设(传给StubConfig)
+NETWORKS = {
+    "lan": {"latency_ms": 2},
+    "wan": {"latency_ms": 80, "jitter_ms": 40, "bandwidth_kbps": 1024},
+    "flaky": {"latency_ms": 150, "jitter_ms": 150, "bandwidth_kbps": 256, "error_rate": 0.05,
+              "error_paths": ["/search", "/song/detail", "/cover"]},
+}
+KEYWORDS = ["晴天", "Night", "回声", "海星", "Loopback", "梦"]
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+
+
+def summarize(samples):
+    """一组耗时(毫秒)的统计"""
+    from main import percentile
+    samples = sorted(samples)
+    return {
+        "n": len(samples),
+        "p50_ms": round(percentile(samples, 0.5), 1),
+        "p95_ms": round(percentile(samples, 0.95), 1),
+        "max_ms": round(max(samples), 1) if samples else 0.0,
+    }
+
+
+class Driver:
+    """创建主窗口并驱动各个流程，等待时持续处理事件"""
+    def __init__(self, app, player, stub, timeout):
+        self.app = app
+        self.player = player
+        self.stub = stub
+        self.timeout = timeout
+
+    def wait_until(self, predicate, timeout=None):
+        """处理事件直到predicate()为真，返回耗时(毫秒)；超时返回None"""
+        from PySide6.QtCore import QEventLoop
+        started = time.perf_counter()
+        deadline = started + (timeout or self.timeout)
+        while not predicate():
+            if time.perf_counter() > deadline:
+                return None
+            self.app.processEvents(QEventLoop.AllEvents, 5)
+            time.sleep(0.001)
+        return (time.perf_counter() - started) * 1000
+
+    def requests_during(self, action):
+        """执行action并返回(结果, 期间的请求数)"""
+        before = self.stub.counters()["requests"]
+        result = action()
+        after = self.stub.counters()["requests"]
+        return result, {path: count - before.get(path, 0) for path, count in after.items() if count != before.get(path, 0)}
+
+    def startup(self):
+        """显示窗口直到首帧后的初始化完成"""
+        started = time.perf_counter()
+        self.player.show()
+        self.wait_until(lambda: self.player.media_player is not None)
+        return (time.perf_counter() - started) * 1000
+
+    def search(self, keyword):
+        """从回车到结果窗口显示出结果"""
+        player = self.player
+        if player.search_window:
+            player.search_window.hide()
+            player.search_window.model.clear()
+        started = time.perf_counter()
+        player.search_input.setText(keyword)
+        player.search_and_play()
+        window_ready = lambda: (player.search_window is not None and player.search_window.isVisible()
+                                and player.search_window.model.rowCount() > 0)
+        if self.wait_until(window_ready) is None:
+            return None
+        return (time.perf_counter() - started) * 1000
+
+    def last_play(self, since):
+        """since之后完成的最近一次播放追踪(outcome, 毫秒)"""
+        from main import METRICS
+        origin_us = (since - METRICS.origin) * 1e6
+        with METRICS.lock:
+            plays = [e for e in METRICS.events if e["name"] == "play" and e["ts"] >= origin_us]
+        if not plays:
+            return None, None
+        return plays[-1]["args"].get("outcome"), plays[-1]["dur"] / 1000
+
+    def play(self, start):
+        """从触发播放到第一次出声(PlayTrace)"""
+        since = time.perf_counter()
+        start()
+        if self.wait_until(lambda: self.player.play_trace is None or self.player.play_trace.finished) is None:
+            self.player.engine.finish_play_trace("timeout")
+        return self.last_play(since)
+
+    def play_first_result(self):
+        window = self.player.search_window
+        window.list_view.setCurrentIndex(window.model.index(0))
+        return self.play(window.on_play)
+
+    def skip(self):
+        return self.play(self.player.engine.play_next)
+
+    def seek(self, fraction):
+        """拖动到指定比例，直到播放器报告的位置到达目标附近"""
+        media_player = self.player.media_player
+        duration = media_player.duration()
+        if duration <= 0:
+            return None
+        target = int(duration * fraction)
+        started = time.perf_counter()
+        media_player.setPosition(target)
+        if self.wait_until(lambda: abs(media_player.position() - target) < 1000) is None:
+            return None
+        return (time.perf_counter() - started) * 1000
+
+
+def run(args):
+    from PySide6.QtWidgets import QApplication
+    import main
+
+    config = StubConfig(**NETWORKS[args.net], url_ttl=args.url_ttl, seed=args.seed)
+    stub = NcmStub(config).start()
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    app.setStyleSheet(main.APP_STYLESHEET)
+    options, _ = main.parse_args(["--api-url", stub.url])
+    player = main.ModernMusicPlayer(options)
+    player.show_message = lambda text, msg_type="info": print(f"  [{msg_type}] {text}")
+    driver = Driver(app, player, stub, args.timeout)
+
+    samples = {"search": [], "play": [], "skip": [], "seek": []}
+    requests = {name: {} for name in samples}
+    outcomes = {}
+    failures = []
+
+    def count(flow, counts):
+        for path, n in counts.items():
+            requests[flow][path] = requests[flow].get(path, 0) + n
+
+    startup_ms = driver.startup()
+    for round_index in range(args.rounds):
+        keyword = KEYWORDS[round_index % len(KEYWORDS)]
+        elapsed, counts = driver.requests_during(lambda: driver.search(keyword))
+        count("search", counts)
+        if elapsed is None:
+            failures.append(f"search {keyword}: 超时")
+            continue
+        samples["search"].append(elapsed)
+
+        (outcome, elapsed), counts = driver.requests_during(driver.play_first_result)
+        count("play", counts)
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+        if outcome == "first_audio":
+            samples["play"].append(elapsed)
+        else:
+            failures.append(f"play {keyword}: {outcome}")
+
+        for _ in range(args.skips):
+            (outcome, elapsed), counts = driver.requests_during(driver.skip)
+            count("skip", counts)
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+            if outcome == "first_audio":
+                samples["skip"].append(elapsed)
+            else:
+                failures.append(f"skip {keyword}: {outcome}")
+
+        for fraction in (0.25, 0.75, 0.5):
+            elapsed, counts = driver.requests_during(lambda: driver.seek(fraction))
+            count("seek", counts)
+            if elapsed is None:
+                failures.append(f"seek {fraction}: 超时")
+            else:
+                samples["seek"].append(elapsed)
+
+    player.close()
+    app.processEvents()
+    totals = stub.counters()
+    stub.stop()
+
+    flows = {}
+    for name, values in samples.items():
+        flows[name] = summarize(values)
+        flows[name]["requests"] = requests[name]
+    return {
+        "net": args.net,
+        "rounds": args.rounds,
+        "startup_ms": round(startup_ms, 1),
+        "flows": flows,
+        "outcomes": outcomes,
+        "requests_total": totals["requests"],
+        "errors_injected": totals["errors"],
+        "bytes": totals["bytes"],
+        "failures": failures,
+    }
+
+
+def compare(result, baseline, tolerance, slack_ms):
+    """与基线比较，返回回归列表；耗时允许tolerance比例加slack_ms的波动，请求数允许tolerance比例"""
+    regressions = []
+    for flow, stats in result["flows"].items():
+        base = baseline.get("flows", {}).get(flow)
+        if not base:
+            continue
+        for key in ("p50_ms", "p95_ms"):
+            limit = base[key] * (1 + tolerance) + slack_ms
+            if stats[key] > limit:
+                regressions.append(f"{flow}.{key}: {stats[key]} > {limit:.1f} (基线 {base[key]})")
+    # 请求数按整次运行的每轮平均比较：后台封面、详情补全可能落在相邻流程里，按流程比较会误报
+    for path, n in result["requests_total"].items():
+        per_round = n / result["rounds"]
+        base_per_round = baseline.get("requests_total", {}).get(path, 0) / baseline["rounds"]
+        if per_round > base_per_round * (1 + tolerance):
+            regressions.append(f"requests[{path}]: 每轮 {per_round:g} > {base_per_round:g}")
+    return regressions
+
+
+def report(result):
+    print(f"网络: {result['net']}  轮数: {result['rounds']}  启动: {result['startup_ms']} ms")
+    print(f"{'流程':<8}{'次数':>6}{'p50':>10}{'p95':>10}{'max':>10}  请求")
+    for flow, stats in result["flows"].items():
+        requests = ", ".join(f"{path}×{n}" for path, n in sorted(stats["requests"].items()))
+        print(f"{flow:<10}{stats['n']:>6}{stats['p50_ms']:>10}{stats['p95_ms']:>10}{stats['max_ms']:>10}  {requests}")
+    print(f"播放结果: {result['outcomes']}  流量: {result['bytes'] / 1024:.0f} KB")
+    for failure in result["failures"]:
+        print(f"  失败: {failure}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="bench.e2e", description="RTLite端到端延迟基准")
+    parser.add_argument("--net", choices=sorted(NETWORKS), default="lan", help="网络条件预设")
+    parser.add_argument("--rounds", type=int, default=3, help="搜索-播放-切歌-拖动的轮数")
+    parser.add_argument("--skips", type=int, default=2, help="每轮切歌次数")
+    parser.add_argument("--url-ttl", type=int, default=1200, help="替身返回的播放链接有效期(秒)")
+    parser.add_argument("--warmup", action="store_true", help="保留后台预热(请求数会随时序波动)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=15, help="单步等待上限(秒)")
+    parser.add_argument("--baseline", help="基线文件(默认bench/baselines/e2e-<net>.json)")
+    parser.add_argument("--update-baseline", action="store_true", help="以本次结果覆盖基线")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="耗时允许超出基线的比例")
+    parser.add_argument("--slack-ms", type=float, default=20, help="耗时允许的绝对波动(毫秒)")
+    parser.add_argument("--json", metavar="FILE", help="结果另存为JSON")
+    args = parser.parse_args(argv)
+
+    baseline_path = args.baseline or os.path.join(BASELINE_DIR, f"e2e-{args.net}.json")
+    if not args.update_baseline and not os.path.exists(baseline_path):
+        print(f"没有基线({baseline_path})：先在装有音频后端的机器上用--update-baseline生成", file=sys.stderr)
+        return 2
+
+    # 独立的数据目录(冷缓存，不影响真实设置)，无界面运行
+    os.environ["APPDATA"] = tempfile.mkdtemp(prefix="rtlite-bench-")
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    if not args.warmup:
+        # 默认关闭预热，让每个流程的请求数可重复
+        os.makedirs(os.path.join(os.environ["APPDATA"], "RTLite"))
+        with open(os.path.join(os.environ["APPDATA"], "RTLite", "settings.json"), "w", encoding="utf-8") as f:
+            json.dump({"warmup_enabled": False}, f)
+
+    result = run(args)
+    report(result)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(baseline_path), exist_ok=True)
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"基线已更新: {baseline_path}")
+        return 0
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare(result, baseline, args.tolerance, args.slack_ms)
+    for regression in regressions:
+        print(f"回归: {regression}")
+    if not regressions:
+        print("与基线相比没有回归")
+    return 1 if regressions or result["failures"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,391 @@
+"""本地NCM接口替身：提供main.py用到的接口和固定的测试数据，可配置延迟、带宽、错误注入和链接过期
+
+单独运行:  python -m bench.ncm_stub --port 3000 --latency 80 --bandwidth 512
+RTLite连接: python main.py --api-url http://127.0.0.1:3000
+"""
+import argparse
+import base64
+import io
+import json
+import math
+import random
+import re
+import struct
+import threading
+import time
+import wave
+import zlib
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+
+class StubConfig:
+    """替身服务器的行为参数(运行中可直接修改)"""
+    def __init__(self, latency_ms=0, jitter_ms=0, bandwidth_kbps=0, error_rate=0.0,
+                 error_paths=None, url_ttl=1200, songs=300, audio_seconds=20, lyric_lines=60, seed=1):
+        self.latency_ms = latency_ms            # 每个请求的固定延迟
+        self.jitter_ms = jitter_ms              # 额外的随机延迟(0~jitter)
+        self.bandwidth_kbps = bandwidth_kbps    # 响应体传输速率上限(KB/s，0为不限)
+        self.error_rate = error_rate            # 随机返回500的概率
+        self.error_paths = set(error_paths or ())  # 只对这些路径注入错误(空为全部接口)
+        self.url_ttl = url_ttl                  # /song/url返回链接的有效期(秒)
+        self.songs = songs                      # 曲库大小
+        self.audio_seconds = audio_seconds      # 每首歌音频时长
+        self.lyric_lines = lyric_lines          # 每首歌歌词行数
+        self.seed = seed
+
+
+def solid_png(width, height, rgb):
+    """生成纯色PNG(封面、二维码占位)"""
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+    row = b"\x00" + bytes(rgb) * width
+    return (b"\x89PNG\r\n\x1a\n"
+            + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(row * height))
+            + chunk(b"IEND", b""))
+
+
+def sine_wav(seconds, frequency, rate=8000):
+    """生成单声道16位正弦波WAV"""
+    frames = bytearray()
+    for i in range(int(seconds * rate)):
+        frames += struct.pack("<h", int(8000 * math.sin(2 * math.pi * frequency * i / rate)))
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes(bytes(frames))
+    return buffer.getvalue()
+
+
+class Catalog:
+    """固定的测试曲库：歌曲、歌词、封面和音频(音频按频率缓存，相同频率共享)"""
+    ARTISTS = ["测试歌手", "Stub Band", "回声", "Loopback"]
+    WORDS = ["晴天", "夜曲", "海", "星", "Rain", "Echo", "Night", "风", "Light", "梦"]
+
+    def __init__(self, config):
+        self.config = config
+        rng = random.Random(config.seed)
+        self.songs = {}
+        for i in range(config.songs):
+            song_id = 100000 + i
+            self.songs[song_id] = {
+                "id": song_id,
+                "name": f"{rng.choice(self.WORDS)}{rng.choice(self.WORDS)} {i}",
+                "artist": self.ARTISTS[i % len(self.ARTISTS)],
+                "album": f"专辑 {i // 10}",
+            }
+        self.audio = {}
+        self.covers = {}
+        self.lock = threading.Lock()
+
+    def detail(self, song_id, base_url):
+        song = self.songs.get(song_id)
+        if song is None:
+            return None
+        return {
+            "id": song_id, "name": song["name"],
+            "ar": [{"id": 1, "name": song["artist"]}],
+            "al": {"id": song_id // 10, "name": song["album"], "picUrl": f"{base_url}/cover/{song_id}.png"},
+            "dt": self.config.audio_seconds * 1000,
+        }
+
+    def search_result(self, song_id):
+        """/search接口的歌曲格式(artists/duration，与详情不同)"""
+        song = self.songs[song_id]
+        return {
+            "id": song_id, "name": song["name"],
+            "artists": [{"id": 1, "name": song["artist"]}],
+            "album": {"id": song_id // 10, "name": song["album"]},
+            "duration": self.config.audio_seconds * 1000,
+        }
+
+    def search(self, keywords, limit, offset):
+        keywords = keywords.strip().lower()
+        matches = [i for i, s in self.songs.items()
+                   if keywords in s["name"].lower() or keywords in s["artist"].lower()]
+        if not matches:
+            # 没有匹配时按关键字稳定地返回一批歌曲，保证每次搜索都有结果
+            ids = list(self.songs)
+            start = zlib.crc32(keywords.encode("utf-8")) % max(1, len(ids))
+            matches = (ids[start:] + ids[:start])[:limit * 3]
+        return [self.search_result(i) for i in matches[offset:offset + limit]], len(matches)
+
+    def lyric(self, song_id):
+        song = self.songs.get(song_id)
+        if song is None:
+            return "", ""
+        step = self.config.audio_seconds / max(1, self.config.lyric_lines)
+        lrc, tlrc = [], []
+        for n in range(self.config.lyric_lines):
+            t = n * step
+            stamp = f"[{int(t // 60):02d}:{t % 60:05.2f}]"
+            lrc.append(f"{stamp}{song['name']} 第{n + 1}句")
+            tlrc.append(f"{stamp}{song['name']} line {n + 1}")
+        return "\n".join(lrc), "\n".join(tlrc)
+
+    def audio_bytes(self, song_id):
+        frequency = 220 + (song_id % 12) * 20
+        with self.lock:
+            data = self.audio.get(frequency)
+            if data is None:
+                data = self.audio[frequency] = sine_wav(self.config.audio_seconds, frequency)
+        return data
+
+    def cover_bytes(self, song_id):
+        with self.lock:
+            data = self.covers.get(song_id)
+            if data is None:
+                rgb = ((song_id * 37) % 256, (song_id * 91) % 256, (song_id * 53) % 256)
+                data = self.covers[song_id] = solid_png(300, 300, rgb)
+        return data
+
+
+class NcmStub:
+    """在后台线程运行的替身HTTP服务器，统计每个接口的请求次数"""
+    def __init__(self, config=None, host="127.0.0.1", port=0):
+        self.config = config or StubConfig()
+        self.catalog = Catalog(self.config)
+        self.requests = Counter()
+        self.errors = Counter()
+        self.bytes_sent = 0
+        self.lock = threading.Lock()
+        self.qr_checks = Counter()
+        self.rng = random.Random(self.config.seed)
+        self.server = ThreadingHTTPServer((host, port), self._handler_class())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, name="ncm-stub", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def reset_counters(self):
+        with self.lock:
+            self.requests.clear()
+            self.errors.clear()
+            self.bytes_sent = 0
+
+    def counters(self):
+        """请求计数快照: {路径: 次数}，封面和音频按类别合并"""
+        with self.lock:
+            return {"requests": dict(self.requests), "errors": dict(self.errors), "bytes": self.bytes_sent}
+
+    def _route(self, path):
+        """统计用的路径名(/cover/123.png -> /cover)"""
+        match = re.match(r"^/(cover|audio)/", path)
+        return f"/{match.group(1)}" if match else path
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                stub.handle(self)
+
+        return Handler
+
+    def _delay(self):
+        config = self.config
+        delay = config.latency_ms + (self.rng.uniform(0, config.jitter_ms) if config.jitter_ms else 0)
+        if delay:
+            time.sleep(delay / 1000)
+
+    def _send(self, handler, status, body, content_type, extra_headers=None):
+        handler.send_response(status)
+        handler.send_header("Content-Type", content_type)
+        handler.send_header("Content-Length", str(len(body)))
+        for key, value in (extra_headers or {}).items():
+            handler.send_header(key, value)
+        handler.end_headers()
+        rate = self.config.bandwidth_kbps * 1024
+        chunk_size = 16 * 1024
+        try:
+            for start in range(0, len(body), chunk_size):
+                chunk = body[start:start + chunk_size]
+                handler.wfile.write(chunk)
+                if rate:
+                    time.sleep(len(chunk) / rate)
+        except (BrokenPipeError, ConnectionResetError):
+            return  # 客户端已放弃(切歌、取消下载)
+        with self.lock:
+            self.bytes_sent += len(body)
+
+    def _json(self, handler, data, status=200):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self._send(handler, status, body, "application/json; charset=utf-8")
+
+    def handle(self, handler):
+        parsed = urlparse(handler.path)
+        path = parsed.path
+        query = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+        route = self._route(path)
+        with self.lock:
+            self.requests[route] += 1
+        self._delay()
+
+        config = self.config
+        if config.error_rate and (not config.error_paths or route in config.error_paths) \
+                and self.rng.random() < config.error_rate:
+            with self.lock:
+                self.errors[route] += 1
+            self._json(handler, {"code": 500, "msg": "injected error"}, status=500)
+            return
+
+        try:
+            if route == "/audio":
+                self._audio(handler, path, query)
+            elif route == "/cover":
+                song_id = int(re.findall(r"\d+", path)[0])
+                self._send(handler, 200, self.catalog.cover_bytes(song_id), "image/png")
+            else:
+                data = self._api(path, query, handler.headers.get("Cookie", ""))
+                self._json(handler, data, status=200 if data.get("code") != 404 else 404)
+        except (ValueError, KeyError, IndexError) as e:
+            self._json(handler, {"code": 400, "msg": str(e)}, status=400)
+
+    def _audio(self, handler, path, query):
+        """音频文件，链接过期返回403；支持Range(播放器拖动和续传)"""
+        if float(query.get("expires", "inf")) < time.time():
+            with self.lock:
+                self.errors["/audio expired"] += 1
+            self._send(handler, 403, b"url expired", "text/plain")
+            return
+        song_id = int(re.findall(r"\d+", path)[0])
+        data = self.catalog.audio_bytes(song_id)
+        headers = {"Accept-Ranges": "bytes"}
+        match = re.match(r"bytes=(\d*)-(\d*)", handler.headers.get("Range", ""))
+        if match and (match.group(1) or match.group(2)):
+            if match.group(1):
+                start = int(match.group(1))
+                end = int(match.group(2)) if match.group(2) else len(data) - 1
+            else:
+                start, end = len(data) - int(match.group(2)), len(data) - 1
+            end = min(end, len(data) - 1)
+            if start >= len(data):
+                self._send(handler, 416, b"", "audio/wav", {"Content-Range": f"bytes */{len(data)}"})
+                return
+            headers["Content-Range"] = f"bytes {start}-{end}/{len(data)}"
+            self._send(handler, 206, data[start:end + 1], "audio/wav", headers)
+        else:
+            self._send(handler, 200, data, "audio/wav", headers)
+
+    def _ids(self, query, key):
+        return [int(i) for i in re.split(r"[,\s]+", query.get(key, "").strip("[]")) if i]
+
+    def _api(self, path, query, cookie):
+        catalog = self.catalog
+        base = self.url
+        logged_in = "MUSIC_U=" in cookie
+
+        if path in ("/search", "/cloudsearch"):
+            limit = int(query.get("limit", 30))
+            offset = int(query.get("offset", 0))
+            songs, total = catalog.search(query.get("keywords", ""), limit, offset)
+            return {"code": 200, "result": {"songs": songs, "songCount": total}}
+        if path == "/song/detail":
+            songs = [d for d in (catalog.detail(i, base) for i in self._ids(query, "ids")) if d]
+            return {"code": 200, "songs": songs, "privileges": [{"id": s["id"], "st": 0} for s in songs]}
+        if path == "/song/url":
+            expires = time.time() + self.config.url_ttl
+            data = []
+            for song_id in self._ids(query, "id"):
+                if song_id in catalog.songs:
+                    size = len(catalog.audio_bytes(song_id))
+                    data.append({
+                        "id": song_id, "url": f"{base}/audio/{song_id}.wav?expires={expires:.0f}",
+                        "br": 128000, "size": size, "md5": None, "code": 200,
+                        "expi": self.config.url_ttl, "type": "wav",
+                    })
+                else:
+                    data.append({"id": song_id, "url": None, "code": 404})
+            return {"code": 200, "data": data}
+        if path == "/lyric":
+            lrc, tlrc = catalog.lyric(int(query["id"]))
+            return {"code": 200, "lrc": {"lyric": lrc}, "tlyric": {"lyric": tlrc}}
+        if path == "/login/qr/key":
+            return {"code": 200, "data": {"code": 200, "unikey": f"stub-{time.time_ns()}"}}
+        if path == "/login/qr/create":
+            qrimg = "data:image/png;base64," + base64.b64encode(solid_png(200, 200, (255, 255, 255))).decode()
+            return {"code": 200, "data": {"qrurl": f"{base}/qr?key={query.get('key')}", "qrimg": qrimg}}
+        if path == "/login/qr/check":
+            # 依次返回: 等待扫码 -> 待确认 -> 登录成功
+            key = query.get("key", "")
+            with self.lock:
+                self.qr_checks[key] += 1
+                step = self.qr_checks[key]
+            if step == 1:
+                return {"code": 801, "message": "等待扫码"}
+            if step == 2:
+                return {"code": 802, "message": "授权中"}
+            return {"code": 803, "message": "授权登陆成功", "cookie": "MUSIC_U=stub-user; NMTID=stub-nmtid"}
+        if path == "/user/account":
+            if not logged_in:
+                return {"code": 200, "account": None, "profile": None}
+            return {"code": 200, "account": {"id": 1}, "profile": {"userId": 1, "nickname": "替身用户"}}
+        if path == "/recommend/songs":
+            if not logged_in:
+                return {"code": 301, "msg": "需要登录"}
+            ids = list(catalog.songs)[:30]
+            return {"code": 200, "data": {"dailySongs": [catalog.detail(i, base) for i in ids]}}
+        if path == "/user/playlist":
+            return {"code": 200, "playlist": [
+                {"id": 900, "name": "替身歌单", "trackCount": len(catalog.songs), "coverImgUrl": f"{base}/cover/900.png"}
+            ]}
+        if path == "/playlist/detail":
+            return {"code": 200, "playlist": {"id": int(query["id"]), "name": "替身歌单",
+                                              "trackCount": len(catalog.songs), "trackUpdateTime": 1}}
+        if path == "/playlist/track/all":
+            limit = int(query.get("limit", 1000))
+            offset = int(query.get("offset", 0))
+            ids = list(catalog.songs)[offset:offset + limit]
+            return {"code": 200, "songs": [catalog.detail(i, base) for i in ids]}
+        return {"code": 404, "msg": f"stub未实现: {path}"}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="ncm_stub", description="本地NCM接口替身")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3000)
+    parser.add_argument("--latency", type=float, default=0, help="每个请求的延迟(毫秒)")
+    parser.add_argument("--jitter", type=float, default=0, help="额外随机延迟上限(毫秒)")
+    parser.add_argument("--bandwidth", type=float, default=0, help="传输速率上限(KB/s，0为不限)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="随机返回500的概率(0~1)")
+    parser.add_argument("--error-path", action="append", default=[], help="只对该路径注入错误(可重复)")
+    parser.add_argument("--url-ttl", type=int, default=1200, help="播放链接有效期(秒)")
+    parser.add_argument("--songs", type=int, default=300, help="曲库大小")
+    args = parser.parse_args(argv)
+
+    config = StubConfig(args.latency, args.jitter, args.bandwidth, args.error_rate,
+                        args.error_path, args.url_ttl, args.songs)
+    stub = NcmStub(config, args.host, args.port)
+    print(f"NCM替身已启动: {stub.url}  (Ctrl+C退出)")
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stub.server.server_close()
+        print(json.dumps(stub.counters(), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
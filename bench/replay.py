@@ -0,0 +1,331 @@
+"""会话回放：按录制文件(main.py --record FILE)无界面重放用户操作，接口响应取自录制内容，
+测量界面卡顿、各操作的延迟和内存
+
+python -m bench.replay session.rtrace              # 按录制时的节奏回放(接口也按录制时的耗时返回)
+python -m bench.replay session.rtrace --speed 10   # 加速10倍
+python -m bench.replay session.rtrace --speed 0    # 不等待，操作一个接一个执行
+python -m bench.replay session.rtrace --json out.json
+
+播放链接一律替换为本地生成的静音WAV，回放不需要网络，也不受链接过期影响。
+"""
+import argparse
+import base64
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import wave
+from collections import Counter, defaultdict
+
+from bench.ui import peak_rss_kb
+
+
+def silent_wav(path, seconds, rate=8000):
+    """生成单声道8位静音WAV(回放时所有歌曲共用)"""
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(1)
+        f.setframerate(rate)
+        f.writeframes(b"\x80" * int(seconds * rate))
+
+
+class ReplayTransport:
+    """ApiClient.transport：按(路径, 参数)依次返回录制的响应，并按录制时的网络耗时/speed延迟"""
+    def __init__(self, trace, speed, audio_url):
+        self.speed = speed
+        self.audio_url = audio_url
+        self.lock = threading.Lock()
+        self.responses = defaultdict(list)  # (路径, 参数) -> [(响应, 毫秒)]
+        self.cursor = Counter()
+        self.details = {}                    # 歌曲ID -> 详情
+        self.blobs = {}                      # url -> (数据, 毫秒)
+        self.misses = Counter()
+        payloads = trace["payloads"]
+        for event in trace["events"]:
+            if event["type"] == "json":
+                data = payloads[event["data"]]
+                if event["path"] == "/song/detail":
+                    for song in data.get("songs", []):
+                        self.details[str(song.get("id"))] = song
+                self.responses[self.key(event["path"], event["params"])].append((data, event["ms"]))
+            elif event["type"] == "bytes":
+                self.blobs[event["url"]] = (base64.b64decode(trace["blobs"][event["data"]]), event["ms"])
+
+    @staticmethod
+    def key(path, params):
+        return path, tuple(sorted((k, str(v)) for k, v in (params or {}).items() if k != "timestamp"))
+
+    def _delay(self, ms):
+        if ms and self.speed:
+            time.sleep(ms / 1000 / self.speed)
+
+    def get_json(self, path, params):
+        params = params or {}
+        if path == "/song/url":
+            # 录制的链接早已过期，统一指向本地音频
+            ids = str(params.get("id", "")).split(",")
+            return {"code": 200, "data": [{"id": i, "url": self.audio_url, "expi": 1200} for i in ids]}
+        if path == "/song/detail":
+            # 回放时缓存是空的，批量请求的分组可能和录制时不同，按ID重新组合
+            ids = str(params.get("ids", "")).split(",")
+            songs = [self.details[i] for i in ids if i in self.details]
+            if len(songs) < len(ids):
+                with self.lock:
+                    self.misses["/song/detail"] += len(ids) - len(songs)
+            return {"code": 200, "songs": songs}
+        key = self.key(path, params)
+        with self.lock:
+            recorded = self.responses.get(key)
+            if not recorded:
+                self.misses[path] += 1
+                return {"code": 404, "msg": "录制中没有该响应"}
+            index = min(self.cursor[key], len(recorded) - 1)
+            self.cursor[key] += 1
+        data, ms = recorded[index]
+        self._delay(ms)
+        return data
+
+    def get_bytes(self, url):
+        data, ms = self.blobs.get(url, (b"", None))
+        if not data:
+            with self.lock:
+                self.misses["bytes"] += 1
+        self._delay(ms)
+        return data
+
+
+class Replayer:
+    """在GUI线程中按时间表执行操作；等待期间处理事件并检查尚未完成的异步操作"""
+    def __init__(self, app, player, speed, timeout):
+        self.app = app
+        self.player = player
+        self.speed = speed
+        self.timeout = timeout
+        self.pending = []                 # [(操作名, 开始时间, 完成条件)]
+        self.latencies = defaultdict(list)  # 操作名 -> [毫秒]
+        self.timeouts = Counter()
+        self.skipped = Counter()
+
+    def pump(self, until):
+        """处理事件直到until(perf_counter时间)，期间记录完成的异步操作"""
+        from PySide6.QtCore import QEventLoop
+        while True:
+            self.app.processEvents(QEventLoop.AllEvents, 5)
+            self.check_pending()
+            if time.perf_counter() >= until:
+                return
+            time.sleep(0.001)
+
+    def check_pending(self):
+        now = time.perf_counter()
+        still_pending = []
+        for name, started, done in self.pending:
+            if done():
+                self.latencies[name].append((time.perf_counter() - started) * 1000)
+            elif now - started > self.timeout:
+                self.timeouts[name] += 1
+            else:
+                still_pending.append((name, started, done))
+        self.pending = still_pending
+
+    def drain(self):
+        """等待所有异步操作完成或超时"""
+        deadline = time.perf_counter() + self.timeout
+        while self.pending and time.perf_counter() < deadline:
+            self.pump(time.perf_counter() + 0.01)
+        for name, _, _ in self.pending:
+            self.timeouts[name] += 1
+        self.pending = []
+
+    def results_shown(self):
+        """结果窗口显示了新的列表(reset会替换model.songs)"""
+        window = self.player.search_window
+        before = window.model.songs if window else None
+        def done():
+            current = self.player.search_window
+            return (current is not None and current.isVisible() and current.model.rowCount() > 0
+                    and current.model.songs is not before)
+        return done
+
+    def play_finished(self):
+        return lambda: self.player.play_trace is None or self.player.play_trace.finished
+
+    def apply(self, name, args):
+        """执行一个录制的操作，返回完成条件(None表示同步操作)"""
+        player = self.player
+        window = player.search_window
+        if name == "search":
+            done = self.results_shown()
+            player.lyric_mode_button.setChecked(args.get("lyric_mode", False))
+            player.search_input.setText(args.get("keyword", ""))
+            player.search_and_play()
+            return done
+        if name in ("select_result", "play_result"):
+            if window is None or args["row"] >= window.model.rowCount():
+                return False
+            window.list_view.setCurrentIndex(window.model.index(args["row"]))
+            if name == "select_result":
+                return None
+            window.on_play()
+            return self.play_finished()
+        if name == "play_history":
+            player.engine.play_queue([args["song"]], 0)
+            return self.play_finished()
+        if name == "close_results":
+            if window is not None:
+                window.close()
+            return None
+        if name == "toggle_play":
+            player.toggle_play_pause()
+            return None
+        if name == "volume":
+            player.volume_slider.setValue(args["value"])
+            return None
+        if name == "seek":
+            if player.media_player is None or player.media_player.duration() <= 0:
+                return False
+            player.progress_slider.setValue(args["position"])
+            player.on_slider_released()
+            return None
+        if name == "toggle_visibility":
+            player.toggle_visibility()
+            return None
+        return False
+
+    def run(self, actions):
+        started = time.perf_counter()
+        for event in actions:
+            if self.speed:
+                self.pump(started + event["t"] / 1000 / self.speed)
+            else:
+                self.pump(time.perf_counter())
+            name = event["name"]
+            if name in ("select_result", "play_result") and any(p[0] == "search" for p in self.pending):
+                # 加速回放时结果可能还没到，操作结果列表前先等搜索完成
+                deadline = time.perf_counter() + self.timeout
+                while any(p[0] == "search" for p in self.pending) and time.perf_counter() < deadline:
+                    self.pump(time.perf_counter() + 0.005)
+            t0 = time.perf_counter()
+            done = self.apply(name, event.get("args", {}))
+            if done is False:
+                self.skipped[name] += 1
+                continue
+            # 同步部分(处理函数本身)的耗时单独统计
+            self.latencies[f"{name}.sync"].append((time.perf_counter() - t0) * 1000)
+            if done is not None:
+                self.pending.append((name, t0, done))
+        self.drain()
+        return (time.perf_counter() - started) * 1000
+
+
+def summarize(samples):
+    from main import percentile
+    samples = sorted(samples)
+    return {
+        "n": len(samples),
+        "p50_ms": round(percentile(samples, 0.5), 1),
+        "p95_ms": round(percentile(samples, 0.95), 1),
+        "max_ms": round(samples[-1], 1) if samples else 0.0,
+    }
+
+
+def replay(args):
+    from PySide6.QtWidgets import QApplication
+    import main
+
+    trace = main.SessionRecorder.load(args.trace)
+    actions = [event for event in trace["events"] if event["type"] == "action"]
+    audio_path = os.path.join(os.environ["APPDATA"], "replay.wav")
+    silent_wav(audio_path, args.audio_seconds)
+    from PySide6.QtCore import QUrl
+    transport = ReplayTransport(trace, args.speed, QUrl.fromLocalFile(audio_path).toString())
+
+    if args.tracemalloc:
+        tracemalloc.start()
+    rss_before = peak_rss_kb()
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    app.setStyleSheet(main.APP_STYLESHEET)
+    player = main.ModernMusicPlayer()
+    player.api.transport = transport
+    player.show_message = lambda text, msg_type="info": print(f"  [{msg_type}] {text}")
+    if trace["meta"].get("logged_in"):
+        player.cookies = {"MUSIC_U": "replay", "NMTID": "replay"}
+    watchdog = main.StallWatchdog(args.stall_ms, log_path=os.path.join(os.environ["APPDATA"], "stalls.log"))
+
+    replayer = Replayer(app, player, args.speed, args.timeout)
+    player.show()
+    replayer.pump(time.perf_counter() + 0.2)  # 首帧和延后初始化
+    watchdog.start()
+    elapsed_ms = replayer.run(actions)
+    watchdog.stop()
+
+    result = {
+        "trace": os.path.basename(args.trace),
+        "speed": args.speed,
+        "actions": len(actions),
+        "recorded_ms": trace["duration_ms"],
+        "replay_ms": round(elapsed_ms, 1),
+        "latency": {name: summarize(values) for name, values in sorted(replayer.latencies.items())},
+        "timeouts": dict(replayer.timeouts),
+        "skipped": dict(replayer.skipped),
+        "stalls": {
+            "count": sum(watchdog.histogram),
+            "longest_ms": round(watchdog.longest, 1),
+            "histogram": dict(zip([f"<{b}" for b in watchdog.BUCKETS_MS] + [f">={watchdog.BUCKETS_MS[-1]}"],
+                                  watchdog.histogram)),
+        },
+        "memory": {"peak_rss_kb": peak_rss_kb(), "peak_rss_before_kb": rss_before},
+        "missing_responses": dict(transport.misses),
+    }
+    if args.tracemalloc:
+        current, peak = tracemalloc.get_traced_memory()
+        result["memory"].update({"python_current_kb": current // 1024, "python_peak_kb": peak // 1024})
+        tracemalloc.stop()
+    player.close()
+    app.processEvents()
+    return result
+
+
+def report(result):
+    print(f"回放 {result['trace']}: {result['actions']}个操作，速度 {result['speed'] or '不等待'}，"
+          f"录制 {result['recorded_ms'] / 1000:.1f} s，回放 {result['replay_ms'] / 1000:.1f} s")
+    print(f"{'操作':<24}{'次数':>6}{'p50':>10}{'p95':>10}{'max':>10}")
+    for name, stats in result["latency"].items():
+        print(f"{name:<26}{stats['n']:>6}{stats['p50_ms']:>10}{stats['p95_ms']:>10}{stats['max_ms']:>10}")
+    stalls = result["stalls"]
+    print(f"界面卡顿 {stalls['count']} 次，最长 {stalls['longest_ms']} ms  峰值RSS {result['memory']['peak_rss_kb']} KB")
+    if result["timeouts"]:
+        print(f"超时: {result['timeouts']}")
+    if result["skipped"]:
+        print(f"无法回放(界面状态不同): {result['skipped']}")
+    if result["missing_responses"]:
+        print(f"录制中缺少的响应: {result['missing_responses']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="bench.replay", description="RTLite会话回放")
+    parser.add_argument("trace", help="main.py --record生成的录制文件")
+    parser.add_argument("--speed", type=float, default=1.0, help="回放速度倍数(0为不等待)")
+    parser.add_argument("--stall-ms", type=float, default=100, help="超过多少毫秒算界面卡顿")
+    parser.add_argument("--timeout", type=float, default=15, help="异步操作(搜索、播放)的等待上限(秒)")
+    parser.add_argument("--audio-seconds", type=int, default=600, help="替代音频的时长")
+    parser.add_argument("--tracemalloc", action="store_true", help="同时统计Python内存(会拖慢回放)")
+    parser.add_argument("--json", metavar="FILE", help="结果另存为JSON")
+    args = parser.parse_args(argv)
+
+    os.environ["APPDATA"] = tempfile.mkdtemp(prefix="rtlite-replay-")
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+    result = replay(args)
+    report(result)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
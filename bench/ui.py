@@ -0,0 +1,428 @@
+"""界面热点路径的微基准(offscreen运行)：每次操作耗时、Python内存分配和峰值RSS，输出JSON
+
+python -m bench.ui                          # 全部基准，每个在独立进程中运行(峰值RSS互不影响)
+python -m bench.ui --only lyrics --inline   # 名称包含lyrics的基准，在当前进程中运行
+python -m bench.ui --json results.json      # 结果写入文件(默认输出到标准输出)
+
+内存分配用tracemalloc单独测一轮(只统计Python对象，Qt的C++内存体现在RSS中)，不影响计时。
+"""
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    """注册基准：被装饰的函数接收上下文，返回每次调用执行一次操作的函数"""
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+def peak_rss_kb():
+    """进程峰值RSS(KB)，平台不支持时返回None"""
+    try:
+        import resource
+    except ImportError:
+        return windows_peak_rss_kb()
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def windows_peak_rss_kb():
+    try:
+        import ctypes
+        from ctypes import wintypes
+
+        class Counters(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                        ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                        ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                        ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+        counters = Counters()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return counters.PeakWorkingSetSize // 1024
+    except Exception:
+        pass
+    return None
+
+
+class FixedMedia:
+    """固定时长、始终在播放的播放器替身：只测界面路径，不加载多媒体后端"""
+    StoppedState, PlayingState, PausedState = 0, 1, 2
+
+    def __init__(self, duration):
+        self._duration = duration
+
+    def duration(self):
+        return self._duration
+
+    def playbackState(self):
+        return self.PlayingState
+
+
+class LocalApi:
+    """只返回内存数据的API替身，封面加载不经过网络和磁盘缓存"""
+    def __init__(self, cover_bytes):
+        self.cover_bytes = cover_bytes
+
+    def song_detail(self, song_id, gate=None):
+        return {"id": song_id, "al": {"picUrl": f"local://{song_id}"}}
+
+    def get_bytes(self, url, gate=None):
+        return self.cover_bytes
+
+
+class PcmBuffer:
+    """QAudioBuffer的替身：只提供constData()"""
+    def __init__(self, data):
+        self.data = data
+
+    def constData(self):
+        return self.data
+
+
+class Collector:
+    """代替UiDispatcher收集工作线程的结果"""
+    def __init__(self):
+        self.posted = 0
+
+    def post(self, key, func, *args):
+        self.posted += 1
+
+
+# 不可达的接口地址：基准不访问真实服务，意外发出的请求也会立即失败
+OFFLINE_API_URL = "http://127.0.0.1:9"
+
+
+class Context:
+    """各基准共用的应用、主窗口和测试数据"""
+    def __init__(self):
+        from PySide6.QtWidgets import QApplication
+        import main
+
+        self.main = main
+        self.app = QApplication.instance() or QApplication(sys.argv[:1])
+        self.app.setStyleSheet(main.APP_STYLESHEET)
+        self._player = None
+        self._covers = {}
+
+    @property
+    def player(self):
+        """显示出来的主窗口(跳过首帧后的初始化：不创建播放器、不启动热键和扫描)"""
+        if self._player is None:
+            player = self.main.ModernMusicPlayer(self.main.parse_args(["--api-url", OFFLINE_API_URL])[0])
+            player.first_frame_shown = True
+            player.media_player = FixedMedia(4 * 60 * 1000)
+            player.show()
+            self.settle()
+            self._player = player
+        return self._player
+
+    def close(self):
+        """关闭主窗口并处理完剩余事件，避免在解释器退出时才析构Qt对象"""
+        if self._player is not None:
+            self._player.close()
+            self._player.deleteLater()
+            self._player = None
+        self.app.sendPostedEvents()
+        self.settle()
+
+    def settle(self):
+        """处理完积压的事件(布局、绘制、分发器的批量更新)"""
+        for _ in range(3):
+            self.app.processEvents()
+
+    def cover(self, size, fmt="JPG"):
+        """size×size的渐变封面图片数据"""
+        key = (size, fmt)
+        if key not in self._covers:
+            from PySide6.QtCore import QBuffer, QByteArray, QIODevice
+            from PySide6.QtGui import QColor, QImage, QLinearGradient, QPainter
+
+            image = QImage(size, size, QImage.Format_RGB32)
+            painter = QPainter(image)
+            gradient = QLinearGradient(0, 0, size, size)
+            gradient.setColorAt(0, QColor(200, 80, 40))
+            gradient.setColorAt(1, QColor(30, 60, 180))
+            painter.fillRect(image.rect(), gradient)
+            painter.end()
+            data = QByteArray()
+            buffer = QBuffer(data)
+            buffer.open(QIODevice.WriteOnly)
+            image.save(buffer, fmt, 90)
+            self._covers[key] = bytes(data)
+        return self._covers[key]
+
+    @staticmethod
+    def songs(count):
+        """搜索结果格式的歌曲列表"""
+        return [{
+            "id": 200000 + i, "name": f"基准歌曲 {i}",
+            "ar": [{"name": f"歌手 {i % 17}"}], "al": {"name": f"专辑 {i // 12}", "picUrl": f"local://{i}"},
+            "dt": 200000 + i,
+        } for i in range(count)]
+
+    @staticmethod
+    def lyrics(count, step=2.0):
+        return [(i * step, f"第{i + 1}句歌词 这是一行比较长的歌词用来测试排版 line {i + 1}") for i in range(count)]
+
+
+def construct_search_window(count):
+    def setup(ctx):
+        player = ctx.player
+        api = LocalApi(ctx.cover(120))
+        songs = ctx.songs(count)
+
+        def op():
+            window = ctx.main.SearchResultsWindow(player, api)
+            window.reset(songs)
+            window.show()
+            ctx.settle()
+            window.cover_loader.executor.shutdown(wait=True, cancel_futures=True)
+            window.hide()
+            window.deleteLater()
+            ctx.settle()
+        return op
+    return setup
+
+
+def reset_search_window(count):
+    def setup(ctx):
+        window = ctx.main.SearchResultsWindow(ctx.player, LocalApi(ctx.cover(120)))
+        window.show()
+        songs = ctx.songs(count)
+
+        def op():
+            window.reset(songs)
+            ctx.settle()
+        return op
+    return setup
+
+
+for _count in (30, 300, 3000):
+    benchmark(f"search_window.construct[{_count}]")(construct_search_window(_count))
+    benchmark(f"search_window.reset[{_count}]")(reset_search_window(_count))
+
+
+@benchmark("lyrics.update_display[2000]")
+def lyrics_update_display(ctx):
+    player = ctx.player
+    player.lyrics_data = ctx.lyrics(2000)
+    state = {"index": 0}
+
+    def op():
+        player.lyric_index = state["index"] = (state["index"] + 1) % len(player.lyrics_data)
+        player.update_lyrics_display()
+    return op
+
+
+@benchmark("position.on_position_changed[2000]")
+def position_changed(ctx):
+    """每次调用前进100ms(约为播放器的通知频率)，并执行合帧后的刷新"""
+    player = ctx.player
+    player.lyrics_data = ctx.lyrics(2000, step=0.12)
+    duration = player.media_player.duration()
+    player.on_duration_changed(duration)
+    state = {"position": 0}
+
+    def op():
+        state["position"] = (state["position"] + 100) % duration
+        player.on_position_changed(state["position"])
+        player.flush_progress()
+    return op
+
+
+@benchmark("main_window.paint")
+def main_window_paint(ctx):
+    player = ctx.player
+    return player.repaint
+
+
+@benchmark("main_window.paint_partial")
+def main_window_paint_partial(ctx):
+    from PySide6.QtCore import QRect
+    player = ctx.player
+    region = QRect(player.width() // 2, player.height() - 80, 120, 40)
+    return lambda: player.repaint(region)
+
+
+@benchmark("cover.decode_round[120]")
+def cover_decode_round(ctx):
+    """列表封面：解码缩略图并绘制圆角(工作线程中的CoverLoader._load)"""
+    loader = ctx.main.CoverLoader(LocalApi(ctx.cover(120)), Collector(), max_workers=1)
+    song = ctx.songs(1)[0]
+    return lambda: loader._load(song, loader.generation)
+
+
+@benchmark("cover.decode_disc[600]")
+def cover_decode_disc(ctx):
+    """主界面封面：解码大图并预渲染成旋转用的圆盘"""
+    from PySide6.QtGui import QImage
+    player = ctx.player
+    data = ctx.cover(600)
+    return lambda: player.set_cover_image(QImage.fromData(data))
+
+
+@benchmark("spectrum.frame[30fps]")
+def spectrum_frame(ctx):
+    """频谱一帧：写入一帧时长的音频(单声道float)、批量FFT并重绘叠加层"""
+    import numpy as np
+    view = ctx.player.spectrum_view
+    view.show()
+    view.prepare()
+    view.active = True  # 不接播放器，直接喂数据
+    view.clock.start()
+    rate = view.SAMPLE_RATE
+    t = np.arange(rate // view.fps) / rate
+    buffer = PcmBuffer((0.3 * np.sin(2 * np.pi * 440 * t) + 0.1 * np.sin(2 * np.pi * 3000 * t)).astype(np.float32).tobytes())
+
+    def op():
+        view.on_buffer(buffer)
+        view.advance()
+        view.repaint()
+    return op
+
+
+def measure(op, min_time, min_ops, alloc_ops):
+    """计时一轮，再用tracemalloc测一轮分配"""
+    for _ in range(3):
+        op()  # 预热(首次布局、字形缓存等)
+    gc.collect()
+
+    durations = []
+    started = time.perf_counter()
+    while len(durations) < min_ops or time.perf_counter() - started < min_time:
+        t0 = time.perf_counter()
+        op()
+        durations.append(time.perf_counter() - t0)
+    durations.sort()
+
+    gc.collect()
+    blocks_before = sys.getallocatedblocks()
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    current_before, _ = tracemalloc.get_traced_memory()
+    for _ in range(alloc_ops):
+        op()
+    current_after, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    gc.collect()
+    blocks_after = sys.getallocatedblocks()
+
+    from main import percentile
+    return {
+        "ops": len(durations),
+        "mean_us": round(sum(durations) / len(durations) * 1e6, 1),
+        "p50_us": round(percentile(durations, 0.5) * 1e6, 1),
+        "p95_us": round(percentile(durations, 0.95) * 1e6, 1),
+        "min_us": round(durations[0] * 1e6, 1),
+        "ops_per_s": round(len(durations) / sum(durations), 1),
+        "alloc_peak_kb": round((peak - current_before) / 1024, 1),
+        "alloc_retained_b_per_op": round((current_after - current_before) / alloc_ops, 1),
+        "blocks_retained_per_op": round((blocks_after - blocks_before) / alloc_ops, 2),
+    }
+
+
+def run_inline(names, args):
+    ctx = Context()
+    results = {}
+    try:
+        for name in names:
+            op = BENCHMARKS[name](ctx)
+            result = measure(op, args.min_time, args.min_ops, args.alloc_ops)
+            result["peak_rss_kb"] = peak_rss_kb()
+            results[name] = result
+            print(f"{name:<40}{result['p50_us']:>12.1f} us{result['alloc_peak_kb']:>10.1f} KB", file=sys.stderr)
+    finally:
+        ctx.close()
+    return results
+
+
+def run_isolated(names, args):
+    """每个基准一个子进程，峰值RSS只包含该基准"""
+    results = {}
+    for name in names:
+        fd, out_path = tempfile.mkstemp(suffix=".json")
+        os.close(fd)
+        command = [sys.executable, "-m", "bench.ui", "--inline", "--exact", name, "--json", out_path,
+                   "--min-time", str(args.min_time), "--min-ops", str(args.min_ops), "--alloc-ops", str(args.alloc_ops)]
+        # 程序本身会向标准输出打印日志，结果经由文件传回
+        output = subprocess.run(command, capture_output=True, text=True, encoding="utf-8", errors="replace",
+                                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        try:
+            with open(out_path, "r", encoding="utf-8") as f:
+                results.update(json.load(f)["results"])
+        except (OSError, ValueError):
+            results[name] = {"error": (output.stderr.strip().splitlines() or ["没有输出结果"])[-1]}
+            print(f"{name:<40} 失败", file=sys.stderr)
+            continue
+        finally:
+            os.remove(out_path)
+        result = results[name]
+        print(f"{name:<40}{result['p50_us']:>12.1f} us{result['alloc_peak_kb']:>10.1f} KB"
+              f"{result['peak_rss_kb'] or 0:>10} KB RSS", file=sys.stderr)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="bench.ui", description="RTLite界面微基准")
+    parser.add_argument("--only", action="append", default=[], help="只运行名称包含该字符串的基准(可重复)")
+    parser.add_argument("--exact", help=argparse.SUPPRESS)
+    parser.add_argument("--inline", action="store_true", help="所有基准在当前进程中运行")
+    parser.add_argument("--min-time", type=float, default=1.0, help="每个基准至少计时多少秒")
+    parser.add_argument("--min-ops", type=int, default=5, help="每个基准至少执行多少次")
+    parser.add_argument("--alloc-ops", type=int, default=5, help="统计内存分配时执行多少次")
+    parser.add_argument("--list", action="store_true", help="列出所有基准")
+    parser.add_argument("--json", metavar="FILE", help="结果写入文件(默认输出到标准输出)")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        print("\n".join(BENCHMARKS))
+        return 0
+    if args.exact:
+        names = [args.exact]
+    else:
+        names = [name for name in BENCHMARKS if not args.only or any(part in name for part in args.only)]
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    os.environ["APPDATA"] = os.environ.get("RTLITE_BENCH_DATA") or tempfile.mkdtemp(prefix="rtlite-bench-")
+    os.environ["RTLITE_BENCH_DATA"] = os.environ["APPDATA"]  # 子进程共用同一个数据目录
+    settings_path = os.path.join(os.environ["APPDATA"], "RTLite", "settings.json")
+    if not os.path.exists(settings_path):
+        # 关闭后台预热(与bench.e2e相同)，计时期间不会有工作线程发请求
+        os.makedirs(os.path.dirname(settings_path), exist_ok=True)
+        with open(settings_path, "w", encoding="utf-8") as f:
+            json.dump({"warmup_enabled": False}, f)
+
+    results = run_inline(names, args) if args.inline else run_isolated(names, args)
+    from PySide6 import __version__ as pyside_version
+    report = {
+        "python": sys.version.split()[0],
+        "pyside": pyside_version,
+        "platform": sys.platform,
+        "qpa": os.environ["QT_QPA_PLATFORM"],
+        "results": results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
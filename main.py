@@ -1,168 +1,3365 @@
 import sys
-import requests
-import keyboard
+import os
+import json
+import hashlib
+import html
+import importlib.util
+import math
+import mmap
+import argparse
 import base64
+import gzip
+import re
+import sqlite3
+import struct
+import tempfile
 import time
-from threading import Thread
+import traceback
+import threading
+from bisect import bisect_right, bisect_left
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from threading import Thread, Lock, Condition, get_ident
+
+# 启动计时起点(--startup-trace)
+STARTUP_BEGIN = time.perf_counter()
+
+try:
+    import mutagen  # 可选：读取本地音乐标签
+except ImportError:
+    mutagen = None
 
 from PySide6.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLineEdit, QPushButton, QInputDialog,
-    QLabel, QMessageBox, QSlider, QTextBrowser, QTextEdit, QFrame, QListWidget, QListWidgetItem, QDialog
+    QLabel, QMessageBox, QSlider, QTextBrowser, QTextEdit, QFrame, QListView, QDialog,
+    QStyledItemDelegate, QStyle, QCompleter
+)
+from PySide6.QtCore import (
+    Qt, QUrl, QThread, Signal, QPropertyAnimation, QEasingCurve, QSize, QTimer, QObject,
+    QAbstractListModel, QModelIndex, QRect, QRectF, QLine, QEvent, QElapsedTimer, QCoreApplication
+)
+from PySide6.QtGui import (
+    QPainter, QColor, QBrush, QPixmap, QImage, QFont, QFontMetrics, QTextCursor, QTextDocument,
+    QStandardItemModel, QStandardItem, QShortcut, QKeySequence
 )
-from PySide6.QtMultimedia import QMediaPlayer, QAudioOutput
-from PySide6.QtCore import Qt, QUrl, QThread, Signal, QPropertyAnimation, QEasingCurve, QSize, QTimer
-from PySide6.QtGui import QPainter, QColor, QBrush, QPixmap, QLinearGradient, QFont, QTextCursor
 
 
-class KeyListenerThread(QThread):
-    toggle_visibility = Signal()
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+
+# 默认设置，可在数据目录下的settings.json中覆盖
+DEFAULT_SETTINGS = {
+    "warmup_enabled": True,
+    "warmup_idle_delay": 5,             # 无前台操作多少秒后开始预热
+    "warmup_bandwidth": 256 * 1024,     # 预热带宽上限(字节/秒)
+    "warmup_request_rate": 2.0,         # 预热请求速率上限(次/秒)
+    "warmup_prefetch_urls": 3,          # 预解析播放链接的歌曲数
+    "playlist_page_size": 500,          # 歌单分页大小
+    "playlist_concurrency": 4,          # 歌单分页并发数
+    "library_folders": [],              # 本地音乐文件夹
+    "library_scan_workers": 4,          # 读取标签的线程数
+    "cover_fps": 30,                    # 封面旋转帧率上限(0为不旋转)
+    "stall_watchdog": False,            # 检测界面卡顿并记录调用栈(也可用--watchdog开启)
+    "stall_threshold_ms": 200,          # 超过多少毫秒算卡顿
+    "download_dir": "",                 # 离线下载目录(空为 ~/Music/RTLite)
+    "download_workers": 3,              # 同时下载的歌曲数
+    "loudness_normalization": True,     # 按分析出的响度自动调整音量(只针对下载和本地文件)
+    "loudness_target": -16,             # 目标响度(LUFS)
+    "spectrum_visualizer": False,       # 在封面下部显示频谱(需要Qt 6.8以上，Ctrl+Shift+V切换)
+    "spectrum_fps": 30,                 # 频谱刷新帧率上限
+}
+
+
+class StartupTrace:
+    """记录启动各阶段的耗时，--startup-trace时在首帧之后输出"""
+    def __init__(self, begin):
+        self.begin = begin
+        self.enabled = False
+        self.phases = []
+
+    def mark(self, phase):
+        """记录一个阶段结束的时间点"""
+        self.phases.append((phase, time.perf_counter()))
+
+    def report(self):
+        """输出各阶段耗时"""
+        if not self.enabled:
+            return
+        print("启动耗时:")
+        last = self.begin
+        for phase, at in self.phases:
+            print(f"  {phase:<14} {(at - last) * 1000:8.1f} ms   累计 {(at - self.begin) * 1000:8.1f} ms")
+            last = at
+
+
+STARTUP_TRACE = StartupTrace(STARTUP_BEGIN)
+
+
+def percentile(sorted_values, fraction):
+    """已排序列表的百分位数(最近秩)"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class Metrics:
+    """接口调用和播放过程的计时：记录Chrome trace事件，按接口统计延迟分位数"""
+    MAX_EVENTS = 20000
+    MAX_SAMPLES = 2000
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.pid = os.getpid()
+        self.lock = Lock()
+        self.events = deque(maxlen=self.MAX_EVENTS)
+        self.latencies = {}  # 名称 -> deque(秒)，只统计真正发出的请求
+        self.counts = {}     # 名称 -> [调用次数, 缓存命中次数, 字节数, 失败次数]
+
+    @contextmanager
+    def span(self, name, category="api", **args):
+        """计时一段代码；args可在代码块中补充(状态码、字节数、cache命中等)"""
+        started = time.perf_counter()
+        try:
+            yield args
+        except Exception as e:
+            args["error"] = type(e).__name__
+            raise
+        finally:
+            self.add_span(name, category, started, time.perf_counter(), args)
+
+    def add_span(self, name, category, started, finished, args=None, tid=None):
+        """记录一个已完成的区间"""
+        args = args or {}
+        event = {
+            "name": name, "cat": category, "ph": "X", "pid": self.pid, "tid": tid or get_ident(),
+            "ts": round((started - self.origin) * 1e6), "dur": round((finished - started) * 1e6), "args": args,
+        }
+        hit = args.get("cache") == "hit"
+        with self.lock:
+            self.events.append(event)
+            counts = self.counts.setdefault(name, [0, 0, 0, 0])
+            counts[0] += 1
+            counts[1] += hit
+            counts[2] += args.get("bytes", 0)
+            counts[3] += "error" in args
+            if not hit:
+                self.latencies.setdefault(name, deque(maxlen=self.MAX_SAMPLES)).append(finished - started)
+
+    def begin_play(self, name):
+        """开始一次播放追踪(从点击到第一次出声)"""
+        return PlayTrace(self, name)
+
+    def summary(self):
+        """按名称汇总：次数、缓存命中率、p50/p95/p99延迟(毫秒)、流量"""
+        with self.lock:
+            rows = [(name, list(counts), sorted(self.latencies.get(name, ()))) for name, counts in self.counts.items()]
+        lines = [f"{'名称':<22}{'次数':>6}{'命中':>7}{'p50':>9}{'p95':>9}{'p99':>9}{'KB':>9}"]
+        for name, (calls, hits, size, errors), samples in sorted(rows):
+            p50, p95, p99 = (percentile(samples, f) * 1000 for f in (0.5, 0.95, 0.99))
+            line = f"{name:<24}{calls:>6}{hits / calls:>8.0%}{p50:>9.1f}{p95:>9.1f}{p99:>9.1f}{size / 1024:>9.0f}"
+            lines.append(line + (f"  失败{errors}" if errors else ""))
+        return "\n".join(lines)
+
+    def export_chrome_trace(self, path):
+        """导出为Chrome trace JSON(chrome://tracing或Perfetto打开)"""
+        with self.lock:
+            events = list(self.events)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+
+
+class PlayTrace:
+    """一次播放的各阶段时间点：点击、详情、链接、setSource、缓冲、PlayingState、第一次出声"""
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+        self.marks = [("click", time.perf_counter())]
+        self.finished = False
+
+    def mark(self, phase):
+        """记录一个阶段(同名阶段只记第一次)"""
+        if not self.finished and all(name != phase for name, _ in self.marks):
+            self.marks.append((phase, time.perf_counter()))
+
+    def finish(self, outcome="first_audio"):
+        """结束追踪，每个阶段写成一个区间，总耗时计入"play"统计"""
+        if self.finished:
+            return
+        self.mark(outcome)
+        self.finished = True
+        # 每个区间以结束时到达的阶段命名，例如play.url是拿到详情后到拿到链接
+        for (_, started), (phase, finished) in zip(self.marks, self.marks[1:]):
+            self.metrics.add_span(f"play.{phase}", "play", started, finished, {"song": self.name}, tid="play")
+        self.metrics.add_span("play", "play", self.marks[0][1], self.marks[-1][1],
+                              {"song": self.name, "outcome": outcome}, tid="play")
+
+
+METRICS = Metrics()
+
+
+def get_data_dir():
+    """获取RTLite数据目录(缓存、设置等)"""
+    base = os.environ.get("APPDATA") or os.path.join(os.path.expanduser("~"), ".config")
+    path = os.path.join(base, "RTLite")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def load_settings():
+    """加载设置，缺失的项使用默认值"""
+    settings = dict(DEFAULT_SETTINGS)
+    try:
+        with open(os.path.join(get_data_dir(), "settings.json"), "r", encoding="utf-8") as f:
+            settings.update(json.load(f))
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"加载设置失败: {e}")
+    return settings
+
+
+def cookie_dict(cookies):
+    """将Cookie(字符串或字典)统一转换为请求用的字典"""
+    if not cookies:
+        return None
+    if isinstance(cookies, dict):
+        return {k: v for k, v in cookies.items() if v}
+    result = {}
+    for part in cookies.split(";"):
+        if "=" in part:
+            k, v = part.strip().split("=", 1)
+            if k in ("MUSIC_U", "NMTID"):
+                result[k] = v
+    return result or None
+
+
+class ResponseCache:
+    """两级缓存(内存LRU + 磁盘)，用于接口响应、封面等数据"""
+    def __init__(self, cache_dir, memory_limit=256):
+        self.cache_dir = cache_dir
+        self.memory_limit = memory_limit
+        self.memory = OrderedDict()
+        self.lock = Lock()
+
+    def _path(self, namespace, key, ext):
+        digest = hashlib.sha1(str(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, namespace, f"{digest}.{ext}")
+
+    def _remember(self, mem_key, expires, value):
+        with self.lock:
+            self.memory[mem_key] = (expires, value)
+            self.memory.move_to_end(mem_key)
+            while len(self.memory) > self.memory_limit:
+                self.memory.popitem(last=False)
+
+    def _recall(self, mem_key):
+        with self.lock:
+            entry = self.memory.get(mem_key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires is not None and expires < time.time():
+                del self.memory[mem_key]
+                return None
+            self.memory.move_to_end(mem_key)
+            return value
+
+    def _write(self, path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def get_json(self, namespace, key):
+        """读取JSON缓存，不存在或已过期返回None"""
+        mem_key = (namespace, key)
+        value = self._recall(mem_key)
+        if value is not None:
+            return value
+        try:
+            with open(self._path(namespace, key, "json"), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        expires = entry.get("expires")
+        if expires is not None and expires < time.time():
+            return None
+        self._remember(mem_key, expires, entry["data"])
+        return entry["data"]
+
+    def put_json(self, namespace, key, data, ttl=None):
+        """写入JSON缓存，ttl为None表示永不过期"""
+        expires = time.time() + ttl if ttl is not None else None
+        self._remember((namespace, key), expires, data)
+        try:
+            payload = json.dumps({"expires": expires, "data": data}, ensure_ascii=False)
+            self._write(self._path(namespace, key, "json"), payload.encode("utf-8"))
+        except Exception as e:
+            print(f"写入缓存失败: {e}")
+
+    def bytes_path(self, namespace, key):
+        """二进制缓存文件路径(文件不一定存在)"""
+        return self._path(namespace, key, "bin")
+
+    def get_bytes(self, namespace, key):
+        """读取二进制缓存(封面等)，不存在返回None"""
+        mem_key = (namespace, key)
+        value = self._recall(mem_key)
+        if value is not None:
+            return value
+        try:
+            with open(self.bytes_path(namespace, key), "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        self._remember(mem_key, None, data)
+        return data
+
+    def put_bytes(self, namespace, key, data):
+        """写入二进制缓存"""
+        self._remember((namespace, key), None, data)
+        try:
+            self._write(self.bytes_path(namespace, key), data)
+        except Exception as e:
+            print(f"写入缓存失败: {e}")
+
+
+class ApiClient:
+    """网易云音乐API客户端 - 统一请求头、Cookie和缓存
+
+    gate参数用于后台请求：请求前调用gate.before_request()，
+    收到数据后调用gate.consume_bytes(n)，由调用方控制速率和暂停。
+    """
+    SONG_DETAIL_TTL = 7 * 24 * 3600
+    LYRIC_TTL = 30 * 24 * 3600
+    SONG_URL_TTL = 600
+    SONG_URL_BATCH = 100  # /song/url一次请求的ID数
+
+    def __init__(self, api_url, cache, cookie_provider=None):
+        self.api_url = api_url
+        self.cache = cache
+        self.cookie_provider = cookie_provider
+        self.recorder = None   # SessionRecorder(--record)
+        self.transport = None  # 代替网络请求的对象(会话回放)，提供get_json(path, params)和get_bytes(url)
+
+    def cookies(self):
+        """当前登录Cookie(字典)，未登录返回None"""
+        return cookie_dict(self.cookie_provider()) if self.cookie_provider else None
+
+    def _cache_key(self, path, params, auth):
+        items = sorted((k, str(v)) for k, v in (params or {}).items() if k != "timestamp")
+        return f"{path}?{items}&auth={bool(auth and self.cookies())}"
+
+    def cached_json(self, path, params=None, auth=False):
+        """只查缓存：有未过期的响应时返回，否则返回None(不请求网络)"""
+        return self.cache.get_json("api", self._cache_key(path, params, auth))
+
+    def get_json(self, path, params=None, auth=False, ttl=None, gate=None, headers=None):
+        """GET请求接口并返回JSON；ttl不为None时先查缓存，成功响应写入缓存"""
+        key = self._cache_key(path, params, auth)
+        with METRICS.span(path, cache="miss" if ttl is not None else "none") as span:
+            if ttl is not None:
+                cached = self.cache.get_json("api", key)
+                if cached is not None:
+                    span["cache"] = "hit"
+                    if self.recorder:
+                        self.recorder.response(path, params, cached)
+                    return cached
+
+            if gate:
+                gate.before_request()
+            requested = time.perf_counter()
+            if self.transport:
+                data = self.transport.get_json(path, params)
+            else:
+                import requests  # 延迟导入，不拖慢启动
+                request_headers = {"User-Agent": USER_AGENT}
+                if headers:
+                    request_headers.update(headers)
+                response = requests.get(
+                    f"{self.api_url}{path}",
+                    params=params,
+                    headers=request_headers,
+                    cookies=self.cookies() if auth else None,
+                    timeout=15
+                )
+                span["status"] = response.status_code
+                span["bytes"] = len(response.content)
+                if gate:
+                    gate.consume_bytes(len(response.content))
+                data = response.json()
+            if self.recorder:
+                self.recorder.response(path, params, data, time.perf_counter() - requested)
+
+        if ttl is not None and isinstance(data, dict) and data.get("code", 200) == 200:
+            self.cache.put_json("api", key, data, ttl)
+        return data
+
+    def get_bytes(self, url, gate=None):
+        """下载二进制数据(封面等)，结果永久缓存"""
+        with METRICS.span("bytes", cache="miss") as span:
+            data = self.cache.get_bytes("bytes", url)
+            if data is not None:
+                span["cache"] = "hit"
+                if self.recorder:
+                    self.recorder.blob(url, data)
+                return data
+
+            requested = time.perf_counter()
+            if self.transport:
+                data = self.transport.get_bytes(url)
+            elif gate:
+                import requests
+                gate.before_request()
+                chunks = []
+                with requests.get(url, headers={"User-Agent": USER_AGENT}, stream=True, timeout=15) as response:
+                    span["status"] = response.status_code
+                    for chunk in response.iter_content(16 * 1024):
+                        chunks.append(chunk)
+                        gate.consume_bytes(len(chunk))
+                data = b"".join(chunks)
+            else:
+                import requests
+                response = requests.get(url, headers={"User-Agent": USER_AGENT}, timeout=15)
+                span["status"] = response.status_code
+                data = response.content
+            span["bytes"] = len(data)
+            if self.recorder:
+                self.recorder.blob(url, data, time.perf_counter() - requested)
+        if data:
+            self.cache.put_bytes("bytes", url, data)
+        return data
+
+    def store_song_details(self, songs):
+        """按歌曲ID缓存歌曲详情(每日推荐等接口已包含完整详情)"""
+        for song in songs:
+            if song.get("id") and song.get("al", {}).get("picUrl"):
+                self.cache.put_json("song", str(song["id"]), song, self.SONG_DETAIL_TTL)
+
+    def song_details(self, ids, gate=None):
+        """批量获取歌曲详情，返回{id: detail}；缓存未命中的ID合并为一次请求"""
+        result = {}
+        missing = []
+        started = time.perf_counter()
+        for song_id in ids:
+            detail = self.cache.get_json("song", str(song_id))
+            if detail is not None:
+                result[song_id] = detail
+                if self.recorder:
+                    self.recorder.song(detail)
+            else:
+                missing.append(song_id)
+        if not missing:
+            METRICS.add_span("/song/detail", "api", started, time.perf_counter(), {"cache": "hit", "ids": len(ids)})
+
+        for start in range(0, len(missing), 200):
+            batch = missing[start:start + 200]
+            res = self.get_json("/song/detail", params={"ids": ",".join(str(i) for i in batch)}, gate=gate)
+            songs = res.get("songs", [])
+            self.store_song_details(songs)
+            by_id = {str(s.get("id")): s for s in songs}
+            for song_id in batch:
+                if str(song_id) in by_id:
+                    result[song_id] = by_id[str(song_id)]
+        return result
+
+    def song_detail(self, song_id, gate=None):
+        """获取单首歌曲详情，失败返回None"""
+        return self.song_details([song_id], gate=gate).get(song_id)
+
+    def song_urls(self, ids, gate=None):
+        """批量获取播放链接(短时缓存，链接会过期)，返回{id: url}；缓存未命中的ID合并为一次请求"""
+        result = {}
+        missing = []
+        auth = bool(self.cookies())
+        started = time.perf_counter()
+        for song_id in ids:
+            cached = self.cache.get_json("url", f"{song_id}&auth={auth}")
+            if cached:
+                result[song_id] = cached
+            else:
+                missing.append(song_id)
+        if not missing:
+            METRICS.add_span("/song/url", "api", started, time.perf_counter(), {"cache": "hit", "ids": len(ids)})
+
+        for start in range(0, len(missing), self.SONG_URL_BATCH):
+            batch = missing[start:start + self.SONG_URL_BATCH]
+            res = self.get_json("/song/url", params={"id": ",".join(str(i) for i in batch)}, auth=True, gate=gate)
+            by_id = {str(entry.get("id")): entry for entry in res.get("data") or []}
+            for song_id in batch:
+                entry = by_id.get(str(song_id), {})
+                url = entry.get("url")
+                if url:
+                    # 链接有效期由接口返回(expi秒)，预留一分钟余量
+                    ttl = min(self.SONG_URL_TTL, max(60, entry.get("expi", self.SONG_URL_TTL) - 60))
+                    self.cache.put_json("url", f"{song_id}&auth={auth}", url, ttl)
+                    result[song_id] = url
+        return result
+
+    def song_url(self, song_id, gate=None):
+        """获取单首歌曲的播放链接，失败返回None"""
+        return self.song_urls([song_id], gate=gate).get(song_id)
+
+    def lyric(self, song_id, gate=None):
+        """获取歌词接口响应(长期缓存)"""
+        return self.get_json("/lyric", params={"id": song_id}, ttl=self.LYRIC_TTL, gate=gate)
+
+    def cached_lyric(self, song_id):
+        """只从缓存读取歌词接口响应，不访问网络"""
+        return self.cache.get_json("api", self._cache_key("/lyric", {"id": song_id}, False))
+
+
+def thumbnail_url(url, size):
+    """网易云图片缩略图地址(服务端缩放，减少下载量)"""
+    if not url or "param=" in url:
+        return url
+    return f"{url}{'&' if '?' in url else '?'}param={size}y{size}"
+
+
+def compact_song(song):
+    """只保留列表显示和播放需要的字段，减小缓存体积"""
+    album = song.get("al") or song.get("album") or {}
+    return {
+        "id": song.get("id"),
+        "name": song.get("name", "未知歌曲"),
+        "ar": [{"id": ar.get("id"), "name": ar.get("name", "未知歌手")} for ar in song.get("ar", song.get("artists", []))],
+        "al": {"id": album.get("id"), "name": album.get("name", ""), "picUrl": album.get("picUrl", "")},
+        "dt": song.get("dt", song.get("duration", 0)),
+    }
+
+
+LRC_PATTERN = re.compile(r"\[(\d+):(\d+)\.(\d+)\](.*)")
+
+
+def parse_lrc(lrc_text):
+    """解析LRC歌词文本，返回按时间排序的[(秒, 歌词)]"""
+    lyrics = []
+    
+    for line in lrc_text.splitlines():
+        m = LRC_PATTERN.match(line)
+        if m:
+            minutes = int(m.group(1))
+            seconds = int(m.group(2))
+            millis = int(m.group(3))
+            text = m.group(4).strip()
+            time_sec = minutes * 60 + seconds + millis / 1000
+            lyrics.append((time_sec, text))
+    
+    lyrics.sort(key=lambda x: x[0])
+    return lyrics
+
+
+def seconds_until_daily_refresh(hour=6):
+    """距离下一次每日推荐刷新(默认早上6点)的秒数"""
+    now = datetime.now()
+    refresh = now.replace(hour=hour, minute=0, second=0, microsecond=0)
+    if refresh <= now:
+        refresh += timedelta(days=1)
+    return max(60, int((refresh - now).total_seconds()))
+
+
+class WarmupPaused(Exception):
+    """前台操作开始，后台预热需要让出网络"""
+
+
+class RateBudget:
+    """令牌桶 - 限制后台请求速率和带宽"""
+    def __init__(self, bytes_per_sec, requests_per_sec):
+        self.bytes_per_sec = max(1, bytes_per_sec)
+        self.requests_per_sec = max(0.01, requests_per_sec)
+        self.byte_tokens = float(self.bytes_per_sec)
+        self.request_tokens = 1.0
+        self.last = time.monotonic()
+        self.lock = Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self.last
+        self.last = now
+        self.byte_tokens = min(self.bytes_per_sec, self.byte_tokens + elapsed * self.bytes_per_sec)
+        self.request_tokens = min(1.0, self.request_tokens + elapsed * self.requests_per_sec)
+
+    def acquire_request(self, check):
+        """等待一个请求令牌；check()在等待期间被调用，可抛出WarmupPaused"""
+        while True:
+            with self.lock:
+                self._refill()
+                if self.request_tokens >= 1.0:
+                    self.request_tokens -= 1.0
+                    return
+                wait = (1.0 - self.request_tokens) / self.requests_per_sec
+            check()
+            time.sleep(min(wait, 0.1))
+
+    def consume_bytes(self, n, check):
+        """记账已接收的字节数，超出预算时分段睡眠"""
+        with self.lock:
+            self._refill()
+            self.byte_tokens -= n
+        while True:
+            with self.lock:
+                self._refill()
+                if self.byte_tokens >= 0:
+                    return
+                wait = -self.byte_tokens / self.bytes_per_sec
+            check()
+            time.sleep(min(wait, 0.1))
+
+
+class WarmupScheduler(QObject):
+    """空闲时后台预热：每日推荐、用户歌单、封面、歌词，以及即将播放的链接
+
+    普通任务只在无前台操作idle_delay秒后运行；链接预解析属于紧急任务，
+    前台请求结束后即可运行。前台开始搜索或播放时立即暂停。
+    """
+    def __init__(self, api, settings, parent=None):
+        super().__init__(parent)
+        self.api = api
+        self.enabled = settings.get("warmup_enabled", True)
+        self.idle_delay_ms = int(settings.get("warmup_idle_delay", 5) * 1000)
+        self.prefetch_count = settings.get("warmup_prefetch_urls", 3)
+        self.budget = RateBudget(settings.get("warmup_bandwidth", 256 * 1024),
+                                 settings.get("warmup_request_rate", 2.0))
+
+        self.tasks = deque()
+        self.urgent_tasks = deque()
+        self.condition = Condition()
+        self.idle = False
+        self.foreground_busy = False
+        self.current_urgent = False
+        self.worker = None
+        self.lyrics_index = None  # 预热获取的歌词也写入索引
+
+        self.idle_timer = QTimer(self)
+        self.idle_timer.setSingleShot(True)
+        self.idle_timer.timeout.connect(self.on_idle)
+        if self.enabled:
+            self.idle_timer.start(self.idle_delay_ms)
+
+    def notify_foreground(self):
+        """前台搜索/播放开始，立即暂停预热并重新计时"""
+        with self.condition:
+            self.foreground_busy = True
+            self.idle = False
+        if self.enabled:
+            self.idle_timer.start(self.idle_delay_ms)
+
+    def foreground_done(self):
+        """前台请求结束，允许紧急任务(链接预解析)继续"""
+        with self.condition:
+            self.foreground_busy = False
+            self.condition.notify_all()
+
+    def on_idle(self):
+        """空闲计时结束，恢复普通预热任务"""
+        with self.condition:
+            self.idle = True
+            self.condition.notify_all()
+
+    def schedule(self, task, *args, urgent=False):
+        """添加预热任务"""
+        if not self.enabled:
+            return
+        with self.condition:
+            (self.urgent_tasks if urgent else self.tasks).append((task, args))
+            self.condition.notify_all()
+        if self.worker is None:
+            self.worker = Thread(target=self._run, daemon=True)
+            self.worker.start()
+
+    def check(self):
+        """在途请求检查是否需要让出网络"""
+        if self.foreground_busy or (not self.idle and not self.current_urgent):
+            raise WarmupPaused()
+
+    def before_request(self):
+        self.check()
+        self.budget.acquire_request(self.check)
+
+    def consume_bytes(self, n):
+        self.budget.consume_bytes(n, self.check)
+
+    def _next_task(self):
+        with self.condition:
+            while True:
+                if not self.foreground_busy:
+                    if self.urgent_tasks:
+                        self.current_urgent = True
+                        return self.urgent_tasks, self.urgent_tasks.popleft()
+                    if self.idle and self.tasks:
+                        self.current_urgent = False
+                        return self.tasks, self.tasks.popleft()
+                self.condition.wait()
+
+    def _run(self):
+        while True:
+            queue, (task, args) = self._next_task()
+            try:
+                task(*args)
+            except WarmupPaused:
+                # 放回队首，空闲后重试
+                with self.condition:
+                    queue.appendleft((task, args))
+            except Exception as e:
+                print(f"预热任务失败: {e}")
+
+    def schedule_login_warmup(self):
+        """登录后预热每日推荐和用户歌单"""
+        self.schedule(self._warm_recommendations)
+        self.schedule(self._warm_user_playlists)
+
+    def prefetch_song_urls(self, song_ids):
+        """预解析即将可能播放的歌曲链接"""
+        remote_ids = [song_id for song_id in song_ids if not LocalLibrary.is_local_id(song_id)]
+        if remote_ids and self.prefetch_count:
+            # 未缓存的链接合并为一次请求
+            self.schedule(self.api.song_urls, remote_ids[:self.prefetch_count], self, urgent=True)
+
+    def _warm_recommendations(self):
+        res = self.api.get_json("/recommend/songs", auth=True, ttl=seconds_until_daily_refresh(), gate=self)
+        songs = res.get("data", {}).get("dailySongs", [])
+        self.api.store_song_details(songs)
+        for song in songs:
+            self.schedule(self._warm_song, song)
+
+    def _warm_song(self, song):
+        pic_url = song.get("al", {}).get("picUrl")
+        if pic_url:
+            self.api.get_bytes(pic_url, gate=self)
+            self.api.get_bytes(thumbnail_url(pic_url, SongItemDelegate.COVER_SIZE * 2), gate=self)
+        res = self.api.lyric(song["id"], gate=self)
+        if self.lyrics_index:
+            self.lyrics_index.add(song, res)
+
+    def _warm_user_playlists(self):
+        account = self.api.get_json("/user/account", auth=True, ttl=3600, gate=self)
+        uid = (account.get("account") or {}).get("id") or (account.get("profile") or {}).get("userId")
+        if not uid:
+            return
+        res = self.api.get_json("/user/playlist", params={"uid": uid}, auth=True, ttl=3600, gate=self)
+        for playlist in res.get("playlist", []):
+            if playlist.get("coverImgUrl"):
+                self.schedule(self.api.get_bytes, playlist["coverImgUrl"], self)
+
+
+class UiDispatcher(QObject):
+    """线程安全的界面更新分发器：工作线程投递更新，GUI线程每帧批量执行一次，
+    同一目标尚未执行的旧更新会被新的替换"""
+    FRAME_MS = 16
+    wake = Signal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.lock = Lock()
+        self.pending = OrderedDict()  # key -> (func, args)
+        self.scheduled = False
+        self.applied = 0
+        self.dropped = 0
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(self.FRAME_MS)
+        self.timer.timeout.connect(self.flush)
+        # 跨线程发射时自动排队到GUI线程
+        self.wake.connect(self.timer.start)
+
+    def post(self, key, func, *args):
+        """投递一次界面更新(任意线程可调用)；key为None时不参与合并"""
+        with self.lock:
+            if key is None:
+                key = object()
+            elif key in self.pending:
+                del self.pending[key]
+                self.dropped += 1
+            self.pending[key] = (func, args)
+            if self.scheduled:
+                return
+            self.scheduled = True
+        self.wake.emit()
+
+    def flush(self):
+        """在GUI线程中执行本帧积累的全部更新"""
+        with self.lock:
+            batch = list(self.pending.values())
+            self.pending.clear()
+            self.scheduled = False
+        for func, args in batch:
+            try:
+                func(*args)
+            except Exception as e:
+                print(f"界面更新失败: {e}")
+        self.applied += len(batch)
+
+    def stats(self):
+        """已执行和被合并丢弃的更新数"""
+        return {"applied": self.applied, "dropped": self.dropped, "pending": len(self.pending)}
+
+
+class StallWatchdog(QObject):
+    """界面卡顿检测：GUI线程定时心跳，旁路线程发现心跳超时时抓取GUI线程的Python调用栈，
+    卡顿结束后按时长记录到日志和直方图"""
+    BUCKETS_MS = (250, 500, 1000, 2500, 5000)
+
+    def __init__(self, threshold_ms=200, interval_ms=50, log_path=None, parent=None):
+        super().__init__(parent)
+        self.threshold = threshold_ms / 1000
+        self.interval = interval_ms / 1000
+        self.log_path = log_path
+        self.gui_thread_id = get_ident()
+        self.lock = Lock()
+        self.last_beat = time.monotonic()
+        self.stall_stack = None  # 当前卡顿中抓到的调用栈
+        self.running = False
+        self.thread = None
+        self.histogram = [0] * (len(self.BUCKETS_MS) + 1)
+        self.longest = 0.0
+        self.timer = QTimer(self)
+        self.timer.setInterval(interval_ms)
+        self.timer.timeout.connect(self.beat)
+
+    def start(self):
+        """开始心跳和检测线程"""
+        if self.running:
+            return
+        if self.thread is not None:
+            self.thread.join()  # 上次stop时未等到退出的检测线程
+        self.running = True
+        self.last_beat = time.monotonic()
+        self.timer.start()
+        self.thread = Thread(target=self._watch, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """停止检测并等待检测线程退出"""
+        self.running = False
+        self.timer.stop()
+        if self.thread is not None:
+            self.thread.join(self.threshold)
+            if not self.thread.is_alive():
+                self.thread = None
+
+    def beat(self):
+        """GUI线程心跳；与上次心跳的间隔超出阈值即为一次卡顿"""
+        now = time.monotonic()
+        stalled = now - self.last_beat - self.interval
+        self.last_beat = now
+        if stalled < self.threshold:
+            return
+        with self.lock:
+            stack, self.stall_stack = self.stall_stack, None
+        self._record(stalled, stack)
+
+    def _watch(self):
+        while self.running:
+            time.sleep(self.threshold / 2)
+            if time.monotonic() - self.last_beat < self.threshold + self.interval:
+                continue
+            with self.lock:
+                if self.stall_stack is not None:
+                    continue  # 这次卡顿已经抓过
+            frame = sys._current_frames().get(self.gui_thread_id)
+            if frame is None:
+                continue
+            stack = "".join(traceback.format_stack(frame))
+            with self.lock:
+                self.stall_stack = stack
+
+    def _record(self, stalled, stack):
+        ms = stalled * 1000
+        self.histogram[bisect_left(self.BUCKETS_MS, ms)] += 1
+        self.longest = max(self.longest, ms)
+        stack = stack or "(未抓到调用栈)\n"
+        message = f"[{datetime.now():%Y-%m-%d %H:%M:%S}] 界面卡顿 {ms:.0f} ms\n{stack}"
+        print(message, end="")
+        if self.log_path:
+            try:
+                with open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write(message)
+            except OSError as e:
+                print(f"写入卡顿日志失败: {e}")
+
+    def summary(self):
+        """卡顿时长直方图(文本)"""
+        lines = [f"界面卡顿 {sum(self.histogram)} 次，最长 {self.longest:.0f} ms"]
+        lower = self.threshold * 1000
+        for upper, count in zip(self.BUCKETS_MS + (None,), self.histogram):
+            label = f"{lower:.0f}-{upper} ms" if upper else f">{lower:.0f} ms"
+            lines.append(f"  {label:<14} {count}")
+            lower = upper
+        return "\n".join(lines)
+
+
+class Profiler:
+    """运行时性能分析。cpu模式：旁路线程按固定间隔采样所有线程的调用栈(输出speedscope)，
+    同时对GUI线程做cProfile(输出pstats)；mem模式：tracemalloc在动作前后拍快照并比较"""
+    SAMPLE_INTERVAL = 0.01
+    TOP_N = 20
+
+    def __init__(self, mode, out_dir):
+        self.mode = mode
+        self.out_dir = out_dir
+        self.running = False
+        self.sampler = None
+        self.samples = Counter()  # (线程名, 调用栈) -> 采样次数
+        self.cprofile = None
+        self.started_at = 0.0
+        self.snapshot = None
+        self.snapshot_label = None
+        self.action_counts = Counter()
+
+    def start(self):
+        """开始分析(需在GUI线程调用)"""
+        if self.running:
+            return
+        if self.sampler is not None and self.sampler.is_alive():
+            print("上一次的采样线程尚未退出，请稍后再试")
+            return
+        self.running = True
+        self.started_at = time.perf_counter()
+        self.stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        if self.mode == "mem":
+            import tracemalloc
+            tracemalloc.start(10)
+            self.snapshot, self.snapshot_label = self._take_snapshot(), "开始"
+            self.action_counts.clear()
+        else:
+            import cProfile
+            self.samples.clear()
+            self.cprofile = cProfile.Profile()
+            self.cprofile.enable()
+            self.sampler = Thread(target=self._sample, daemon=True)
+            self.sampler.start()
+        print(f"性能分析已开始({self.mode})")
+
+    def stop(self):
+        """停止分析，写出结果文件并输出摘要"""
+        if not self.running:
+            return
+        self.running = False
+        os.makedirs(self.out_dir, exist_ok=True)
+        base = os.path.join(self.out_dir, f"{self.stamp}-{self.mode}")
+        if self.mode == "mem":
+            import tracemalloc
+            self.checkpoint("结束")
+            tracemalloc.stop()
+            print(f"内存对比已写入 {base}.txt")
+            return
+        self.sampler.join()  # 采样线程退出后才能读取samples
+        self.cprofile.disable()
+        self.cprofile.dump_stats(f"{base}.pstats")
+        self._write_speedscope(f"{base}.speedscope.json")
+        print(self.cpu_summary())
+        print(f"分析结果已写入 {base}.pstats 和 {base}.speedscope.json")
+
+    def toggle(self):
+        """热键：未运行则开始，运行中则停止并输出结果"""
+        if self.running:
+            self.stop()
+        else:
+            self.start()
+
+    def action(self, label, every=1):
+        """mem模式下，动作每发生every次就拍快照并与上一次比较"""
+        if not self.running or self.mode != "mem":
+            return
+        self.action_counts[label] += 1
+        if self.action_counts[label] % every == 0:
+            self.checkpoint(f"{label} x{self.action_counts[label]}" if every > 1 else label)
+
+    def checkpoint(self, label):
+        """拍快照，输出与上一个快照相比增长最多的分配位置"""
+        snapshot = self._take_snapshot()
+        diff = snapshot.compare_to(self.snapshot, "lineno")
+        total = sum(stat.size_diff for stat in diff)
+        lines = [f"== {self.snapshot_label} -> {label}: {total / 1024:+.1f} KB"]
+        lines += [f"  {stat.size_diff / 1024:+9.1f} KB {stat.count_diff:+7d}  {stat.traceback[0]}"
+                  for stat in diff[:self.TOP_N]]
+        report = "\n".join(lines)
+        print(report)
+        os.makedirs(self.out_dir, exist_ok=True)
+        with open(os.path.join(self.out_dir, f"{self.stamp}-mem.txt"), "a", encoding="utf-8") as f:
+            f.write(report + "\n")
+        self.snapshot, self.snapshot_label = snapshot, label
+
+    def _take_snapshot(self):
+        import tracemalloc
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+        ))
+
+    def _sample(self):
+        own = get_ident()
+        while self.running:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for tid, frame in sys._current_frames().items():
+                if tid == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+                    frame = frame.f_back
+                stack.reverse()
+                self.samples[(names.get(tid, str(tid)), tuple(stack))] += 1
+            time.sleep(self.SAMPLE_INTERVAL)
+
+    def _write_speedscope(self, path):
+        """按线程写出speedscope采样格式"""
+        frames, frame_index, profiles = [], {}, {}
+        for (thread_name, stack), count in self.samples.items():
+            indexes = []
+            for name, filename, line in stack:
+                key = (name, filename, line)
+                if key not in frame_index:
+                    frame_index[key] = len(frames)
+                    frames.append({"name": name, "file": filename, "line": line})
+                indexes.append(frame_index[key])
+            profile = profiles.setdefault(thread_name, {"samples": [], "weights": []})
+            profile["samples"].append(indexes)
+            profile["weights"].append(count * self.SAMPLE_INTERVAL)
+        duration = time.perf_counter() - self.started_at
+        data = {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": "RTLite",
+            "exporter": "RTLite",
+            "shared": {"frames": frames},
+            "profiles": [
+                {"type": "sampled", "name": name, "unit": "seconds", "startValue": 0, "endValue": duration,
+                 "samples": profile["samples"], "weights": profile["weights"]}
+                for name, profile in profiles.items()
+            ],
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+
+    def cpu_summary(self):
+        """采样结果中自身耗时和累计耗时最多的函数"""
+        self_counts, total_counts = Counter(), Counter()
+        for (thread_name, stack), count in self.samples.items():
+            if not stack:
+                continue
+            self_counts[stack[-1]] += count
+            for frame in set(stack):
+                total_counts[frame] += count
+        lines = [f"CPU采样 {sum(self.samples.values())} 次(间隔 {self.SAMPLE_INTERVAL * 1000:.0f} ms)，自身耗时最多："]
+        for (name, filename, line), count in self_counts.most_common(self.TOP_N):
+            lines.append(f"  {count * self.SAMPLE_INTERVAL:8.2f}s  {total_counts[(name, filename, line)] * self.SAMPLE_INTERVAL:8.2f}s  "
+                         f"{name} ({os.path.basename(filename)}:{line})")
+        return "\n".join(lines)
+
+
+class SessionRecorder:
+    """录制用户操作及其触发的接口响应(--record FILE)，退出时写成gzip压缩的JSON，
+    由bench.replay无界面回放。相同的响应和二进制数据按摘要只保存一份，不保存Cookie"""
+    VERSION = 1
+
+    def __init__(self, path=None):
+        self.path = path
+        self.enabled = bool(path)
+        self.started = time.perf_counter()
+        self.lock = Lock()
+        self.events = []
+        self.payloads = {}  # 摘要 -> JSON响应
+        self.blobs = {}     # 摘要 -> base64编码的二进制数据
+
+    def _append(self, event):
+        event["t"] = round((time.perf_counter() - self.started) * 1000, 1)
+        with self.lock:
+            self.events.append(event)
+
+    def action(self, name, **args):
+        """记录一次用户操作"""
+        if self.enabled:
+            self._append({"type": "action", "name": name, "args": args})
+
+    def response(self, path, params, data, elapsed=None):
+        """记录接口响应；elapsed为网络耗时(秒)，缓存命中为None"""
+        if not self.enabled:
+            return
+        text = json.dumps(data, ensure_ascii=False, sort_keys=True)
+        digest = hashlib.sha1(text.encode("utf-8")).hexdigest()
+        with self.lock:
+            self.payloads.setdefault(digest, data)
+        params = {k: str(v) for k, v in (params or {}).items() if k != "timestamp"}
+        self._append({"type": "json", "path": path, "params": params, "data": digest,
+                      "ms": None if elapsed is None else round(elapsed * 1000, 1)})
+
+    def song(self, detail):
+        """记录从缓存取得的歌曲详情(回放时数据目录是空的，需要据此构造/song/detail响应)"""
+        if self.enabled:
+            self.response("/song/detail", {"ids": detail.get("id")}, {"code": 200, "songs": [detail]})
+
+    def blob(self, url, data, elapsed=None):
+        """记录二进制下载(封面等)"""
+        if not self.enabled or not data:
+            return
+        digest = hashlib.sha1(data).hexdigest()
+        with self.lock:
+            if digest not in self.blobs:
+                self.blobs[digest] = base64.b64encode(data).decode("ascii")
+        self._append({"type": "bytes", "url": url, "data": digest,
+                      "ms": None if elapsed is None else round(elapsed * 1000, 1)})
+
+    def save(self, **meta):
+        """写入录制文件(meta为会话信息，如是否已登录)"""
+        if not self.enabled:
+            return
+        with self.lock:
+            trace = {
+                "version": self.VERSION,
+                "recorded_at": datetime.now().isoformat(timespec="seconds"),
+                "duration_ms": round((time.perf_counter() - self.started) * 1000, 1),
+                "meta": meta,
+                "events": list(self.events),
+                "payloads": dict(self.payloads),
+                "blobs": dict(self.blobs),
+            }
+        tmp_path = f"{self.path}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump(trace, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+        print(f"会话已录制: {self.path} ({len(trace['events'])}个事件)")
+
+    @staticmethod
+    def load(path):
+        """读取录制文件"""
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            trace = json.load(f)
+        if trace.get("version") != SessionRecorder.VERSION:
+            raise ValueError(f"不支持的录制文件版本: {trace.get('version')}")
+        return trace
+
+
+class KeyListenerThread(QThread):
+    toggle_visibility = Signal()
+
+    def run(self):
+        try:
+            import keyboard  # 在监听线程里导入，不阻塞界面
+            keyboard.add_hotkey('right shift', self.emit_toggle_signal)
+            keyboard.wait()
+        except Exception as e:
+            print(f"键盘监听错误: {e}")
+
+    def emit_toggle_signal(self):
+        # 确保信号在主线程发出
+        self.toggle_visibility.emit()
+
+
+class SongListModel(QAbstractListModel):
+    """搜索结果/歌单的歌曲列表模型"""
+    SongRole = Qt.UserRole + 1
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.songs = []
+        self.rows_by_id = {}
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.songs)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= len(self.songs):
+            return None
+        song = self.songs[index.row()]
+        if role == Qt.UserRole:
+            return song.get("id")
+        if role == self.SongRole:
+            return song
+        if role == Qt.DisplayRole:
+            return song.get("name", "未知歌曲")
+        return None
+
+    def append_songs(self, songs):
+        """在末尾追加歌曲"""
+        if not songs:
+            return
+        start = len(self.songs)
+        self.beginInsertRows(QModelIndex(), start, start + len(songs) - 1)
+        for offset, song in enumerate(songs):
+            self.rows_by_id.setdefault(song.get("id"), start + offset)
+        self.songs.extend(songs)
+        self.endInsertRows()
+
+    def update_songs(self, songs):
+        """用补全后的详情替换已有行"""
+        for song in songs:
+            row = self.rows_by_id.get(song.get("id"))
+            if row is not None:
+                self.songs[row] = song
+                index = self.index(row)
+                self.dataChanged.emit(index, index)
+
+    def refresh_song(self, song_id):
+        """通知视图重绘某首歌(封面加载完成)"""
+        row = self.rows_by_id.get(song_id)
+        if row is not None:
+            index = self.index(row)
+            self.dataChanged.emit(index, index)
+
+    def clear(self):
+        """清空列表"""
+        self.beginResetModel()
+        self.songs = []
+        self.rows_by_id = {}
+        self.endResetModel()
+
+
+class CoverLoader(QObject):
+    """有界线程池按需加载列表封面，只缓存最近使用的若干张"""
+    cover_ready = Signal(object)
+
+    def __init__(self, api, dispatcher, size=60, radius=5, max_workers=4, cache_limit=200, parent=None):
+        super().__init__(parent)
+        self.api = api
+        self.dispatcher = dispatcher
+        self.size = size
+        self.radius = radius
+        self.cache_limit = cache_limit
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.pixmaps = OrderedDict()
+        self.pending = {}
+        self.generation = 0
+
+    def get(self, song):
+        """返回已加载的封面；未加载时提交后台任务并返回None"""
+        song_id = song.get("id")
+        pixmap = self.pixmaps.get(song_id)
+        if pixmap is not None:
+            self.pixmaps.move_to_end(song_id)
+            return pixmap
+        if song_id is not None and song_id not in self.pending:
+            self.pending[song_id] = self.executor.submit(self._load, song, self.generation)
+        return None
+
+    def reset(self):
+        """取消未开始的加载并释放已缓存的封面(新的搜索开始时调用)"""
+        self.generation += 1
+        for future in self.pending.values():
+            future.cancel()
+        self.pending = {}
+        self.pixmaps.clear()
+
+    def _load(self, song, generation):
+        if generation != self.generation:
+            return  # 已被新的搜索取代
+        try:
+            if LocalLibrary.is_local_id(song.get("id")):
+                # 本地歌曲使用扫描时提取的内嵌封面
+                if not song.get("local_art"):
+                    return
+                image = QImage(song["local_art"])
+            else:
+                cover_url = song.get("al", {}).get("picUrl")
+                if not cover_url:
+                    # 搜索结果不带封面，通过/song/detail获取(有缓存)
+                    detail = self.api.song_detail(song["id"])
+                    cover_url = detail.get("al", {}).get("picUrl") if detail else None
+                if not cover_url:
+                    return
+                image = QImage.fromData(self.api.get_bytes(thumbnail_url(cover_url, self.size * 2)))
+            if image.isNull():
+                return
+
+            # 圆角遮罩(QImage可在工作线程中绘制)
+            rounded = QImage(self.size, self.size, QImage.Format_ARGB32_Premultiplied)
+            rounded.fill(Qt.transparent)
+            painter = QPainter(rounded)
+            painter.setRenderHint(QPainter.Antialiasing)
+            painter.setBrush(QBrush(image.scaled(self.size, self.size, Qt.KeepAspectRatioByExpanding, Qt.SmoothTransformation)))
+            painter.setPen(Qt.NoPen)
+            painter.drawRoundedRect(0, 0, self.size, self.size, self.radius, self.radius)
+            painter.end()
+            # 同一帧内完成的封面合并成一批更新
+            self.dispatcher.post((id(self), song["id"]), self.on_image_loaded, generation, song["id"], rounded)
+        except Exception as e:
+            print(f"加载封面失败: {e}")
+
+    def on_image_loaded(self, generation, song_id, image):
+        """在GUI线程中转换为QPixmap并通知视图"""
+        if generation != self.generation:
+            return
+        self.pending.pop(song_id, None)
+        self.pixmaps[song_id] = QPixmap.fromImage(image)
+        while len(self.pixmaps) > self.cache_limit:
+            self.pixmaps.popitem(last=False)
+        self.cover_ready.emit(song_id)
+
+
+class SongItemDelegate(QStyledItemDelegate):
+    """绘制歌曲项：封面、歌曲名、歌手和时长"""
+    ROW_HEIGHT = 80
+    COVER_SIZE = 60
+
+    def __init__(self, cover_loader, parent=None):
+        super().__init__(parent)
+        self.cover_loader = cover_loader
+        self.default_cover = QPixmap(self.COVER_SIZE, self.COVER_SIZE)
+        self.default_cover.fill(QColor(50, 50, 60))
+
+    def sizeHint(self, option, index):
+        return QSize(0, self.ROW_HEIGHT)
+
+    def paint(self, painter, option, index):
+        song = index.data(SongListModel.SongRole)
+        if song is None:
+            return
+
+        # 悬停/选中背景交给样式表绘制
+        style = option.widget.style() if option.widget else QApplication.style()
+        style.drawPrimitive(QStyle.PE_PanelItemViewItem, option, painter, option.widget)
+
+        painter.save()
+        rect = option.rect.adjusted(10, 10, -10, -10)
+
+        # 封面(仅可见行会触发加载)
+        cover = self.cover_loader.get(song) or self.default_cover
+        cover_top = rect.top() + (rect.height() - self.COVER_SIZE) // 2
+        painter.drawPixmap(rect.left(), cover_top, self.COVER_SIZE, self.COVER_SIZE, cover)
+
+        # 时长
+        duration = song.get("duration", song.get("dt", 0))  # 单位: 毫秒
+        duration_text = f"{duration // 60000}:{(duration % 60000) // 1000:02d}"
+        text_font = QFont(option.font)
+        text_font.setPixelSize(14)
+        painter.setFont(text_font)
+        painter.setPen(QColor(255, 255, 255, 178))
+        duration_rect = QRect(rect.right() - 50, rect.top(), 50, rect.height())
+        painter.drawText(duration_rect, Qt.AlignRight | Qt.AlignVCenter, duration_text)
+
+        # 歌曲名和歌手
+        text_left = rect.left() + self.COVER_SIZE + 15
+        text_width = max(0, duration_rect.left() - 15 - text_left)
+        name_font = QFont(option.font)
+        name_font.setPixelSize(16)
+        name_font.setBold(True)
+        painter.setFont(name_font)
+        painter.setPen(QColor(255, 255, 255))
+        name = QFontMetrics(name_font).elidedText(song.get("name", "未知歌曲"), Qt.ElideRight, min(text_width, 400))
+        painter.drawText(QRect(text_left, cover_top, text_width, 30), Qt.AlignLeft | Qt.AlignVCenter, name)
+
+        artists = ", ".join([ar.get("name", "未知歌手") for ar in song.get("artists", song.get("ar", []))])
+        painter.setFont(text_font)
+        painter.setPen(QColor(255, 255, 255, 178))
+        if song.get("lyric_match"):
+            # 歌词搜索结果：第二行显示高亮的匹配歌词和时间
+            doc = QTextDocument()
+            doc.setDefaultFont(text_font)
+            doc.setDocumentMargin(0)
+            doc.setHtml(
+                f"<span style='color:rgba(255,255,255,0.7);'>{html.escape(artists)} · "
+                f"{int(song['lyric_time'] // 60):02d}:{int(song['lyric_time'] % 60):02d} "
+                f"「{song['lyric_match']}」</span>"
+            )
+            painter.translate(text_left, cover_top + 34)
+            doc.drawContents(painter, QRectF(0, 0, text_width, 22))
+        else:
+            artists = QFontMetrics(text_font).elidedText(artists, Qt.ElideRight, text_width)
+            painter.drawText(QRect(text_left, cover_top + 32, text_width, 24), Qt.AlignLeft | Qt.AlignVCenter, artists)
+        painter.restore()
+
+
+class PlaylistLoader(QObject):
+    """分页加载歌单：有界并发请求/playlist/track/all，按页顺序增量返回
+
+    结果按trackUpdateTime缓存，重新打开时直接从缓存显示，再后台校验是否有更新。
+    """
+    info_ready = Signal(dict)
+    page_ready = Signal(list)
+    details_ready = Signal(list)
+    finished = Signal()
+    failed = Signal(str)
+
+    def __init__(self, api, playlist_id, page_size=500, concurrency=4, parent=None):
+        super().__init__(parent)
+        self.api = api
+        self.playlist_id = playlist_id
+        self.page_size = page_size
+        self.concurrency = concurrency
+        self.cancelled = False
+
+    def start(self):
+        Thread(target=self._run, daemon=True).start()
+
+    def cancel(self):
+        self.cancelled = True
+
+    def _emit(self, signal, *args):
+        """取消后不再向界面发送任何结果"""
+        if not self.cancelled:
+            signal.emit(*args)
+
+    def _fetch_page(self, offset):
+        if self.cancelled:
+            return []
+        res = self.api.get_json("/playlist/track/all", params={
+            "id": self.playlist_id,
+            "limit": self.page_size,
+            "offset": offset
+        }, auth=True)
+        return [compact_song(song) for song in res.get("songs", [])]
+
+    def _run(self):
+        try:
+            cache_key = str(self.playlist_id)
+            cached = self.api.cache.get_json("playlist", cache_key)
+            if cached:
+                self._emit(self.info_ready, cached["info"])
+                self._emit(self.page_ready, cached["tracks"])
+
+            detail = self.api.get_json("/playlist/detail", params={"id": self.playlist_id}, auth=True)
+            playlist = detail.get("playlist") or {}
+            if not playlist:
+                if not cached:
+                    self._emit(self.failed, "无法获取歌单信息")
+                return
+            info = {
+                "id": playlist.get("id"),
+                "name": playlist.get("name", "歌单"),
+                "trackCount": playlist.get("trackCount", 0),
+                "trackUpdateTime": playlist.get("trackUpdateTime"),
+            }
+            if cached and cached["info"].get("trackUpdateTime") == info["trackUpdateTime"] \
+                    and cached["info"].get("trackCount") == info["trackCount"]:
+                return
+
+            # 缓存不存在或已过期，重新分页加载
+            self._emit(self.info_ready, info)
+            tracks = []
+            pages = {}
+            next_page = 0
+            offsets = range(0, info["trackCount"], self.page_size)
+            with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+                futures = {pool.submit(self._fetch_page, offset): page for page, offset in enumerate(offsets)}
+                for future in as_completed(futures):
+                    pages[futures[future]] = future.result()
+                    # 按页顺序输出，保证列表顺序与歌单一致
+                    while next_page in pages:
+                        page_tracks = pages.pop(next_page)
+                        tracks.extend(page_tracks)
+                        self._emit(self.page_ready, page_tracks)
+                        next_page += 1
+            if self.cancelled:
+                return
+
+            # 缺少封面或时长的歌曲批量补全详情
+            missing = [t["id"] for t in tracks if not t["al"].get("picUrl") or not t.get("dt")]
+            if missing:
+                details = self.api.song_details(missing)
+                updated = []
+                for i, track in enumerate(tracks):
+                    if track["id"] in details:
+                        tracks[i] = compact_song(details[track["id"]])
+                        updated.append(tracks[i])
+                if updated:
+                    self._emit(self.details_ready, updated)
+
+            self.api.cache.put_json("playlist", cache_key, {"info": info, "tracks": tracks})
+        except Exception as e:
+            print(f"加载歌单失败: {e}")
+            self._emit(self.failed, f"加载歌单失败: {e}")
+        finally:
+            self._emit(self.finished)
+
+
+class LocalLibrary(QObject):
+    """本地音乐库：扫描配置的文件夹，标签写入SQLite全文索引
+
+    重新扫描时按修改时间和文件大小增量更新，标签由线程池并行读取。
+    """
+    AUDIO_EXTENSIONS = (".mp3", ".flac", ".m4a", ".aac", ".ogg", ".opus", ".wav", ".wma")
+    scan_finished = Signal(int, int)  # 新增/更新数, 删除数
+
+    def __init__(self, db_path, folders, workers=4, parent=None):
+        super().__init__(parent)
+        self.folders = folders
+        self.workers = workers
+        self.art_dir = os.path.join(os.path.dirname(db_path), "art")
+        self.lock = Lock()
+        self.scanning = False
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS tracks (
+                id INTEGER PRIMARY KEY,
+                path TEXT UNIQUE,
+                mtime REAL,
+                size INTEGER,
+                title TEXT,
+                artist TEXT,
+                album TEXT,
+                duration INTEGER,
+                art TEXT
+            )
+        """)
+        # trigram分词支持中文子串匹配；旧版SQLite不支持时退回unicode61
+        try:
+            self.conn.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS tracks_fts USING fts5(
+                    title, artist, album, content='tracks', content_rowid='id', tokenize='trigram'
+                )
+            """)
+            self.trigram = True
+        except sqlite3.OperationalError:
+            self.conn.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS tracks_fts USING fts5(
+                    title, artist, album, content='tracks', content_rowid='id'
+                )
+            """)
+            self.trigram = False
+        self.conn.executescript("""
+            CREATE TRIGGER IF NOT EXISTS tracks_ai AFTER INSERT ON tracks BEGIN
+                INSERT INTO tracks_fts(rowid, title, artist, album) VALUES (new.id, new.title, new.artist, new.album);
+            END;
+            CREATE TRIGGER IF NOT EXISTS tracks_ad AFTER DELETE ON tracks BEGIN
+                INSERT INTO tracks_fts(tracks_fts, rowid, title, artist, album) VALUES ('delete', old.id, old.title, old.artist, old.album);
+            END;
+            CREATE TRIGGER IF NOT EXISTS tracks_au AFTER UPDATE ON tracks BEGIN
+                INSERT INTO tracks_fts(tracks_fts, rowid, title, artist, album) VALUES ('delete', old.id, old.title, old.artist, old.album);
+                INSERT INTO tracks_fts(rowid, title, artist, album) VALUES (new.id, new.title, new.artist, new.album);
+            END;
+        """)
+        self.conn.commit()
+
+    @staticmethod
+    def is_local_id(song_id):
+        return isinstance(song_id, str) and song_id.startswith("local:")
+
+    def _to_song(self, row):
+        track_id, path, title, artist, album, duration, art = row
+        return {
+            "id": f"local:{track_id}",
+            "name": title,
+            "ar": [{"name": artist or "未知歌手"}],
+            "al": {"name": album or "", "picUrl": ""},
+            "dt": duration or 0,
+            "local_path": path,
+            "local_art": art or "",
+        }
+
+    def search(self, keyword, limit=50):
+        """全文检索本地歌曲，返回歌曲字典列表"""
+        columns = "tracks.id, path, tracks.title, tracks.artist, tracks.album, duration, art"
+        with self.lock:
+            if self.trigram and len(keyword) < 3:
+                # trigram至少需要3个字符，短关键词用LIKE
+                like = f"%{keyword}%"
+                rows = self.conn.execute(
+                    f"SELECT {columns} FROM tracks WHERE title LIKE ? OR artist LIKE ? OR album LIKE ? LIMIT ?",
+                    (like, like, like, limit)
+                ).fetchall()
+            else:
+                query = " ".join('"{}"'.format(term.replace('"', '""')) for term in keyword.split())
+                rows = self.conn.execute(
+                    f"SELECT {columns} FROM tracks_fts JOIN tracks ON tracks.id = tracks_fts.rowid "
+                    f"WHERE tracks_fts MATCH ? ORDER BY rank LIMIT ?",
+                    (query, limit)
+                ).fetchall()
+        return [self._to_song(row) for row in rows]
+
+    def get_track(self, song_id):
+        """按local:ID获取本地歌曲"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT id, path, title, artist, album, duration, art FROM tracks WHERE id = ?",
+                (int(song_id.split(":", 1)[1]),)
+            ).fetchone()
+        return self._to_song(row) if row else None
+
+    def rescan(self):
+        """后台增量扫描"""
+        if self.scanning or not self.folders:
+            return
+        self.scanning = True
+        Thread(target=self._scan, daemon=True).start()
+
+    def _scan(self):
+        try:
+            with self.lock:
+                known = {path: (mtime, size) for path, mtime, size in
+                         self.conn.execute("SELECT path, mtime, size FROM tracks")}
+
+            found = {}
+            for folder in self.folders:
+                for root, _, files in os.walk(folder):
+                    for name in files:
+                        if name.lower().endswith(self.AUDIO_EXTENSIONS):
+                            path = os.path.join(root, name)
+                            try:
+                                st = os.stat(path)
+                            except OSError:
+                                continue
+                            found[path] = (st.st_mtime, st.st_size)
+
+            changed = [path for path, stat in found.items() if known.get(path) != stat]
+            removed = [path for path in known if path not in found]
+
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                tags = list(pool.map(self.read_tags, changed))
+
+            with self.lock:
+                for path, tag in zip(changed, tags):
+                    mtime, size = found[path]
+                    self.conn.execute("""
+                        INSERT INTO tracks (path, mtime, size, title, artist, album, duration, art)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                        ON CONFLICT(path) DO UPDATE SET
+                            mtime=excluded.mtime, size=excluded.size, title=excluded.title,
+                            artist=excluded.artist, album=excluded.album,
+                            duration=excluded.duration, art=excluded.art
+                    """, (path, mtime, size, tag["title"], tag["artist"], tag["album"], tag["duration"], tag["art"]))
+                self.conn.executemany("DELETE FROM tracks WHERE path = ?", [(path,) for path in removed])
+                self.conn.commit()
+            self.scan_finished.emit(len(changed), len(removed))
+        except Exception as e:
+            print(f"扫描本地音乐失败: {e}")
+        finally:
+            self.scanning = False
+
+    def read_tags(self, path):
+        """读取标签(标题、歌手、专辑、时长、内嵌封面)；没有mutagen时从文件名推断"""
+        stem = os.path.splitext(os.path.basename(path))[0]
+        artist, _, title = stem.partition(" - ")
+        tag = {"title": title or stem, "artist": artist if title else "", "album": "", "duration": 0, "art": ""}
+        if mutagen is None:
+            return tag
+        try:
+            audio = mutagen.File(path, easy=True)
+            if audio is not None:
+                tag["title"] = (audio.get("title") or [tag["title"]])[0]
+                tag["artist"] = (audio.get("artist") or [tag["artist"]])[0]
+                tag["album"] = (audio.get("album") or [""])[0]
+                if audio.info:
+                    tag["duration"] = int(audio.info.length * 1000)
+            tag["art"] = self._extract_art(path)
+        except Exception as e:
+            print(f"读取标签失败 {path}: {e}")
+        return tag
+
+    def _extract_art(self, path):
+        """提取内嵌封面保存到art目录，返回文件路径"""
+        audio = mutagen.File(path)
+        data = None
+        if audio is None:
+            return ""
+        if getattr(audio, "pictures", None):  # FLAC/OGG
+            data = audio.pictures[0].data
+        elif audio.tags is not None:
+            if hasattr(audio.tags, "getall"):  # ID3
+                frames = audio.tags.getall("APIC")
+                data = frames[0].data if frames else None
+            elif "covr" in audio.tags:  # MP4
+                data = bytes(audio.tags["covr"][0])
+        if not data:
+            return ""
+        os.makedirs(self.art_dir, exist_ok=True)
+        art_path = os.path.join(self.art_dir, hashlib.sha1(path.encode("utf-8")).hexdigest() + ".img")
+        with open(art_path, "wb") as f:
+            f.write(data)
+        return art_path
+
+
+class DownloadError(Exception):
+    """下载失败(重试后仍无法完成或校验不通过)"""
+
+
+class DownloadManager(QObject):
+    """离线下载：任务状态保存在SQLite，重启后继续；固定数量的工作线程并行下载
+
+    未完成的数据写入.part文件，重试或重启后用HTTP Range续传；链接过期时重新解析。
+    完成后校验大小和MD5(接口提供时)，并在音频旁写入详情(.json)、封面(.jpg)和歌词(.lrc)。
+    """
+    MAX_ATTEMPTS = 5
+    CHUNK_SIZE = 64 * 1024
+    EXPIRED_STATUS = (403, 404, 410)
+
+    progress = Signal(str, int, int)   # 歌曲ID, 已下载字节, 总字节(未知为0)
+    finished = Signal(str, str)        # 歌曲ID, 文件路径
+    failed = Signal(str, str)          # 歌曲ID, 错误
+    batch_finished = Signal(int, int)  # 队列清空时：成功数, 失败数
+
+    def __init__(self, db_path, folder, api, workers=3, parent=None):
+        super().__init__(parent)
+        self.folder = folder
+        self.api = api
+        self.workers = max(1, workers)
+        self.active = 0
+        self.batch_done = 0
+        self.batch_failed = 0
+        self.lock = Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS downloads (
+                song_id TEXT PRIMARY KEY,
+                detail TEXT,
+                state TEXT,
+                path TEXT,
+                size INTEGER,
+                error TEXT,
+                added REAL,
+                updated REAL
+            )
+        """)
+        self.conn.commit()
+
+    def resume(self):
+        """继续上次退出时未完成的任务"""
+        with self.lock:
+            if self.active == 0:
+                self.conn.execute("UPDATE downloads SET state = 'queued' WHERE state = 'downloading'")
+                self.conn.commit()
+        self._start_workers()
+
+    def enqueue(self, songs):
+        """加入下载队列(已下载的跳过，失败的重新排队)，返回新加入的数量"""
+        now = time.time()
+        rows = [(str(song["id"]), json.dumps(compact_song(song), ensure_ascii=False), now, now)
+                for song in songs
+                if song.get("id") and song.get("type") != "playlist" and not LocalLibrary.is_local_id(song["id"])]
+        if not rows:
+            return 0
+        with self.lock:
+            # 已下载但文件被删除的重新下载
+            done = self.conn.execute(
+                f"SELECT song_id, path FROM downloads WHERE state = 'done' AND song_id IN ({','.join('?' * len(rows))})",
+                [row[0] for row in rows]
+            ).fetchall()
+            self.conn.executemany("UPDATE downloads SET state = 'failed', path = NULL WHERE song_id = ?",
+                                  [(song_id,) for song_id, path in done if not path or not os.path.exists(path)])
+            before = self.conn.total_changes
+            self.conn.executemany("""
+                INSERT INTO downloads (song_id, detail, state, added, updated) VALUES (?, ?, 'queued', ?, ?)
+                ON CONFLICT(song_id) DO UPDATE SET state = 'queued', error = NULL, updated = excluded.updated
+                WHERE state = 'failed'
+            """, rows)
+            self.conn.commit()
+            added = self.conn.total_changes - before
+        self._start_workers()
+        return added
+
+    def retry_failed(self):
+        with self.lock:
+            self.conn.execute("UPDATE downloads SET state = 'queued', error = NULL WHERE state = 'failed'")
+            self.conn.commit()
+        self._start_workers()
+
+    def status(self):
+        """各状态的任务数"""
+        with self.lock:
+            return dict(self.conn.execute("SELECT state, COUNT(*) FROM downloads GROUP BY state").fetchall())
+
+    def local_song(self, song_id):
+        """已下载歌曲的本地曲目信息(与LocalLibrary的格式相同)，文件不存在时返回None"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT detail, path FROM downloads WHERE song_id = ? AND state = 'done'", (str(song_id),)
+            ).fetchone()
+        if not row or not row[1] or not os.path.exists(row[1]):
+            return None
+        song = json.loads(row[0])
+        cover = os.path.splitext(row[1])[0] + ".jpg"
+        song["local_path"] = row[1]
+        song["local_art"] = cover if os.path.exists(cover) else ""
+        return song
+
+    def _start_workers(self):
+        with self.lock:
+            queued = self.conn.execute("SELECT COUNT(*) FROM downloads WHERE state = 'queued'").fetchone()[0]
+            count = min(queued, self.workers - self.active)
+            self.active += count
+        for _ in range(count):
+            Thread(target=self._run, daemon=True).start()
+
+    def _claim(self):
+        """取出下一个排队的任务"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT song_id, detail, path FROM downloads WHERE state = 'queued' ORDER BY added LIMIT 1"
+            ).fetchone()
+            if row is None:
+                self.active -= 1
+                return None
+            self.conn.execute("UPDATE downloads SET state = 'downloading', updated = ? WHERE song_id = ?",
+                              (time.time(), row[0]))
+            self.conn.commit()
+            return row
+
+    def _update(self, song_id, **fields):
+        fields["updated"] = time.time()
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self.lock:
+            self.conn.execute(f"UPDATE downloads SET {columns} WHERE song_id = ?", (*fields.values(), song_id))
+            self.conn.commit()
+
+    def _run(self):
+        while True:
+            job = self._claim()
+            if job is None:
+                break
+            song_id, detail, path = job
+            try:
+                path = self._download(song_id, json.loads(detail), path)
+            except Exception as e:
+                self._update(song_id, state="failed", error=str(e))
+                with self.lock:
+                    self.batch_failed += 1
+                self.failed.emit(song_id, str(e))
+            else:
+                self._update(song_id, state="done", path=path, error=None)
+                with self.lock:
+                    self.batch_done += 1
+                self.finished.emit(song_id, path)
+        with self.lock:
+            drained = self.active == 0
+            done, failed = self.batch_done, self.batch_failed
+            if drained:
+                self.batch_done = self.batch_failed = 0
+        if drained and done + failed:
+            self.batch_finished.emit(done, failed)
+
+    def _resolve(self, song_id):
+        """获取新的下载链接(不使用缓存，下载可能持续较久)"""
+        res = self.api.get_json("/song/url", params={"id": song_id}, auth=True)
+        entry = next((e for e in res.get("data") or [] if str(e.get("id")) == str(song_id)), None)
+        if not entry or not entry.get("url"):
+            raise DownloadError("无法获取下载链接")
+        return entry
+
+    def _target_path(self, song_id, song, entry):
+        """按"歌手 - 歌名"命名，与其他歌曲重名时加上ID"""
+        artist = song["ar"][0]["name"] if song.get("ar") else "未知歌手"
+        stem = re.sub(r'[\\/:*?"<>|\x00-\x1f]', "_", f"{artist} - {song['name']}").strip(" .")[:150]
+        ext = (entry.get("type") or os.path.splitext(QUrl(entry["url"]).path())[1].lstrip(".") or "mp3").lower()
+        path = os.path.join(self.folder, f"{stem}.{ext}")
+        if os.path.exists(path) or os.path.exists(path + ".part"):
+            path = os.path.join(self.folder, f"{stem} ({song_id}).{ext}")
+        return path
+
+    def _download(self, song_id, song, path):
+        import requests  # 延迟导入，不拖慢启动
+        # 搜索结果缺少专辑封面等信息，用完整详情(通常已缓存)
+        song = compact_song(self.api.song_detail(song_id) or song)
+        entry = self._resolve(song_id)
+        os.makedirs(self.folder, exist_ok=True)
+        if not path:
+            path = self._target_path(song_id, song, entry)
+            self._update(song_id, path=path, detail=json.dumps(song, ensure_ascii=False))
+        part = path + ".part"
+
+        total = entry.get("size") or 0
+        last_error = None
+        for attempt in range(self.MAX_ATTEMPTS):
+            offset = os.path.getsize(part) if os.path.exists(part) else 0
+            if total and offset >= total:
+                break
+            headers = {"User-Agent": USER_AGENT}
+            if offset:
+                headers["Range"] = f"bytes={offset}-"
+            try:
+                with requests.get(entry["url"], headers=headers, stream=True, timeout=15) as response:
+                    if response.status_code in self.EXPIRED_STATUS:
+                        # 链接过期，重新解析后从断点继续
+                        last_error = f"链接失效(HTTP {response.status_code})"
+                        entry = self._resolve(song_id)
+                        continue
+                    if response.status_code == 416:  # 已完整下载
+                        break
+                    response.raise_for_status()
+                    if response.status_code != 206:
+                        offset = 0  # 服务器不支持Range，从头下载
+                    if not total:
+                        content_range = response.headers.get("Content-Range", "")
+                        total = int(content_range.rsplit("/", 1)[1]) if "/" in content_range and not content_range.endswith("*") \
+                            else offset + int(response.headers.get("Content-Length") or 0)
+                    with open(part, "ab" if offset else "wb") as f:
+                        received = offset
+                        reported = 0
+                        for chunk in response.iter_content(self.CHUNK_SIZE):
+                            f.write(chunk)
+                            received += len(chunk)
+                            if received - reported >= 512 * 1024:
+                                reported = received
+                                self.progress.emit(song_id, received, total)
+                if not total or os.path.getsize(part) >= total:
+                    break
+                last_error = "连接中断"
+            except (requests.RequestException, OSError) as e:
+                last_error = str(e)
+            time.sleep(min(2 ** attempt, 10))
+        else:
+            raise DownloadError(f"下载失败: {last_error}")
+
+        self._verify(part, total, entry.get("md5"))
+        os.replace(part, path)
+        self.progress.emit(song_id, total, total)
+        self._write_sidecars(song_id, song, path)
+        return path
+
+    def _verify(self, part, total, md5):
+        """校验大小和MD5，不一致时删除.part重新下载"""
+        size = os.path.getsize(part)
+        if total and size != total:
+            os.remove(part)
+            raise DownloadError(f"文件大小不符: {size} != {total}")
+        if md5:
+            digest = hashlib.md5()
+            with open(part, "rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    digest.update(chunk)
+            if digest.hexdigest().lower() != md5.lower():
+                os.remove(part)
+                raise DownloadError("MD5校验失败")
+
+    def _write_sidecars(self, song_id, song, path):
+        """在音频旁写入详情、封面和歌词，之后播放不需要访问网络"""
+        stem = os.path.splitext(path)[0]
+        with open(stem + ".json", "w", encoding="utf-8") as f:
+            json.dump(song, f, ensure_ascii=False, indent=2)
+        pic_url = song.get("al", {}).get("picUrl")
+        if pic_url:
+            try:
+                data = self.api.get_bytes(pic_url)
+                if data:
+                    with open(stem + ".jpg", "wb") as f:
+                        f.write(data)
+            except Exception as e:
+                print(f"下载封面失败 {song_id}: {e}")
+        try:
+            lrc = self.api.lyric(song_id).get("lrc", {}).get("lyric", "")
+            if lrc:
+                with open(stem + ".lrc", "w", encoding="utf-8") as f:
+                    f.write(lrc)
+        except Exception as e:
+            print(f"下载歌词失败 {song_id}: {e}")
+
+
+class LoudnessMeter:
+    """EBU R128 / ITU-R BS.1770积分响度(LUFS)，分块输入，内存只随时长线性增长(每100ms一个数)
+
+    K加权在频域完成：每100ms一段做rfft，按K加权滤波器的|H(f)|²加权求能量(Parseval)，
+    整块音频一次向量化计算；400ms门限块(75%重叠)由相邻4段的能量平均得到。
+    """
+    HOP_SECONDS = 0.1
+
+    def __init__(self, rate, channels):
+        import numpy as np  # 延迟导入，只在分析线程中加载
+        self.np = np
+        self.rate = rate
+        self.channels = channels
+        self.hop = max(1, int(rate * self.HOP_SECONDS))
+        self.carry = np.zeros((0, channels), dtype=np.float32)
+        self.hop_energy = []
+        self.peak = 0.0
+        self.weights = self.k_weighting(rate, self.hop)
+
+    def k_weighting(self, rate, n):
+        """rfft各频点的K加权功率响应(高架+高通两级二阶滤波)，已含Parseval系数"""
+        np = self.np
+        w = 2 * np.pi * np.fft.rfftfreq(n, 1 / rate) / rate
+        z1, z2 = np.exp(-1j * w), np.exp(-2j * w)
+
+        def response(b, a):
+            return np.abs((b[0] + b[1] * z1 + b[2] * z2) / (a[0] + a[1] * z1 + a[2] * z2)) ** 2
+
+        # 高架滤波：+4dB，1500Hz，Q=1/√2
+        A = 10 ** (4.0 / 40)
+        w0 = 2 * np.pi * 1500 / rate
+        alpha = np.sin(w0) / (2 / np.sqrt(2))
+        cos = np.cos(w0)
+        shelf = response(
+            (A * ((A + 1) + (A - 1) * cos + 2 * np.sqrt(A) * alpha),
+             -2 * A * ((A - 1) + (A + 1) * cos),
+             A * ((A + 1) + (A - 1) * cos - 2 * np.sqrt(A) * alpha)),
+            ((A + 1) - (A - 1) * cos + 2 * np.sqrt(A) * alpha,
+             2 * ((A - 1) - (A + 1) * cos),
+             (A + 1) - (A - 1) * cos - 2 * np.sqrt(A) * alpha))
+        # 高通滤波：38Hz，Q=0.5
+        w0 = 2 * np.pi * 38 / rate
+        alpha = np.sin(w0) / (2 * 0.5)
+        cos = np.cos(w0)
+        highpass = response(((1 + cos) / 2, -(1 + cos), (1 + cos) / 2), (1 + alpha, -2 * cos, 1 - alpha))
+
+        # 单边谱：除直流和奈奎斯特外的频点计两次
+        parseval = np.full(len(w), 2.0)
+        parseval[0] = 1.0
+        if n % 2 == 0:
+            parseval[-1] = 1.0
+        return shelf * highpass * parseval / (n * n)
+
+    def add(self, samples):
+        """输入一块浮点采样(帧数×声道数，范围±1)"""
+        np = self.np
+        if len(samples):
+            self.peak = max(self.peak, float(np.abs(samples).max()))
+        data = np.concatenate([self.carry, samples]) if len(self.carry) else samples
+        count = len(data) // self.hop
+        self.carry = data[count * self.hop:].copy()
+        if not count:
+            return
+        # (段数, 段长, 声道) -> 每段每声道的K加权能量，声道求和(左右声道权重为1)
+        spectrum = np.fft.rfft(data[:count * self.hop].reshape(count, self.hop, self.channels), axis=1)
+        power = spectrum.real ** 2 + spectrum.imag ** 2
+        energy = np.einsum("hfc,f->h", power, self.weights)
+        self.hop_energy.extend(energy.tolist())
+
+    def integrated(self):
+        """积分响度(LUFS)；全部静音时返回None"""
+        np = self.np
+        hops = np.asarray(self.hop_energy)
+        if len(hops) < 4:
+            return None
+        blocks = np.convolve(hops, np.ones(4) / 4, mode="valid")
+        with np.errstate(divide="ignore"):
+            loudness = -0.691 + 10 * np.log10(blocks)
+        gated = blocks[loudness > -70]  # 绝对门限
+        if not len(gated):
+            return None
+        relative = -0.691 + 10 * np.log10(gated.mean()) - 10  # 相对门限
+        gated = blocks[(loudness > -70) & (loudness > relative)]
+        return float(-0.691 + 10 * np.log10(gated.mean()))
+
+
+class WaveformBuilder:
+    """分块累计每10ms的峰值和均方值，结束时向量化降采样为固定数量的波形柱"""
+    BLOCK_SECONDS = 0.01
+
+    def __init__(self, rate, channels):
+        import numpy as np
+        self.np = np
+        self.rate = rate
+        self.channels = channels
+        self.block = max(1, int(rate * self.BLOCK_SECONDS))
+        self.carry = np.zeros((0, channels), dtype=np.float32)
+        self.frames = 0
+        self.peaks = []
+        self.squares = []
+
+    def add(self, samples):
+        np = self.np
+        self.frames += len(samples)
+        data = np.concatenate([self.carry, samples]) if len(self.carry) else samples
+        count = len(data) // self.block
+        self.carry = data[count * self.block:].copy()
+        if count:
+            blocks = data[:count * self.block].reshape(count, self.block * self.channels)
+            self.peaks.append(np.abs(blocks).max(axis=1))
+            self.squares.append(np.square(blocks).mean(axis=1))
+
+    def finish(self, buckets):
+        """返回(峰值bytes, RMS bytes, 时长毫秒)，每个bytes长度为buckets，0~255对应0~满幅"""
+        np = self.np
+        if len(self.carry):
+            self.peaks.append(np.abs(self.carry).max(keepdims=True).ravel())
+            self.squares.append(np.square(self.carry).mean(keepdims=True).ravel())
+        peaks = np.concatenate(self.peaks) if self.peaks else np.zeros(1, dtype=np.float32)
+        squares = np.concatenate(self.squares) if self.squares else np.zeros(1, dtype=np.float32)
+        count = len(peaks)
+        if count >= buckets:
+            # 每个波形柱覆盖连续的若干块：峰值取最大，RMS按均方平均
+            starts = np.arange(buckets) * count // buckets
+            sizes = np.diff(np.append(starts, count))
+            peak = np.maximum.reduceat(peaks, starts)
+            rms = np.sqrt(np.add.reduceat(squares, starts) / sizes)
+        else:
+            index = np.arange(buckets) * count // buckets
+            peak, rms = peaks[index], np.sqrt(squares[index])
+        to_bytes = lambda values: (np.clip(values, 0, 1) * 255 + 0.5).astype(np.uint8).tobytes()
+        return to_bytes(peak), to_bytes(rms), int(self.frames * 1000 / self.rate)
+
+
+class WaveformFile:
+    """波形文件：固定大小(头部 + 峰值 + RMS各buckets字节)，内存映射读取"""
+    MAGIC = b"RTWF"
+    VERSION = 1
+    BUCKETS = 1024
+    HEADER = struct.Struct("<4sHHI")  # 魔数, 版本, 波形柱数, 时长(毫秒)
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.buckets, self.duration_ms = self.HEADER.unpack_from(self.map)
+        if magic != self.MAGIC or version != self.VERSION or len(self.map) != self.HEADER.size + 2 * self.buckets:
+            self.map.close()
+            raise ValueError(f"无效的波形文件: {path}")
+        view = memoryview(self.map)
+        self.peaks = view[self.HEADER.size:self.HEADER.size + self.buckets]
+        self.rms = view[self.HEADER.size + self.buckets:]
+
+    @classmethod
+    def write(cls, path, peaks, rms, duration_ms):
+        """原子写入(先写临时文件再替换)"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(cls.HEADER.pack(cls.MAGIC, cls.VERSION, len(peaks), duration_ms))
+            f.write(peaks)
+            f.write(rms)
+        os.replace(tmp_path, path)
+
+    def close(self):
+        self.peaks.release()
+        self.rms.release()
+        self.map.close()
+
+
+class AudioAnalyzer(QThread):
+    """后台分析本地文件(下载或本地库)：积分响度存入SQLite，波形存为固定大小的波形文件，
+    每首歌只分析一次
+
+    WAV用wave模块按块读取，其他格式用QAudioDecoder在本线程的事件循环中解码，
+    每块解码数据立即送入LoudnessMeter和WaveformBuilder，不保留整首歌的采样。
+    """
+    CHUNK_SECONDS = 5
+    analyzed = Signal(str, float)  # 歌曲ID, 积分响度(LUFS)
+    waveform_ready = Signal(str)   # 歌曲ID
+
+    def __init__(self, db_path, waveform_dir, parent=None):
+        super().__init__(parent)
+        self.waveform_dir = waveform_dir
+        self.lock = Lock()
+        self.condition = Condition()
+        self.pending = deque()
+        self.queued = set()
+        self.stopping = False
+        self.numpy_missing = None  # 首次分析时检查
+        self.cache = {}
+        self.max_gain = None  # (目标响度, 全库最大提升增益)，有新的分析结果时清空
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS loudness (
+                song_id TEXT PRIMARY KEY,
+                lufs REAL,
+                peak REAL,
+                analyzed REAL
+            )
+        """)
+        self.conn.commit()
+        QCoreApplication.instance().aboutToQuit.connect(self.stop)
+
+    def gain_db(self, song_id, target):
+        """达到目标响度需要的增益(dB，不超过峰值允许的上限)；未分析过返回None"""
+        song_id = str(song_id)
+        if song_id not in self.cache:
+            with self.lock:
+                row = self.conn.execute("SELECT lufs, peak FROM loudness WHERE song_id = ?", (song_id,)).fetchone()
+            if row is None:
+                return None
+            self.cache[song_id] = row
+        lufs, peak = self.cache[song_id]
+        if lufs is None:
+            return 0.0  # 静音或无法解码
+        return self.target_gain(target, lufs, peak)
+
+    def max_gain_db(self, target):
+        """已分析歌曲中最大的提升增益(dB，0~12)，即输出音量需要预留的余量"""
+        if self.max_gain is None or self.max_gain[0] != target:
+            with self.lock:
+                rows = self.conn.execute("SELECT lufs, peak FROM loudness WHERE lufs IS NOT NULL").fetchall()
+            gain = max((self.target_gain(target, lufs, peak) for lufs, peak in rows), default=0.0)
+            self.max_gain = (target, max(0.0, gain))
+        return self.max_gain[1]
+
+    @staticmethod
+    def target_gain(target, lufs, peak):
+        headroom = -20 * math.log10(peak) if peak > 0 else 0.0
+        return max(-24.0, min(target - lufs, headroom, 12.0))
+
+    def waveform_path(self, song_id):
+        return os.path.join(self.waveform_dir, re.sub(r"\W", "_", str(song_id)) + ".rtwf")
+
+    def waveform(self, song_id):
+        """打开已生成的波形文件，没有时返回None"""
+        try:
+            return WaveformFile(self.waveform_path(song_id))
+        except (OSError, ValueError):
+            return None
+
+    def analyze(self, song_id, path):
+        """排队分析(响度和波形都已有或已在队列中的跳过)"""
+        if self.numpy_missing is None:
+            # 没有NumPy时不做响度均衡和波形，只检查和提示一次
+            self.numpy_missing = importlib.util.find_spec("numpy") is None
+            if self.numpy_missing:
+                print("未安装NumPy，跳过音频分析")
+        if self.numpy_missing:
+            return
+        song_id = str(song_id)
+        with self.lock:
+            row = self.conn.execute("SELECT lufs FROM loudness WHERE song_id = ?", (song_id,)).fetchone()
+        # 无法解码或静音的文件(lufs为空)不生成波形，也不再重复分析
+        known = row is not None and (row[0] is None or os.path.exists(self.waveform_path(song_id)))
+        with self.condition:
+            if known or song_id in self.queued:
+                return
+            self.queued.add(song_id)
+            self.pending.append((song_id, path))
+            self.condition.notify_all()
+        if not self.isRunning():
+            self.start(QThread.LowPriority)
+
+    def stop(self):
+        with self.condition:
+            self.stopping = True
+            self.condition.notify_all()
+        self.wait()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.pending and not self.stopping:
+                    self.condition.wait()
+                if self.stopping:
+                    return
+                song_id, path = self.pending.popleft()
+            waveform = None
+            try:
+                lufs, peak, waveform = self.measure(path)
+            except Exception as e:
+                if self.stopping:
+                    return
+                print(f"音频分析失败 {path}: {e}")
+                lufs, peak = None, 0.0
+            with self.lock:
+                self.conn.execute("INSERT OR REPLACE INTO loudness VALUES (?, ?, ?, ?)",
+                                  (song_id, lufs, peak, time.time()))
+                self.conn.commit()
+            with self.condition:
+                self.queued.discard(song_id)
+            self.cache.pop(song_id, None)
+            self.max_gain = None
+            self.analyzed.emit(song_id, lufs if lufs is not None else float("nan"))
+            if waveform:
+                try:
+                    WaveformFile.write(self.waveform_path(song_id), *waveform)
+                    self.waveform_ready.emit(song_id)
+                except OSError as e:
+                    print(f"保存波形失败 {song_id}: {e}")
+
+    def measure(self, path):
+        """一次解码同时计算，返回(积分响度, 采样峰值, (峰值, RMS, 时长))"""
+        meter = builder = None
+        for rate, samples in self.decode(path):
+            if self.stopping:
+                raise RuntimeError("已停止")
+            if meter is None:
+                meter = LoudnessMeter(rate, samples.shape[1])
+                builder = WaveformBuilder(rate, samples.shape[1])
+            meter.add(samples)
+            builder.add(samples)
+        if meter is None:
+            return None, 0.0, None
+        return meter.integrated(), meter.peak, builder.finish(WaveformFile.BUCKETS)
+
+    def decode(self, path):
+        """逐块产生(采样率, 帧数×声道的float32数组)"""
+        import numpy as np
+        if path.lower().endswith(".wav"):
+            import wave
+            with wave.open(path, "rb") as f:
+                rate, channels, width = f.getframerate(), f.getnchannels(), f.getsampwidth()
+                while True:
+                    frames = f.readframes(rate * self.CHUNK_SECONDS)
+                    if not frames:
+                        break
+                    yield rate, self.pcm_to_float(np, frames, width).reshape(-1, channels)
+            return
+
+        from PySide6.QtMultimedia import QAudioDecoder, QAudioFormat
+        from PySide6.QtCore import QEventLoop
+        decoder = QAudioDecoder()
+        decoder.setSource(QUrl.fromLocalFile(path))
+        loop = QEventLoop()
+        buffers = deque()
+        state = {"done": False, "error": None}
+
+        def on_ready():
+            while decoder.bufferAvailable():
+                buffers.append(decoder.read())
+            loop.quit()
+
+        def on_finished():
+            state["done"] = True
+            loop.quit()
+
+        def on_error(error):
+            state["error"] = decoder.errorString()
+            on_finished()
+
+        decoder.bufferReady.connect(on_ready)
+        decoder.finished.connect(on_finished)
+        decoder.error.connect(on_error)
+        decoder.start()
+        widths = {QAudioFormat.UInt8: 1, QAudioFormat.Int16: 2, QAudioFormat.Int32: 4}
+        try:
+            while True:
+                while buffers:
+                    buffer = buffers.popleft()
+                    fmt = buffer.format()
+                    data = bytes(buffer.constData())
+                    if fmt.sampleFormat() == QAudioFormat.Float:
+                        samples = np.frombuffer(data, dtype=np.float32)
+                    else:
+                        samples = self.pcm_to_float(np, data, widths[fmt.sampleFormat()])
+                    yield fmt.sampleRate(), samples.reshape(-1, fmt.channelCount())
+                if state["done"]:
+                    break
+                loop.exec()
+        finally:
+            decoder.stop()
+        if state["error"]:
+            raise RuntimeError(state["error"])
+
+    @staticmethod
+    def pcm_to_float(np, data, width):
+        """整数PCM转为±1范围的float32"""
+        if width == 1:
+            return (np.frombuffer(data, dtype=np.uint8).astype(np.float32) - 128) / 128
+        if width == 3:
+            raw = np.frombuffer(data, dtype=np.uint8).reshape(-1, 3)
+            ints = (raw[:, 0].astype(np.int32) | (raw[:, 1].astype(np.int32) << 8) | (raw[:, 2].astype(np.int32) << 16))
+            ints = np.where(ints >= 1 << 23, ints - (1 << 24), ints)
+            return ints.astype(np.float32) / (1 << 23)
+        dtype = {2: np.int16, 4: np.int32}[width]
+        return np.frombuffer(data, dtype=dtype).astype(np.float32) / float(np.iinfo(dtype).max + 1)
+
+
+class LyricsIndex:
+    """已获取歌词的本地全文索引(SQLite FTS5)，支持按歌词搜索歌曲"""
+    def __init__(self, db_path):
+        self.lock = Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS lyric_songs (
+                song_id TEXT PRIMARY KEY,
+                song TEXT
+            )
+        """)
+        try:
+            self.conn.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS lyric_lines USING fts5(
+                    text, song_id UNINDEXED, time UNINDEXED, tokenize='trigram'
+                )
+            """)
+            self.trigram = True
+        except sqlite3.OperationalError:
+            self.conn.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS lyric_lines USING fts5(
+                    text, song_id UNINDEXED, time UNINDEXED
+                )
+            """)
+            self.trigram = False
+        self.conn.commit()
+
+    def add(self, song, lyric_res):
+        """写入一首歌的原文和翻译歌词(重复写入会覆盖)"""
+        song_id = str(song["id"])
+        lines = []
+        for key in ("lrc", "tlyric"):
+            for time_sec, text in parse_lrc((lyric_res.get(key) or {}).get("lyric", "")):
+                if text:
+                    lines.append((text, song_id, time_sec))
+        if not lines:
+            return
+        with self.lock:
+            self.conn.execute("DELETE FROM lyric_lines WHERE song_id = ?", (song_id,))
+            self.conn.executemany("INSERT INTO lyric_lines (text, song_id, time) VALUES (?, ?, ?)", lines)
+            self.conn.execute(
+                "INSERT OR REPLACE INTO lyric_songs (song_id, song) VALUES (?, ?)",
+                (song_id, json.dumps(compact_song(song), ensure_ascii=False))
+            )
+            self.conn.commit()
+
+    def search(self, keyword, limit=50):
+        """按歌词搜索，返回带高亮歌词行和时间的歌曲列表(每首歌取第一处匹配)"""
+        with self.lock:
+            if self.trigram and len(keyword) >= 3:
+                cursor = self.conn.execute("""
+                    SELECT highlight(lyric_lines, 0, char(2), char(3)), song_id, time
+                    FROM lyric_lines WHERE lyric_lines MATCH ?
+                """, ('"{}"'.format(keyword.replace('"', '""')),))
+            else:
+                # 短关键词无法使用trigram索引，直接子串匹配
+                cursor = self.conn.execute(
+                    "SELECT text, song_id, time FROM lyric_lines WHERE instr(text, ?) > 0",
+                    (keyword,)
+                )
+
+            # 逐行读取，凑够limit首不同的歌即停止，避免对大量匹配行排序
+            matches = OrderedDict()
+            for text, song_id, time_sec in cursor:
+                if song_id not in matches:
+                    matches[song_id] = (text, time_sec)
+                    if len(matches) >= limit:
+                        break
+            cursor.close()
+
+            songs = {}
+            if matches:
+                placeholders = ",".join("?" * len(matches))
+                songs = dict(self.conn.execute(
+                    f"SELECT song_id, song FROM lyric_songs WHERE song_id IN ({placeholders})",
+                    list(matches)
+                ).fetchall())
+
+        results = []
+        for song_id, (text, time_sec) in matches.items():
+            if song_id not in songs:
+                continue
+            if "\x02" not in text:
+                text = text.replace(keyword, f"\x02{keyword}\x03")
+            song = json.loads(songs[song_id])
+            song["lyric_match"] = html.escape(text).replace("\x02", "<b style='color:#00b4ff;'>").replace("\x03", "</b>")
+            song["lyric_time"] = time_sec
+            results.append(song)
+        return results
+
+
+class TrigramIndex:
+    """内存trigram倒排索引，用于历史记录的模糊匹配"""
+    def __init__(self):
+        self.postings = {}
+
+    @staticmethod
+    def trigrams(text):
+        padded = f"  {text.lower()} "
+        return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+    def add(self, key, text):
+        for gram in self.trigrams(text):
+            self.postings.setdefault(gram, set()).add(key)
+
+    def remove(self, key, text):
+        for gram in self.trigrams(text):
+            keys = self.postings.get(gram)
+            if keys:
+                keys.discard(key)
+
+    def match(self, text, limit):
+        """返回命中trigram最多的limit个[(key, 相似度)]，相似度为查询trigram命中的比例"""
+        grams = self.trigrams(text)
+        counts = Counter()
+        for gram in grams:
+            counts.update(self.postings.get(gram, ()))
+        total = len(grams)
+        return [(key, hits / total) for key, hits in counts.most_common(limit)]
+
+
+class SearchHistory:
+    """搜索词和播放歌曲的历史记录，按frecency(频率+新近度)排序
+
+    记录持久化在SQLite中，启动后在后台线程加载到内存trigram索引，
+    每次按键的联想只访问内存，不访问网络和磁盘。
+    """
+    HALF_LIFE = 14 * 24 * 3600  # 热度半衰期(秒)
+    MAX_ENTRIES = 50000
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.lock = Lock()
+        self.entries = {}
+        self.index = TrigramIndex()
+        self.loaded = False
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS history (
+                key TEXT PRIMARY KEY,
+                kind TEXT,
+                text TEXT,
+                song TEXT,
+                score REAL,
+                last_used REAL
+            )
+        """)
+        self.conn.commit()
+
+    def load_async(self):
+        """后台加载历史并建立索引"""
+        Thread(target=self._load, daemon=True).start()
+
+    def _load(self):
+        try:
+            with self.lock:
+                rows = self.conn.execute("SELECT key, kind, text, song, score, last_used FROM history").fetchall()
+            now = time.time()
+            if len(rows) > self.MAX_ENTRIES:
+                rows.sort(key=lambda r: self._decayed(r[4], r[5], now), reverse=True)
+                with self.lock:
+                    self.conn.executemany("DELETE FROM history WHERE key = ?", [(r[0],) for r in rows[self.MAX_ENTRIES:]])
+                    self.conn.commit()
+                rows = rows[:self.MAX_ENTRIES]
+            entries = {}
+            index = TrigramIndex()
+            for key, kind, text, song, score, last_used in rows:
+                entries[key] = {"kind": kind, "text": text, "song": json.loads(song) if song else None,
+                                "score": score, "last_used": last_used}
+                index.add(key, text)
+            with self.lock:
+                # 加载期间新增的记录以内存中的为准(记录时已在库中的热度上累加)
+                for key, entry in self.entries.items():
+                    if key in entries:
+                        index.remove(key, entries[key]["text"])
+                    entries[key] = entry
+                    index.add(key, entry["text"])
+                self.entries = entries
+                self.index = index
+                self.loaded = True
+        except Exception as e:
+            print(f"加载历史记录失败: {e}")
+
+    def _decayed(self, score, last_used, now):
+        return score * 0.5 ** ((now - last_used) / self.HALF_LIFE)
+
+    def record_query(self, query):
+        """记录一次搜索"""
+        self._record(f"q:{query.lower()}", "query", query, None)
+
+    def record_song(self, song):
+        """记录一次播放"""
+        artists = ", ".join(ar.get("name", "") for ar in song.get("ar", song.get("artists", [])))
+        text = f"{song.get('name', '')} - {artists}" if artists else song.get("name", "")
+        self._record(f"s:{song['id']}", "song", text, compact_song(song))
+
+    def _record(self, key, kind, text, song):
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                entry = {"kind": kind, "text": text, "song": song, "score": 0.0, "last_used": now}
+                if not self.loaded:
+                    # 尚未加载完：在库中已有的热度上累加，加载时内存中的记录才能直接覆盖库中的
+                    row = self.conn.execute("SELECT score, last_used FROM history WHERE key = ?", (key,)).fetchone()
+                    if row:
+                        entry["score"], entry["last_used"] = row
+                self.entries[key] = entry
+                self.index.add(key, text)
+            entry["score"] = self._decayed(entry["score"], entry["last_used"], now) + 1.0
+            entry["last_used"] = now
+            if song:
+                entry["song"] = song
+            try:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO history (key, kind, text, song, score, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, kind, text, json.dumps(song, ensure_ascii=False) if song else None, entry["score"], now)
+                )
+                self.conn.commit()
+            except Exception as e:
+                print(f"保存历史记录失败: {e}")
+
+    def suggest(self, text, limit=8):
+        """模糊匹配历史，返回按相似度和热度排序的记录"""
+        text = text.strip()
+        if not text:
+            return []
+        now = time.time()
+        with self.lock:
+            # 先按trigram命中数粗选，再对少量候选计算热度
+            matches = self.index.match(text, limit * 20)
+            lowered = text.lower()
+            ranked = []
+            for key, similarity in matches:
+                entry = self.entries[key]
+                if similarity < 0.3 and lowered not in entry["text"].lower():
+                    continue
+                if lowered in entry["text"].lower():
+                    similarity = max(similarity, 0.9)
+                frecency = self._decayed(entry["score"], entry["last_used"], now)
+                ranked.append((similarity * (1.0 + frecency), key))
+            top = sorted(ranked, reverse=True)[:limit]
+            return [dict(self.entries[key], key=key) for _, key in top]
+
+
+class RemoteSearch(QObject):
+    """后台执行远程搜索，结果通过信号回到GUI线程"""
+    finished = Signal(int, list)
+    failed = Signal(int, str)
+
+    def __init__(self, api, parent=None):
+        super().__init__(parent)
+        self.api = api
+
+    def start(self, generation, keyword):
+        def _search():
+            try:
+                res = self.api.get_json("/search", params={"keywords": keyword}, auth=True)
+                self.finished.emit(generation, res.get("result", {}).get("songs", []))
+            except Exception as e:
+                self.failed.emit(generation, str(e))
+
+        Thread(target=_search, daemon=True).start()
+
+
+class SessionStore:
+    """上次播放状态的快照(当前歌曲、进度、音量、队列)，启动时不联网即可恢复界面"""
+    VERSION = 1
+
+    def __init__(self, data_dir):
+        self.path = os.path.join(data_dir, "session.json")
+        self.queue_path = os.path.join(data_dir, "session_queue.json")
+        self.saved_queue_key = None
+
+    def load(self):
+        """读取快照，不存在或格式不对返回None"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                snapshot = json.load(f)
+            if snapshot.get("version") != self.VERSION:
+                return None
+            with open(self.queue_path, "r", encoding="utf-8") as f:
+                queue = json.load(f)
+            if queue.get("key") == snapshot.get("queue_key"):
+                snapshot["queue"] = queue.get("songs", [])
+                self.saved_queue_key = queue.get("key")
+            return snapshot
+        except (OSError, ValueError, AttributeError):
+            return None
+
+    def save(self, snapshot, queue, queue_key):
+        """原子写入快照；队列单独存放，只在队列变化时重写"""
+        snapshot = dict(snapshot, version=self.VERSION, queue_key=queue_key, saved_at=time.time())
+        try:
+            if queue_key != self.saved_queue_key:
+                self._write(self.queue_path, {"key": queue_key, "songs": [self.snapshot_song(song) for song in queue]})
+                self.saved_queue_key = queue_key
+            self._write(self.path, snapshot)
+        except OSError as e:
+            print(f"保存播放状态失败: {e}")
+
+    @staticmethod
+    def snapshot_song(song):
+        """精简歌曲信息，本地歌曲保留文件路径"""
+        compact = compact_song(song)
+        for key in ("local_path", "local_art"):
+            if song.get(key):
+                compact[key] = song[key]
+        return compact
+
+    def _write(self, path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+
+DEFAULT_API_URL = "https://ncm.zhenxin.me"
+
 
-    def run(self):
+def control_address():
+    """本机IPC地址：Windows上是命名管道名，其他平台是套接字文件路径(rtlitectl.py按同样规则计算)"""
+    user = re.sub(r"\W", "", os.environ.get("USERNAME") or os.environ.get("USER") or "user")
+    if sys.platform == "win32":
+        return f"RTLite-{user}"
+    return os.path.join(tempfile.gettempdir(), f"RTLite-{user}.sock")
+
+
+class PlayerEngine(QObject):
+    """播放引擎：播放器、队列、API客户端、缓存和本地库，不创建任何控件。
+    界面(ModernMusicPlayer)通过信号跟随引擎状态；--no-gui时只运行引擎和IPC控制接口"""
+    COOKIE_KEY = r"Software\RTLite"  # Windows注册表位置
+    COOKIE_FILE = "user_cookie.json"  # 其他平台的Cookie文件(数据目录下)
+
+    media_ready = Signal()          # 播放器已创建(界面此时连接进度等信号)
+    song_changed = Signal(dict)     # 开始播放一首歌(详情或本地曲目)
+    playing_changed = Signal(bool)
+    volume_changed = Signal(int)
+    message = Signal(str, str)      # 提示文字, 类型(info/warning/error)
+
+    def __init__(self, options=None, parent=None):
+        super().__init__(parent)
+        self.options = options or parse_args([])[0]
+        self.api_url = (self.options.api_url or DEFAULT_API_URL).rstrip("/")
+
+        # 播放器在需要时才创建(加载多媒体后端较慢)
+        self.media_player = None
+        self.audio_output = None
+        self.volume = 100
+        self.play_trace = None  # 当前播放从点击到出声的追踪
+        self.playing = False
+        self.current_song = None
+        self.pending_seek = None
+
+        # 播放队列(搜索结果或歌单)
+        self.queue = []
+        self.queue_index = -1
+        self.queue_version = 0
+        self.next_prefetched = False
+
+        # Cookie、设置、缓存和API客户端
+        self.cookies = self.load_cookie()
+        self.settings = load_settings()
+        self.cache = ResponseCache(os.path.join(get_data_dir(), "cache"))
+        self.api = ApiClient(self.api_url, self.cache, lambda: self.cookies)
+
+        # 空闲时后台预热
+        self.warmup = WarmupScheduler(self.api, self.settings, self)
+        if self.cookies:
+            self.warmup.schedule_login_warmup()
+
+        # 本地音乐库(后台增量扫描)和搜索/播放历史
+        self.library = LocalLibrary(
+            os.path.join(get_data_dir(), "library.db"),
+            self.settings.get("library_folders", []),
+            workers=self.settings.get("library_scan_workers", 4),
+            parent=self
+        )
+        self.history = SearchHistory(os.path.join(get_data_dir(), "history.db"))
+
+        # 离线下载(已下载的歌曲直接从磁盘播放)
+        self.downloads = DownloadManager(
+            os.path.join(get_data_dir(), "downloads.db"),
+            self.settings.get("download_dir") or os.path.join(os.path.expanduser("~"), "Music", "RTLite"),
+            self.api,
+            workers=self.settings.get("download_workers", 3),
+            parent=self
+        )
+        self.downloads.batch_finished.connect(self.on_downloads_finished)
+
+        # 响度均衡和波形：下载完成后和播放本地文件时后台分析，每首歌只分析一次
+        self.gain = 1.0
+        self.analyzer = AudioAnalyzer(
+            os.path.join(get_data_dir(), "loudness.db"), os.path.join(get_data_dir(), "waveforms"), parent=self
+        )
+        self.analyzer.analyzed.connect(self.on_loudness_analyzed)
+        self.downloads.finished.connect(self.analyzer.analyze)
+
+    @classmethod
+    def load_cookie(cls):
+        """加载cookie：Windows从注册表读取，其他平台从数据目录下的文件读取"""
         try:
-            keyboard.add_hotkey('right shift', self.emit_toggle_signal)
-            keyboard.wait()
+            if sys.platform == "win32":
+                import winreg
+                key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, cls.COOKIE_KEY, 0, winreg.KEY_READ)
+                value, _ = winreg.QueryValueEx(key, "Cookie")
+                winreg.CloseKey(key)
+            else:
+                with open(os.path.join(get_data_dir(), cls.COOKIE_FILE), "r", encoding="utf-8") as f:
+                    value = json.load(f)["Cookie"]
+            return {
+                "MUSIC_U": value.split("MUSIC_U=")[1].split(";")[0] if "MUSIC_U=" in value else "",
+                "NMTID": value.split("NMTID=")[1].split(";")[0] if "NMTID=" in value else ""
+            }
+        except FileNotFoundError:  # 未登录过(注册表键或文件不存在)
+            return None
         except Exception as e:
-            print(f"键盘监听错误: {e}")
+            print(f"加载cookie失败: {e}")
+            return None
 
-    def emit_toggle_signal(self):
-        # 确保信号在主线程发出
-        self.toggle_visibility.emit()
+    @classmethod
+    def save_cookie(cls, cookie):
+        """保存cookie：Windows写入注册表，其他平台写入数据目录下仅当前用户可读的文件"""
+        try:
+            if sys.platform == "win32":
+                import winreg
+                key = winreg.CreateKey(winreg.HKEY_CURRENT_USER, cls.COOKIE_KEY)
+                winreg.SetValueEx(key, "Cookie", 0, winreg.REG_SZ, cookie)
+                winreg.CloseKey(key)
+            else:
+                path = os.path.join(get_data_dir(), cls.COOKIE_FILE)
+                fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+                with open(fd, "w", encoding="utf-8") as f:
+                    json.dump({"Cookie": cookie}, f)
+        except Exception as e:
+            print(f"保存cookie失败: {e}")
 
+    def init_media(self):
+        """创建播放器并连接信号(重复调用无副作用)"""
+        if self.media_player is not None:
+            return
+        from PySide6.QtMultimedia import QMediaPlayer, QAudioOutput
 
-class SongItemWidget(QWidget):
-    """自定义歌曲项Widget，显示封面、歌曲信息"""
-    def __init__(self, song, api_url, parent=None):
-        super().__init__(parent)
-        self.song = song
-        self.api_url = api_url
-        
-        # 主布局
-        layout = QHBoxLayout(self)
-        layout.setContentsMargins(10, 10, 10, 10)
-        layout.setSpacing(15)
-        
-        # 封面标签
-        self.cover_label = QLabel()
-        self.cover_label.setFixedSize(60, 60)
-        self.cover_label.setStyleSheet("""
-            background: rgba(0, 0, 0, 0.3);
-            border-radius: 5px;
-        """)
-        self.cover_label.setScaledContents(True)
-        
-        # 默认封面
-        default_cover = QPixmap(60, 60)
-        default_cover.fill(QColor(50, 50, 60))
-        self.cover_label.setPixmap(default_cover)
-        
-        # 歌曲信息布局
-        info_layout = QVBoxLayout()
-        info_layout.setSpacing(5)
-        
-        # 歌曲名
-        name = song.get("name", "未知歌曲")
-        self.name_label = QLabel(name)
-        self.name_label.setStyleSheet("""
-            font-size: 16px;
-            font-weight: bold;
-            color: white;
-        """)
-        self.name_label.setMaximumWidth(400)
-        
-        # 歌手
-        artists = ", ".join([ar.get("name", "未知歌手") for ar in song.get("artists", song.get("ar", []))])
-        self.artist_label = QLabel(artists)
-        self.artist_label.setStyleSheet("""
-            font-size: 14px;
-            color: rgba(255, 255, 255, 0.7);
-        """)
-        
-        # 添加到信息布局
-        info_layout.addWidget(self.name_label)
-        info_layout.addWidget(self.artist_label)
-        info_layout.addStretch()
-        
-        # 时长
-        duration = song.get("duration", 0)  # 单位: 毫秒
-        minutes = duration // 60000
-        seconds = (duration % 60000) // 1000
-        duration_text = f"{minutes}:{seconds:02d}"
-        
-        self.duration_label = QLabel(duration_text)
-        self.duration_label.setStyleSheet("""
-            font-size: 14px;
-            color: rgba(255, 255, 255, 0.7);
-        """)
-        self.duration_label.setFixedWidth(50)
-        self.duration_label.setAlignment(Qt.AlignRight | Qt.AlignVCenter)
-        
-        # 添加到主布局
-        layout.addWidget(self.cover_label)
-        layout.addLayout(info_layout)
-        layout.addWidget(self.duration_label)
-        
-        # 异步加载封面
-        self.load_cover()
-    
-    def load_cover(self):
-        """异步加载封面图片 - 通过/song/detail接口获取封面"""
-        # 获取歌曲ID
-        song_id = self.song.get("id")
-        if not song_id:
+        self.media_player = QMediaPlayer()
+        self.audio_output = QAudioOutput()
+        self.media_player.setAudioOutput(self.audio_output)
+        self.apply_output_volume()
+
+        self.media_player.positionChanged.connect(self.on_position_changed)
+        self.media_player.playbackStateChanged.connect(self.on_playback_state_changed)
+        self.media_player.mediaStatusChanged.connect(self.on_media_status_changed)
+        self.media_ready.emit()
+
+    def download(self, songs):
+        """下载歌曲(队列、搜索结果或歌单)，返回新加入下载队列的数量"""
+        return self.downloads.enqueue(songs)
+
+    def on_downloads_finished(self, done, failed):
+        if failed:
+            self.message.emit(f"下载完成 {done} 首，失败 {failed} 首", "warning")
+        else:
+            self.message.emit(f"下载完成 {done} 首", "info")
+
+    def set_volume(self, value):
+        """设置音量(0-100)"""
+        value = max(0, min(100, int(value)))
+        if value == self.volume:
             return
-            
-        # 启动线程获取歌曲详情
-        def _load():
+        self.volume = value
+        self.apply_output_volume()
+        self.volume_changed.emit(value)
+
+    def apply_output_volume(self):
+        """输出音量 = 用户音量 × 响度均衡增益(增益已扣除余量，不超过1)"""
+        if self.audio_output is not None:
+            self.audio_output.setVolume(min(1.0, self.volume / 100 * self.gain))
+
+    def update_gain(self, song):
+        """按歌曲的响度设置增益：到目标响度的增益减去全库最大提升增益(余量)，
+        输出音量不超过用户音量，偏轻的歌相对偏响的歌提升；尚未分析的歌曲按已达到目标响度处理。
+        新的分析结果改变余量时，从下一首歌开始生效，避免播放中音量跳变"""
+        self.gain = 1.0
+        if self.settings.get("loudness_normalization"):
+            target = self.settings.get("loudness_target", -16)
+            gain_db = self.analyzer.gain_db(song["id"], target) or 0.0
+            self.gain = 10 ** ((gain_db - self.analyzer.max_gain_db(target)) / 20)
+        self.apply_output_volume()
+
+    def on_loudness_analyzed(self, song_id, lufs):
+        if self.current_song and str(self.current_song.get("id")) == song_id:
+            self.update_gain(self.current_song)
+
+    def set_playing(self, playing):
+        self.playing = playing
+        self.playing_changed.emit(playing)
+
+    def play_queue(self, songs, index):
+        """以给定列表作为播放队列，从index开始播放"""
+        self.queue = [song for song in songs if song.get("type") != "playlist"]
+        self.queue_version += 1
+        song = songs[index]
+        self.queue_index = self.queue.index(song) if song in self.queue else -1
+        # 歌单中的歌曲已带完整信息，写入缓存避免再次请求详情
+        self.api.store_song_details([song])
+        start_ms = int(song["lyric_time"] * 1000) if "lyric_time" in song else None
+        self.play_song(song["id"], start_ms)
+
+    def play_next(self):
+        """播放队列中的下一首"""
+        if 0 <= self.queue_index < len(self.queue) - 1:
+            self.queue_index += 1
+            song = self.queue[self.queue_index]
+            self.api.store_song_details([song])
+            self.play_song(song["id"])
+
+    def play_local(self, song):
+        """直接播放本地文件(不访问网络)"""
+        self.init_media()
+        self.start_play_trace(song["id"])
+        self.current_song = song
+        self.history.record_song(song)
+        self.analyzer.analyze(song["id"], song["local_path"])
+        self.update_gain(song)
+        self.song_changed.emit(song)
+
+        self.play_trace.mark("set_source")
+        self.media_player.setSource(QUrl.fromLocalFile(song["local_path"]))
+        self.media_player.play()
+        self.set_playing(True)
+
+    def play_song(self, song_id, start_ms=None):
+        """播放指定ID的歌曲，start_ms指定起始位置(歌词搜索跳转)"""
+        self.init_media()
+        self.next_prefetched = False
+        if start_ms is not None and self.current_song and str(self.current_song.get("id")) == str(song_id) \
+                and self.media_player.playbackState() != self.media_player.StoppedState:
+            # 正在播放的歌曲直接跳转
+            self.media_player.setPosition(start_ms)
+            return
+        self.pending_seek = start_ms
+        if LocalLibrary.is_local_id(song_id):
+            song = self.library.get_track(song_id)
+            if song:
+                self.play_local(song)
+            else:
+                self.message.emit("本地文件已不存在", "error")
+            return
+        downloaded = self.downloads.local_song(song_id)
+        if downloaded:
+            self.play_local(downloaded)
+            return
+
+        self.start_play_trace(song_id)
+        self.warmup.notify_foreground()
+        try:
+            # 获取歌曲详情(优先使用缓存)
+            detail = self.api.song_detail(song_id)
+            if not detail:
+                self.finish_play_trace("failed")
+                self.message.emit("无法获取歌曲详情", "error")
+                return
+            self.play_trace.mark("detail")
+            self.current_song = detail
+            self.history.record_song(detail)
+            self.update_gain(detail)
+
+            # 获取播放链接(预热时可能已解析)
+            song_url = self.api.song_url(song_id)
+            if not song_url:
+                self.finish_play_trace("failed")
+                self.message.emit("无法获取播放链接", "error")
+                return
+            self.play_trace.mark("url")
+
+            # 界面更新标题、封面和歌词
+            self.song_changed.emit(detail)
+
+            # 播放音乐
+            self.play_trace.mark("set_source")
+            self.media_player.setSource(QUrl(song_url))
+            self.media_player.play()
+            self.set_playing(True)
+
+        except Exception as e:
+            self.finish_play_trace("failed")
+            self.message.emit(f"请求失败: {str(e)}", "error")
+        finally:
+            self.warmup.foreground_done()
+
+    def toggle_play_pause(self):
+        """切换播放/暂停"""
+        if self.playing:
+            self.pause()
+        else:
+            self.resume()
+
+    def pause(self):
+        if self.media_player is not None and self.playing:
+            self.media_player.pause()
+            self.set_playing(False)
+
+    def resume(self):
+        self.init_media()
+        self.media_player.play()
+        self.set_playing(True)
+
+    def seek(self, position):
+        """跳转到position(毫秒)"""
+        if self.media_player is not None and self.media_player.duration() > 0:
+            self.media_player.setPosition(max(0, min(int(position), self.media_player.duration())))
+
+    def status(self):
+        """当前播放状态(IPC的status命令)"""
+        song = self.current_song
+        position = self.media_player.position() if self.media_player is not None else 0
+        duration = self.media_player.duration() if self.media_player is not None else 0
+        return {
+            "song": {
+                "id": song.get("id"),
+                "name": song.get("name"),
+                "artist": song["ar"][0].get("name") if song.get("ar") else None,
+            } if song else None,
+            "playing": self.playing,
+            "position": position / 1000,
+            "duration": duration / 1000,
+            "volume": self.volume,
+            "queue": {"index": self.queue_index, "length": len(self.queue)},
+        }
+
+    def start_play_trace(self, name):
+        """开始追踪一次播放，未完成的上一次记为被打断"""
+        self.finish_play_trace("interrupted")
+        self.play_trace = METRICS.begin_play(str(name))
+
+    def finish_play_trace(self, outcome="first_audio"):
+        """结束当前播放追踪"""
+        if self.play_trace:
+            self.play_trace.finish(outcome)
+            self.play_trace = None
+
+    def on_position_changed(self, position):
+        """第一次出声时结束播放追踪；临近结尾时预解析下一首的播放链接"""
+        if self.play_trace and position > 0 and self.media_player.playbackState() == self.media_player.PlayingState:
+            self.finish_play_trace()
+        duration = self.media_player.duration()
+        if duration > 0 and not self.next_prefetched and duration - position < 30000:
+            self.next_prefetched = True
+            if 0 <= self.queue_index < len(self.queue) - 1:
+                self.warmup.prefetch_song_urls([self.queue[self.queue_index + 1]["id"]])
+
+    def on_playback_state_changed(self, state):
+        if self.play_trace and state == self.media_player.PlayingState:
+            self.play_trace.mark("playing_state")
+
+    def on_media_status_changed(self, status):
+        """媒体状态变化事件 - 播放结束时自动下一首"""
+        if self.play_trace:
+            phase = {
+                self.media_player.LoadingMedia: "loading",
+                self.media_player.LoadedMedia: "loaded",
+                self.media_player.BufferingMedia: "buffering",
+                self.media_player.BufferedMedia: "buffered",
+            }.get(status)
+            if phase:
+                self.play_trace.mark(phase)
+            elif status == self.media_player.InvalidMedia:
+                self.finish_play_trace("invalid")
+        if status == self.media_player.EndOfMedia:
+            self.play_next()
+        elif status in (self.media_player.LoadedMedia, self.media_player.BufferedMedia) and self.pending_seek is not None:
+            # 媒体加载完成后再跳转到歌词位置
+            self.media_player.setPosition(self.pending_seek)
+            self.pending_seek = None
+
+
+class ControlServer(QObject):
+    """本机IPC控制接口：每行一个JSON请求{"cmd": ..., 参数}，每个请求回复一行JSON(见rtlitectl.py)
+
+    带query的命令先用RemoteSearch在后台搜索，搜索完成后再执行并回复，不阻塞事件循环。
+    """
+    def __init__(self, engine, parent=None):
+        super().__init__(parent)
+        self.engine = engine
+        self.server = None
+        self.remote_search = RemoteSearch(engine.api, self)
+        self.remote_search.finished.connect(self.on_search_finished)
+        self.remote_search.failed.connect(self.on_search_failed)
+        self.search_generation = 0
+        self.pending = {}  # 搜索代号 -> (连接, 请求, 搜索完成后的处理函数)
+        self.commands = {
+            "status": lambda request: engine.status(),
+            "play": self.cmd_play,
+            "pause": lambda request: engine.pause(),
+            "resume": lambda request: engine.resume(),
+            "toggle": lambda request: engine.toggle_play_pause(),
+            "next": lambda request: engine.play_next(),
+            "seek": self.cmd_seek,
+            "volume": lambda request: engine.set_volume(request["value"]),
+            "search": self.cmd_search,
+            "download": self.cmd_download,
+            "downloads": lambda request: engine.downloads.status(),
+        }
+        # 命令带query(且没有id/queue)时先搜索，处理函数收到(请求, 搜索结果)
+        self.search_commands = {
+            "play": self.play_found,
+            "download": self.download_found,
+            "search": self.list_found,
+        }
+
+    def register(self, name, handler):
+        """添加命令(界面模式下的显示窗口、退出等)"""
+        self.commands[name] = handler
+
+    def start(self):
+        """开始监听；已有实例在运行时返回False"""
+        from PySide6.QtNetwork import QLocalServer, QLocalSocket
+        address = control_address()
+        self.server = QLocalServer(self)
+        if not self.server.listen(address):
+            probe = QLocalSocket()
+            probe.connectToServer(address)
+            if probe.waitForConnected(200):
+                probe.disconnectFromServer()
+                print("已有RTLite实例在运行，未启动控制接口")
+                return False
+            # 上次异常退出留下的套接字文件
+            QLocalServer.removeServer(address)
+            if not self.server.listen(address):
+                print(f"控制接口启动失败: {self.server.errorString()}")
+                return False
+        self.server.newConnection.connect(self.on_new_connection)
+        return True
+
+    def stop(self):
+        if self.server is not None:
+            self.server.close()
+
+    def on_new_connection(self):
+        while self.server.hasPendingConnections():
+            socket = self.server.nextPendingConnection()
+            socket.readyRead.connect(lambda socket=socket: self.on_ready_read(socket))
+            socket.disconnected.connect(lambda socket=socket: self.on_disconnected(socket))
+
+    def on_disconnected(self, socket):
+        """连接断开时丢弃它尚未完成的搜索"""
+        self.pending = {generation: item for generation, item in self.pending.items() if item[0] is not socket}
+        socket.deleteLater()
+
+    def on_ready_read(self, socket):
+        while socket.canReadLine():
+            line = bytes(socket.readLine()).decode("utf-8").strip()
+            if not line:
+                continue
             try:
-                # 调用/song/detail接口
-                detail_res = requests.get(
-                    f"{self.api_url}/song/detail", 
-                    params={"ids": song_id}
-                ).json()
-                
-                # 提取封面URL
-                songs_detail = detail_res.get("songs", [])
-                if not songs_detail:
-                    return
-                
-                song_detail = songs_detail[0]
-                cover_url = None
-                if "al" in song_detail and "picUrl" in song_detail["al"]:
-                    cover_url = song_detail["al"]["picUrl"]
-                
-                if not cover_url:
-                    return
-                
-                # 加载封面图片
-                img_data = requests.get(cover_url).content
-                pixmap = QPixmap()
-                pixmap.loadFromData(img_data)
-                
-                # 创建圆形遮罩
-                rounded = QPixmap(60, 60)
-                rounded.fill(Qt.transparent)
-                
-                painter = QPainter(rounded)
-                painter.setRenderHint(QPainter.Antialiasing)
-                painter.setBrush(QBrush(pixmap.scaled(60, 60, Qt.KeepAspectRatioByExpanding, Qt.SmoothTransformation)))
-                painter.setPen(Qt.NoPen)
-                painter.drawRoundedRect(0, 0, 60, 60, 5, 5)
-                painter.end()
-                
-                # 更新UI
-                self.cover_label.setPixmap(rounded)
+                request = json.loads(line)
+                cmd = request.get("cmd")
+                if cmd in self.search_commands and request.get("query") and not (request.get("id") or request.get("queue")):
+                    self.start_search(socket, request)
+                    continue
+                handler = self.commands.get(cmd)
+                if handler is None:
+                    raise ValueError(f"未知命令: {cmd}")
+                reply = {"ok": True, "result": handler(request)}
             except Exception as e:
-                print(f"加载封面失败: {e}")
-        
-        Thread(target=_load, daemon=True).start()
+                reply = {"ok": False, "error": str(e)}
+            self.send(socket, reply)
+
+    def send(self, socket, reply):
+        socket.write((json.dumps(reply, ensure_ascii=False) + "\n").encode("utf-8"))
+        socket.flush()
+
+    def start_search(self, socket, request):
+        self.search_generation += 1
+        self.pending[self.search_generation] = (socket, request, self.search_commands[request["cmd"]])
+        self.engine.history.record_query(request["query"])
+        self.remote_search.start(self.search_generation, request["query"])
+
+    def on_search_finished(self, generation, songs):
+        if generation not in self.pending:
+            return  # 连接已断开
+        socket, request, handler = self.pending.pop(generation)
+        try:
+            reply = {"ok": True, "result": handler(request, songs)}
+        except Exception as e:
+            reply = {"ok": False, "error": str(e)}
+        self.send(socket, reply)
+
+    def on_search_failed(self, generation, error):
+        if generation in self.pending:
+            self.send(self.pending.pop(generation)[0], {"ok": False, "error": f"搜索失败: {error}"})
+
+    def cmd_play(self, request):
+        """play: id播放指定歌曲，都没有则继续播放(带query时见play_found)"""
+        if request.get("id"):
+            self.engine.play_song(request["id"])
+        else:
+            self.engine.resume()
+        return self.engine.status()
+
+    def play_found(self, request, songs):
+        """play --query: 播放搜索结果的第一首"""
+        if not songs:
+            raise ValueError("未找到歌曲")
+        self.engine.play_queue(songs, 0)
+        return self.engine.status()
+
+    def cmd_seek(self, request):
+        """seek: position为绝对位置(秒)，offset为相对当前位置(秒)"""
+        if self.engine.media_player is None:
+            raise ValueError("没有正在播放的歌曲")
+        if "offset" in request:
+            position = self.engine.media_player.position() + float(request["offset"]) * 1000
+        else:
+            position = float(request["position"]) * 1000
+        self.engine.seek(position)
+        return self.engine.status()
+
+    def cmd_download(self, request):
+        """download: ids下载指定歌曲，queue下载当前播放队列(带query时见download_found)"""
+        if request.get("queue"):
+            songs = self.engine.queue
+        else:
+            songs = [{"id": song_id} for song_id in request.get("ids", [])]
+        return {"queued": self.engine.download(songs)}
+
+    def download_found(self, request, songs):
+        """download --query: 下载搜索结果的第一首"""
+        return {"queued": self.engine.download(songs[:1])}
+
+    def cmd_search(self, request):
+        raise ValueError("search需要query")
+
+    def list_found(self, request, songs):
+        limit = int(request.get("limit", 10))
+        return [{
+            "id": song.get("id"),
+            "name": song.get("name"),
+            "artist": ", ".join(a.get("name", "") for a in song.get("artists", song.get("ar", []))),
+            "duration": song.get("duration", song.get("dt", 0)) / 1000,
+        } for song in songs[:limit]]
+
+
+def engine_attribute(name):
+    """把窗口上的属性转发到播放引擎(界面代码沿用原来的属性名)"""
+    return property(lambda self: getattr(self.engine, name), lambda self, value: setattr(self.engine, name, value))
+
+
+# 全局样式表：在QApplication上只解析一次，各窗口的控件通过role属性复用
+APP_STYLESHEET = """
+    QWidget {
+        background: transparent;
+        color: #f0f0f0;
+        font-family: 'Microsoft YaHei', 'Segoe UI', sans-serif;
+    }
+    QLineEdit {
+        background: rgba(255, 255, 255, 0.1);
+        border: 1px solid rgba(255, 255, 255, 0.2);
+        border-radius: 15px;
+        padding: 12px 20px;
+        font-size: 16px;
+        color: white;
+        selection-background-color: rgba(0, 150, 255, 150);
+    }
+    QPushButton {
+        background: rgba(255, 255, 255, 0.1);
+        border: none;
+        border-radius: 15px;
+        padding: 10px 20px;
+        font-size: 16px;
+        color: white;
+    }
+    QPushButton:hover {
+        background: rgba(255, 255, 255, 0.2);
+    }
+    QPushButton:pressed {
+        background: rgba(255, 255, 255, 0.05);
+    }
+    QSlider::groove:horizontal {
+        height: 6px;
+        background: rgba(255, 255, 255, 0.2);
+        border-radius: 3px;
+    }
+    QSlider::handle:horizontal {
+        width: 16px;
+        height: 16px;
+        margin: -5px 0;
+        border-radius: 8px;
+        background: white;
+    }
+    QSlider::sub-page:horizontal {
+        background: qlineargradient(
+            x1:0, y1:0, x2:1, y2:0,
+            stop:0 #00b4ff, stop:1 #0080ff
+        );
+        border-radius: 3px;
+    }
+    QTextEdit {
+        background: rgba(255, 255, 255, 0.05);
+        border: 1px solid rgba(255, 255, 255, 0.1);
+        border-radius: 15px;
+        padding: 15px;
+        font-size: 16px;
+        color: white;
+    }
+    QPushButton[role="primary"] {
+        background: qlineargradient(
+            x1:0, y1:0, x2:1, y2:0,
+            stop:0 #00b4ff, stop:1 #0080ff
+        );
+        border-radius: 15px;
+        padding: 10px 20px;
+        color: white;
+        font-size: 16px;
+        font-weight: bold;
+    }
+    QPushButton[role="primary"]:hover {
+        background: qlineargradient(
+            x1:0, y1:0, x2:1, y2:0,
+            stop:0 #00c4ff, stop:1 #0090ff
+        );
+    }
+    QPushButton[role="secondary"] {
+        background: rgba(255, 255, 255, 0.1);
+        border-radius: 15px;
+        padding: 10px 20px;
+        color: white;
+        font-size: 16px;
+    }
+    QPushButton[role="secondary"]:hover {
+        background: rgba(255, 255, 255, 0.2);
+    }
+    QLabel[role="title"] {
+        color: white;
+        font-size: 18px;
+        font-weight: bold;
+    }
+    QLabel[role="message"] {
+        color: white;
+        font-size: 16px;
+    }
+    QLabel[role="caption"] {
+        font-size: 14px;
+        color: rgba(255, 255, 255, 0.7);
+    }
+    QTextEdit[role="input"] {
+        background: rgba(255, 255, 255, 0.1);
+        border: 1px solid rgba(255, 255, 255, 0.2);
+        border-radius: 10px;
+        padding: 15px;
+        color: white;
+        font-size: 16px;
+    }
+"""
+
+
+class FramelessWindowMixin:
+    """无边框半透明窗口的公共部分：背景和边框按尺寸缓存成位图，拖动交给系统移动窗口"""
+    BACKGROUND_COLOR = QColor(20, 20, 30, 220)
+    BORDER_COLOR = QColor(0, 180, 255, 80)
+    CORNER_RADIUS = 20
+
+    _background_key = None
+    _background_pixmap = None
+    _drag_offset = None
+
+    def background_pixmap(self):
+        """返回当前尺寸的背景位图，尺寸或缩放比例变化时才重新绘制"""
+        ratio = self.devicePixelRatioF()
+        key = (self.width(), self.height(), ratio)
+        if key != self._background_key:
+            pixmap = QPixmap(round(self.width() * ratio), round(self.height() * ratio))
+            pixmap.setDevicePixelRatio(ratio)
+            pixmap.fill(Qt.transparent)
+
+            painter = QPainter(pixmap)
+            painter.setRenderHint(QPainter.Antialiasing)
+            rect = QRect(0, 0, self.width(), self.height())
+
+            # 半透明背景
+            painter.setBrush(QBrush(self.BACKGROUND_COLOR))
+            painter.setPen(Qt.NoPen)
+            painter.drawRoundedRect(rect, self.CORNER_RADIUS, self.CORNER_RADIUS)
+
+            # 边框
+            painter.setBrush(Qt.NoBrush)
+            painter.setPen(self.BORDER_COLOR)
+            painter.drawRoundedRect(rect.adjusted(1, 1, -1, -1), self.CORNER_RADIUS, self.CORNER_RADIUS)
+            painter.end()
+
+            self._background_key = key
+            self._background_pixmap = pixmap
+        return self._background_pixmap
+
+    def paintEvent(self, event):
+        """绘制窗口背景和边框(直接贴缓存位图)"""
+        painter = QPainter(self)
+        painter.drawPixmap(0, 0, self.background_pixmap())
+
+    def mousePressEvent(self, event):
+        """鼠标按下事件(用于窗口拖动，优先使用系统窗口移动)"""
+        if event.button() == Qt.LeftButton:
+            handle = self.windowHandle()
+            if handle is not None and handle.startSystemMove():
+                self._drag_offset = None
+            else:
+                self._drag_offset = event.globalPosition().toPoint() - self.pos()
+            event.accept()
+        else:
+            super().mousePressEvent(event)
+
+    def mouseMoveEvent(self, event):
+        """鼠标移动事件(平台不支持系统移动时手动跟随)"""
+        if event.buttons() & Qt.LeftButton and self._drag_offset is not None:
+            self.move(event.globalPosition().toPoint() - self._drag_offset)
+            event.accept()
+        else:
+            super().mouseMoveEvent(event)
 
+    def mouseReleaseEvent(self, event):
+        """鼠标释放事件"""
+        self._drag_offset = None
+        super().mouseReleaseEvent(event)
 
-class SearchResultsWindow(QWidget):
-    """搜索结果独立窗口"""
-    def __init__(self, parent, songs, api_url):
+
+class SearchResultsWindow(FramelessWindowMixin, QWidget):
+    """搜索结果独立窗口(整个会话只创建一次，每次搜索调用reset复用)"""
+    def __init__(self, parent, api):
         super().__init__()
         self.parent = parent
-        self.api_url = api_url
+        self.api = api
         self.setWindowTitle("搜索结果")
         self.setWindowFlags(Qt.Window | Qt.WindowStaysOnTopHint | Qt.FramelessWindowHint)
         self.setAttribute(Qt.WA_TranslucentBackground)
@@ -187,16 +3384,20 @@ class SearchResultsWindow(QWidget):
         """)
         self.title_bar.setAlignment(Qt.AlignCenter)
         
-        # 窗口拖动相关变量
-        self.drag_position = None
-        
-        # 搜索结果列表
-        self.list_widget = QListWidget()
-        self.list_widget.setVerticalScrollBarPolicy(Qt.ScrollBarAsNeeded)
-        self.list_widget.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        # 搜索结果列表(模型/视图，封面只为可见行按需加载)
+        self.model = SongListModel(self)
+        self.cover_loader = CoverLoader(self.api, parent.ui, parent=self)
+        self.cover_loader.cover_ready.connect(self.model.refresh_song)
+        self.playlist_loader = None
+
+        self.list_view = QListView()
+        self.list_view.setModel(self.model)
+        self.list_view.setItemDelegate(SongItemDelegate(self.cover_loader, self.list_view))
+        self.list_view.setVerticalScrollBarPolicy(Qt.ScrollBarAsNeeded)
+        self.list_view.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
         
-        self.list_widget.setStyleSheet("""
-            QListWidget {
+        self.list_view.setStyleSheet("""
+            QListView {
                 background: rgba(50, 50, 60, 0.7);
                 border-radius: 15px;
                 padding: 10px;
@@ -205,34 +3406,30 @@ class SearchResultsWindow(QWidget):
                 border: 1px solid rgba(255, 255, 255, 0.1);
                 outline: none;
             }
-            QListWidget::item {
+            QListView::item {
                 background: transparent;
                 padding: 5px;
                 border-bottom: 1px solid rgba(255, 255, 255, 0.1);
                 outline: none;
             }
-            QListWidget::item:hover {
+            QListView::item:hover {
                 background: rgba(255, 255, 255, 0.1);
                 border-radius: 10px;
                 outline: none;
             }
-            QListWidget::item:selected {
+            QListView::item:selected {
                 background: rgba(0, 180, 255, 0.3);
                 border-radius: 10px;
                 outline: none;
             }
-            QListWidget::item:focus {
+            QListView::item:focus {
                 outline: none;
             }
         """)
         
         # 设置项高度
-        self.list_widget.setUniformItemSizes(True)
-        self.list_widget.setSpacing(5)
-        
-        # 添加歌曲项
-        for song in songs:
-            self.add_song_item(song)
+        self.list_view.setUniformItemSizes(True)
+        self.list_view.setSpacing(5)
         
         # 播放按钮
         self.btn_play = QPushButton("播放")
@@ -257,56 +3454,58 @@ class SearchResultsWindow(QWidget):
         """)
         
         self.btn_play.clicked.connect(self.on_play)
-        self.list_widget.itemDoubleClicked.connect(self.on_play)
+        self.list_view.doubleClicked.connect(self.on_play)
+        self.list_view.selectionModel().currentChanged.connect(self.on_current_changed)
         
         self.main_layout.addWidget(self.title_bar)
-        self.main_layout.addWidget(self.list_widget)
+        self.main_layout.addWidget(self.list_view)
         self.main_layout.addWidget(self.btn_play)
+
+        # Ctrl+D下载选中的歌曲，Ctrl+Shift+D下载整个列表(搜索结果或歌单)
+        QShortcut(QKeySequence("Ctrl+D"), self, self.download_selected)
+        QShortcut(QKeySequence("Ctrl+Shift+D"), self, lambda: self.download_songs(self.model.songs))
     
-    def add_song_item(self, song):
-        """添加歌曲项到列表"""
-        # 创建自定义Widget
-        item_widget = SongItemWidget(song, self.api_url)
-        
-        # 创建QListWidgetItem
-        item = QListWidgetItem(self.list_widget)
-        item.setSizeHint(QSize(0, 80))  # 设置项高度
-        item.setData(Qt.UserRole, song["id"])  # 存储歌曲ID
-        
-        # 设置项Widget
-        self.list_widget.addItem(item)
-        self.list_widget.setItemWidget(item, item_widget)
-    
-    def paintEvent(self, event):
-        """绘制窗口背景和边框"""
-        painter = QPainter(self)
-        painter.setRenderHint(QPainter.Antialiasing)
-        
-        # 绘制半透明背景
-        painter.setBrush(QBrush(QColor(20, 20, 30, 220)))
-        painter.setPen(Qt.NoPen)
-        painter.drawRoundedRect(self.rect(), 20, 20)
-        
-        # 绘制边框
-        border_gradient = QLinearGradient(0, 0, self.width(), self.height())
-        border_gradient.setColorAt(0, QColor(0, 180, 255, 100))
-        border_gradient.setColorAt(1, QColor(0, 100, 255, 100))
-        
-        painter.setBrush(Qt.NoBrush)
-        painter.setPen(QColor(0, 180, 255, 80))
-        painter.drawRoundedRect(self.rect().adjusted(1, 1, -1, -1), 20, 20)
+    def reset(self, songs, title="搜索结果"):
+        """就地重置结果：停止上一次的歌单加载和封面请求，释放封面"""
+        if self.playlist_loader:
+            self.playlist_loader.cancel()
+            self.playlist_loader = None
+        self.cover_loader.reset()
+        self.model.clear()
+        self.model.append_songs(list(songs))
+        self.title_bar.setText(title)
+        self.list_view.scrollToTop()
 
-    def mousePressEvent(self, event):
-        """鼠标按下事件(用于窗口拖动)"""
-        if event.button() == Qt.LeftButton:
-            self.drag_position = event.globalPosition().toPoint() - self.pos()
-            event.accept()
+    def load_playlist(self, playlist_id):
+        """加载歌单，每页到达后立即显示"""
+        self.reset([], "正在加载歌单...")
+        settings = self.parent.settings
+        self.playlist_loader = PlaylistLoader(
+            self.api, playlist_id,
+            page_size=settings.get("playlist_page_size", 500),
+            concurrency=settings.get("playlist_concurrency", 4)
+        )
+        self.playlist_loader.info_ready.connect(self.on_playlist_info)
+        self.playlist_loader.page_ready.connect(self.model.append_songs)
+        self.playlist_loader.details_ready.connect(self.model.update_songs)
+        self.playlist_loader.failed.connect(self.title_bar.setText)
+        self.playlist_loader.start()
 
-    def mouseMoveEvent(self, event):
-        """鼠标移动事件(用于窗口拖动)"""
-        if event.buttons() & Qt.LeftButton and self.drag_position:
-            self.move(event.globalPosition().toPoint() - self.drag_position)
-            event.accept()
+    def merge_songs(self, songs):
+        """合并后到达的远程结果，跳过与本地结果重复的歌曲"""
+        existing = {self.song_key(song) for song in self.model.songs}
+        self.model.append_songs([song for song in songs if self.song_key(song) not in existing])
+
+    @staticmethod
+    def song_key(song):
+        artists = song.get("ar", song.get("artists", []))
+        artist = artists[0].get("name", "") if artists else ""
+        return (song.get("name", "").strip().lower(), artist.strip().lower())
+
+    def on_playlist_info(self, info):
+        """歌单信息到达(缓存或最新)，重置列表"""
+        self.model.clear()
+        self.title_bar.setText(f"{info.get('name', '歌单')} ({info.get('trackCount', 0)}首)")
 
     def show_cookie_input_dialog(self):
         """显示手动输入Cookie的对话框"""
@@ -364,25 +3563,495 @@ class SearchResultsWindow(QWidget):
             self.parent.update_login_status("已登录")
             self.close()
 
-    def keyPressEvent(self, event):
-        """键盘事件"""
-        if event.key() == Qt.Key_Escape:
-            self.close()
+    def keyPressEvent(self, event):
+        """键盘事件"""
+        if event.key() == Qt.Key_Escape:
+            self.parent.recorder.action("close_results")
+            self.close()
+        else:
+            super().keyPressEvent(event)
+
+    def download_selected(self):
+        index = self.list_view.currentIndex()
+        if index.isValid():
+            self.download_songs([index.data(SongListModel.SongRole)])
+
+    def download_songs(self, songs):
+        added = self.parent.engine.download(songs)
+        self.title_bar.setText(f"已加入下载队列 {added} 首" if added else "所选歌曲都已下载")
+
+    def on_current_changed(self, current, previous):
+        """选中项变化时预解析其播放链接"""
+        song = current.data(SongListModel.SongRole) if current.isValid() else None
+        if current.isValid():
+            self.parent.recorder.action("select_result", row=current.row())
+        if song and song.get("type") != "playlist":
+            self.parent.warmup.prefetch_song_urls([song["id"]])
+
+    def on_play(self):
+        """播放选中的歌曲(或打开选中的歌单)"""
+        selected = self.list_view.currentIndex()
+        if not selected.isValid():
+            return
+        self.parent.recorder.action("play_result", row=selected.row())
+        song = selected.data(SongListModel.SongRole)
+        if song.get("type") == "playlist":
+            self.load_playlist(song["id"])
+            return
+        # 当前列表作为播放队列
+        self.parent.engine.play_queue(self.model.songs, selected.row())
+        self.close()
+
+    def closeEvent(self, event):
+        """关闭时停止歌单加载并释放封面(窗口本身保留复用)"""
+        if self.playlist_loader:
+            self.playlist_loader.cancel()
+        self.cover_loader.reset()
+        self.parent.profiler.action("关闭搜索窗口")
+        super().closeEvent(event)
+
+
+class WaveformSlider(QSlider):
+    """带波形的进度条：有波形文件时按波形绘制，否则与普通QSlider相同
+
+    每个像素列的高度只在换歌或改变宽度时从映射的波形文件计算一次；
+    播放位置变化时只重绘新旧播放头之间的列，重绘开销与歌曲长度无关。
+    """
+    PLAYED_COLOR = QColor(0, 180, 255)
+    PLAYED_RMS_COLOR = QColor(120, 215, 255)
+    REST_COLOR = QColor(255, 255, 255, 70)
+    REST_RMS_COLOR = QColor(255, 255, 255, 130)
+
+    def __init__(self, parent=None):
+        super().__init__(Qt.Horizontal, parent)
+        self.setMinimumHeight(32)
+        self.waveform = None
+        self.column_peaks = []
+        self.column_rms = []
+        self.playhead = 0
+
+    def set_waveform(self, waveform):
+        """更换波形(None恢复普通进度条)"""
+        if self.waveform is not None:
+            self.waveform.close()
+        self.waveform = waveform
+        self.rebuild_columns()
+        self.update()
+
+    def rebuild_columns(self):
+        """把波形柱合并到像素列(每列取最大值)，结果是半高像素数"""
+        self.column_peaks, self.column_rms = [], []
+        if self.waveform is None or self.width() <= 0:
+            return
+        buckets = self.waveform.buckets
+        peaks, rms = self.waveform.peaks, self.waveform.rms
+        scale = (self.height() / 2 - 1) / max(1, max(peaks))
+        width = self.width()
+        for x in range(width):
+            lo = x * buckets // width
+            hi = max(lo + 1, (x + 1) * buckets // width)
+            self.column_peaks.append(max(1, round(max(peaks[lo:hi]) * scale)))
+            self.column_rms.append(round(max(rms[lo:hi]) * scale))
+        self.playhead = self.position_x(self.value())
+
+    def position_x(self, value):
+        return QStyle.sliderPositionFromValue(self.minimum(), self.maximum(), value, self.width())
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.rebuild_columns()
+
+    def sliderChange(self, change):
+        """播放位置变化时只标记新旧播放头之间的区域为脏区域"""
+        if self.waveform is None or change != QSlider.SliderValueChange:
+            if self.waveform is not None:
+                self.playhead = self.position_x(self.value())
+            super().sliderChange(change)
+            return
+        x = self.position_x(self.value())
+        if x != self.playhead:
+            left = min(x, self.playhead)
+            self.update(QRect(left - 1, 0, abs(x - self.playhead) + 3, self.height()))
+            self.playhead = x
+
+    def value_at(self, x):
+        return QStyle.sliderValueFromPosition(self.minimum(), self.maximum(), int(x), self.width())
+
+    def mousePressEvent(self, event):
+        """有波形时点击直接跳到点击位置(拖动同普通进度条：按下、移动预览、松开跳转)"""
+        if self.waveform is None or event.button() != Qt.LeftButton or self.maximum() <= 0:
+            super().mousePressEvent(event)
+            return
+        self.setSliderDown(True)
+        self.setSliderPosition(self.value_at(event.position().x()))
+
+    def mouseMoveEvent(self, event):
+        if self.waveform is None or not self.isSliderDown():
+            super().mouseMoveEvent(event)
+            return
+        self.setSliderPosition(self.value_at(event.position().x()))
+
+    def mouseReleaseEvent(self, event):
+        if self.waveform is None or not self.isSliderDown():
+            super().mouseReleaseEvent(event)
+            return
+        self.setSliderDown(False)
+
+    def paintEvent(self, event):
+        """只绘制脏区域内的像素列"""
+        if self.waveform is None:
+            super().paintEvent(event)
+            return
+        rect = event.rect()
+        start = max(0, rect.left())
+        end = min(len(self.column_peaks), rect.right() + 1)
+        middle = self.height() // 2
+        played = min(max(self.playhead, start), end)
+
+        painter = QPainter(self)
+        for first, last, peak_color, rms_color in ((start, played, self.PLAYED_COLOR, self.PLAYED_RMS_COLOR),
+                                                   (played, end, self.REST_COLOR, self.REST_RMS_COLOR)):
+            if first >= last:
+                continue
+            painter.setPen(peak_color)
+            painter.drawLines([QLine(x, middle - self.column_peaks[x], x, middle + self.column_peaks[x])
+                               for x in range(first, last)])
+            painter.setPen(rms_color)
+            painter.drawLines([QLine(x, middle - self.column_rms[x], x, middle + self.column_rms[x])
+                               for x in range(first, last) if self.column_rms[x]])
+        if start <= self.playhead < end:
+            painter.setPen(Qt.white)
+            painter.drawLine(self.playhead, 0, self.playhead, self.height())
+
+
+class SpectrumView(QWidget):
+    """频谱和电平显示：叠加在封面下部，数据来自播放器的音频缓冲输出(Qt 6.8+的QAudioBufferOutput)
+
+    音频缓冲只写入环形缓冲区；按限定帧率取最新的几帧一起做加窗FFT，按对数频段取最大值后
+    平滑下落。除FFT结果外所有数组都预先分配，绘制时只更新预先创建的矩形。
+    暂停、隐藏或窗口进入后台时停止定时器并断开缓冲输出，Qt不再为其转换音频。
+    """
+    MAX_FPS = 60
+    SAMPLE_RATE = 44100
+    FFT_SIZE = 2048
+    BATCH = 3               # 每帧分析的FFT帧数(依次错开HOP，覆盖两次刷新之间的音频)
+    HOP = 512
+    RING_SIZE = 1 << 14
+    BANDS = 32
+    MIN_FREQ = 40
+    MAX_FREQ = 16000
+    RANGE_DB = 60           # 显示范围(满刻度以下)
+    FALL_PER_SEC = 1.2      # 每秒下落的高度(满高为1)
+    LEVEL_HEIGHT = 4
+    BAR_COLOR = QColor(0, 180, 255, 200)
+    LEVEL_COLOR = QColor(255, 255, 255, 160)
+
+    def __init__(self, fps=30, parent=None):
+        super().__init__(parent)
+        self.setAttribute(Qt.WA_TransparentForMouseEvents)
+        self.np = None
+        self.media_player = None
+        self.buffer_output = None
+        self.running = False
+        self.active = False
+        self.written = 0
+        self.analyzed = 0
+        self.level = 0.0
+        self.bars = [QRectF() for _ in range(self.BANDS)]
+        self.level_bar = QRectF()
+
+        self.clock = QElapsedTimer()
+        self.frame_timer = QTimer(self)
+        self.frame_timer.setTimerType(Qt.PreciseTimer)
+        self.frame_timer.timeout.connect(self.advance)
+        self.fps = max(1, min(int(fps), self.MAX_FPS))
+        self.frame_timer.setInterval(round(1000 / self.fps))
+
+    def prepare(self):
+        """首次启动时导入NumPy并分配分析用的数组"""
+        if self.np is not None:
+            return
+        import numpy as np  # 延迟导入，未开启频谱时不加载
+        self.np = np
+        self.ring = np.zeros(self.RING_SIZE, dtype=np.float32)
+        # 各FFT帧在环形缓冲区中相对最新采样的位置，每帧加上写入位置后取模
+        starts = np.arange(self.BATCH - 1, -1, -1) * self.HOP + self.FFT_SIZE
+        self.offsets = np.arange(self.FFT_SIZE) - starts[:, None]
+        self.indices = np.empty_like(self.offsets)
+        self.frames = np.empty((self.BATCH, self.FFT_SIZE), dtype=np.float32)
+        self.window = np.hanning(self.FFT_SIZE).astype(np.float32)
+        self.window_power = float(np.dot(self.window, self.window))
+        self.magnitude = np.empty((self.BATCH, self.FFT_SIZE // 2 + 1))
+        self.peak = np.empty(self.FFT_SIZE // 2 + 1)
+
+        # 对数分布的频段边界(每个频段至少一个频点)
+        freqs = np.fft.rfftfreq(self.FFT_SIZE, 1 / self.SAMPLE_RATE)
+        edges = np.searchsorted(freqs, np.geomspace(self.MIN_FREQ, self.MAX_FREQ, self.BANDS + 1))
+        steps = np.arange(len(edges))
+        edges = np.maximum.accumulate(edges - steps) + steps
+        self.edges = edges[:-1]
+        self.top = int(edges[-1])
+        self.bands = np.empty(self.BANDS)
+        self.levels = np.zeros(self.BANDS)
+        self.reference = float(self.window.sum()) / 2  # 满幅正弦波的幅度谱峰值
+
+    def attach(self, media_player):
+        """播放器创建后记录下来，运行时才接上缓冲输出"""
+        self.media_player = media_player
+        self.sync()
+
+    def set_running(self, running):
+        """播放中且窗口在前台时为True"""
+        self.running = running
+        self.sync()
+
+    def sync(self):
+        """按播放状态和可见性启停分析"""
+        active = self.running and self.isVisible() and self.media_player is not None
+        if active == self.active:
+            return
+        if active and self.buffer_output is None and not self.create_output():
+            return
+        self.active = active
+        if active:
+            self.prepare()
+            self.media_player.setAudioBufferOutput(self.buffer_output)
+            self.clock.start()
+            self.frame_timer.start()
         else:
-            super().keyPressEvent(event)
+            self.frame_timer.stop()
+            self.media_player.setAudioBufferOutput(None)
+            self.written = self.analyzed = 0
+            self.level = 0.0
+            if self.np is not None:
+                self.levels.fill(0.0)
+                self.layout_bars()
+            self.update()
 
-    def on_play(self):
-        """播放选中的歌曲"""
-        selected = self.list_widget.currentItem()
-        if selected:
-            self.parent.play_song(selected.data(Qt.UserRole))
-            self.close()
+    def create_output(self):
+        """创建转换为单声道float的缓冲输出，Qt版本不支持时隐藏频谱"""
+        try:
+            from PySide6.QtMultimedia import QAudioBufferOutput, QAudioFormat
+        except ImportError:
+            print("当前Qt版本不支持音频缓冲输出(需要6.8以上)，频谱不可用")
+            self.hide()
+            return False
+        fmt = QAudioFormat()
+        fmt.setSampleRate(self.SAMPLE_RATE)
+        fmt.setChannelCount(1)
+        fmt.setSampleFormat(QAudioFormat.Float)
+        self.buffer_output = QAudioBufferOutput(fmt, self)
+        self.buffer_output.audioBufferReceived.connect(self.on_buffer)
+        return True
+
+    def on_buffer(self, buffer):
+        """把一块解码后的音频写入环形缓冲区(只复制，不分析)"""
+        samples = self.np.frombuffer(buffer.constData(), dtype=self.np.float32)
+        if len(samples) > self.RING_SIZE:
+            self.written += len(samples) - self.RING_SIZE
+            samples = samples[-self.RING_SIZE:]
+        start = self.written % self.RING_SIZE
+        first = min(len(samples), self.RING_SIZE - start)
+        self.ring[start:start + first] = samples[:first]
+        self.ring[:len(samples) - first] = samples[first:]
+        self.written += len(samples)
+
+    def advance(self):
+        """帧定时器回调：有新音频时批量FFT，否则只让频谱下落"""
+        np = self.np
+        elapsed = self.clock.restart() / 1000
+        np.subtract(self.levels, self.FALL_PER_SEC * elapsed, out=self.levels)
+        self.level = max(0.0, self.level - self.FALL_PER_SEC * elapsed)
+        if self.written != self.analyzed and self.written >= self.FFT_SIZE:
+            self.analyzed = self.written
+            np.add(self.offsets, self.written, out=self.indices)
+            np.remainder(self.indices, self.RING_SIZE, out=self.indices)
+            np.take(self.ring, self.indices, out=self.frames)
+            np.multiply(self.frames, self.window, out=self.frames)
+            newest = self.frames[-1]
+            rms = (float(np.dot(newest, newest)) / self.window_power) ** 0.5
+            self.level = max(self.level, self.scale(20 * math.log10(max(rms, 1e-9))))
+
+            np.abs(np.fft.rfft(self.frames, axis=1), out=self.magnitude)
+            np.max(self.magnitude, axis=0, out=self.peak)
+            np.maximum.reduceat(self.peak[:self.top], self.edges, out=self.bands)
+            # 幅度 -> 满刻度dB -> 0..1
+            np.multiply(self.bands, 1 / self.reference, out=self.bands)
+            np.maximum(self.bands, 1e-9, out=self.bands)
+            np.log10(self.bands, out=self.bands)
+            np.multiply(self.bands, 20 / self.RANGE_DB, out=self.bands)
+            np.add(self.bands, 1, out=self.bands)
+            np.maximum(self.levels, self.bands, out=self.levels)
+        elif not self.levels.any() and not self.level:
+            return  # 没有新音频且已经落到底，不必重绘
+        np.clip(self.levels, 0.0, 1.0, out=self.levels)
+        self.layout_bars()
+        self.update()
+
+    def scale(self, db):
+        return min(1.0, max(0.0, 1 + db / self.RANGE_DB))
+
+    def layout_bars(self):
+        """按当前电平更新预先创建的矩形"""
+        bottom = self.height() - self.LEVEL_HEIGHT - 4
+        slot = self.width() / self.BANDS
+        for i, (bar, level) in enumerate(zip(self.bars, self.levels.tolist())):
+            height = level * bottom
+            bar.setRect(i * slot + 1, bottom - height, slot - 2, height)
+        self.level_bar.setRect(0, self.height() - self.LEVEL_HEIGHT, self.level * self.width(), self.LEVEL_HEIGHT)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.sync()
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.sync()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        if self.np is not None:
+            self.layout_bars()
+
+    def paintEvent(self, event):
+        if not self.active:
+            return
+        painter = QPainter(self)
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(self.BAR_COLOR)
+        painter.drawRects(self.bars)
+        painter.setBrush(self.LEVEL_COLOR)
+        painter.drawRect(self.level_bar)
+
+
+class RotatingCover(QWidget):
+    """旋转封面：封面只在更换时预渲染成圆盘，旋转时按限定帧率重绘自身区域"""
+    MAX_FPS = 60
+
+    def __init__(self, size=300, fps=30, period_ms=20000, parent=None):
+        super().__init__(parent)
+        self.setFixedSize(size, size)
+        self.period_ms = period_ms  # 转一圈的毫秒数
+        self.angle = 0.0
+        self.rotating = False
+        self.disc = None
+        self.background = None
+
+        # 按真实经过时间计算角度，掉帧时转速不变
+        self.clock = QElapsedTimer()
+        self.base_angle = 0.0
+        self.frame_timer = QTimer(self)
+        self.frame_timer.setTimerType(Qt.PreciseTimer)
+        self.frame_timer.timeout.connect(self.advance)
+        self.set_fps(fps)
+
+    def set_fps(self, fps):
+        """设置帧率上限，0表示不旋转"""
+        self.fps = max(0, min(int(fps), self.MAX_FPS))
+        if self.fps:
+            self.frame_timer.setInterval(round(1000 / self.fps))
+        else:
+            self.frame_timer.stop()
+
+    def set_cover(self, pixmap):
+        """预渲染圆形封面，之后每帧只需要旋转贴图"""
+        ratio = self.devicePixelRatioF()
+        side = round(self.width() * ratio)
+        source = pixmap.scaled(side, side, Qt.KeepAspectRatioByExpanding, Qt.SmoothTransformation)
+
+        disc = QPixmap(side, side)
+        disc.fill(Qt.transparent)
+        painter = QPainter(disc)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setRenderHint(QPainter.SmoothPixmapTransform)
+        painter.setBrush(QBrush(source))
+        painter.setPen(Qt.NoPen)
+        painter.drawEllipse(0, 0, side, side)
+        painter.end()
+        disc.setDevicePixelRatio(ratio)
+
+        self.disc = disc
+        self.update()
+
+    def start(self):
+        """开始(或继续)旋转"""
+        if self.rotating or not self.fps:
+            return
+        self.rotating = True
+        self.base_angle = self.angle
+        self.clock.start()
+        if self.isVisible():
+            self.frame_timer.start()
+
+    def pause(self):
+        """暂停旋转，保留当前角度"""
+        self.rotating = False
+        self.frame_timer.stop()
+
+    def stop(self):
+        """停止旋转并回到初始角度"""
+        self.pause()
+        self.angle = 0.0
+        self.update()
+
+    def advance(self):
+        """帧定时器回调：根据经过时间更新角度"""
+        elapsed = self.clock.elapsed()
+        self.angle = (self.base_angle + elapsed * 360.0 / self.period_ms) % 360.0
+        self.update()
+
+    def showEvent(self, event):
+        """重新可见时恢复帧定时器"""
+        super().showEvent(event)
+        if self.rotating:
+            self.frame_timer.start()
+
+    def hideEvent(self, event):
+        """不可见时停止帧定时器"""
+        super().hideEvent(event)
+        self.frame_timer.stop()
+
+    def paintEvent(self, event):
+        """绘制底板和旋转后的封面"""
+        painter = QPainter(self)
+        if self.background is None or self.background.size() != self.size():
+            self.background = QPixmap(self.size())
+            self.background.fill(Qt.transparent)
+            bg_painter = QPainter(self.background)
+            bg_painter.setRenderHint(QPainter.Antialiasing)
+            bg_painter.setBrush(QColor(0, 0, 0, 76))
+            bg_painter.setPen(Qt.NoPen)
+            bg_painter.drawRoundedRect(self.rect(), 15, 15)
+            bg_painter.end()
+        painter.drawPixmap(0, 0, self.background)
+        if self.disc is None:
+            return
+
+        half = self.width() / 2
+        painter.setRenderHint(QPainter.SmoothPixmapTransform)
+        painter.translate(half, half)
+        painter.rotate(self.angle)
+        painter.drawPixmap(QRectF(-half, -half, self.width(), self.height()), self.disc, QRectF(self.disc.rect()))
 
-class ModernMusicPlayer(QWidget):
-    COOKIE_FILE = "user_cookie.json"  # Cookie保存文件名
+
+class ModernMusicPlayer(FramelessWindowMixin, QWidget):
+    PLAYLIST_PATTERN = re.compile(r"(?:playlist\?id=|playlist[:：/]|^歌单[:：]?\s*)(\d+)")
+
+    media_player = engine_attribute("media_player")
+    audio_output = engine_attribute("audio_output")
+    cookies = engine_attribute("cookies")
+    playing = engine_attribute("playing")
+    current_song = engine_attribute("current_song")
+    pending_seek = engine_attribute("pending_seek")
+    play_trace = engine_attribute("play_trace")
+    queue = engine_attribute("queue")
+    queue_index = engine_attribute("queue_index")
+    queue_version = engine_attribute("queue_version")
+    next_prefetched = engine_attribute("next_prefetched")
     
-    def __init__(self):
+    def __init__(self, options=None):
         super().__init__()
+        self.options = options or parse_args([])[0]
         self.setWindowTitle("RTLite")
         self.resize(1000, 600)
         self.setMinimumSize(800, 500)
@@ -392,19 +4061,66 @@ class ModernMusicPlayer(QWidget):
             Qt.WindowSystemMenuHint
         )
         self.setAttribute(Qt.WA_TranslucentBackground)
-        self.api_url = "https://ncm.zhenxin.me"
-        
-        # 初始化播放器
-        self.media_player = QMediaPlayer()
-        self.audio_output = QAudioOutput()
-        self.media_player.setAudioOutput(self.audio_output)
-        self.audio_output.setVolume(1.0)  # 默认音量100%
 
-        self.playing = False
-        self.current_song = None
+        # 工作线程的界面更新统一经由分发器回到GUI线程
+        self.ui = UiDispatcher(self)
 
-        # 初始化时尝试加载cookie
-        self.cookies = self.load_cookie()
+        # 播放、队列、API和本地库由引擎负责(播放器在首帧之后再创建)，界面只跟随引擎的信号
+        self.engine = PlayerEngine(self.options, parent=self)
+        self.engine.media_ready.connect(self.on_media_ready)
+        self.engine.song_changed.connect(self.on_song_changed)
+        self.engine.playing_changed.connect(self.on_playing_changed)
+        self.engine.volume_changed.connect(self.volume_slider_follow)
+        self.engine.message.connect(lambda text, msg_type: self.show_message(text, msg_type))
+        self.engine.analyzer.waveform_ready.connect(self.on_waveform_ready)
+        self.api_url = self.engine.api_url
+        self.settings = self.engine.settings
+        self.cache = self.engine.cache
+        self.api = self.engine.api
+        self.warmup = self.engine.warmup
+        self.library = self.engine.library
+        self.history = self.engine.history
+        self.control_server = ControlServer(self.engine, self)
+        self.control_server.register("toggle", lambda request: self.toggle_play_pause())
+        self.control_server.register("show", self.on_control_show)
+        self.control_server.register("quit", lambda request: QTimer.singleShot(0, self.quit_app))
+
+        self.first_frame_shown = False
+        self.cover_generation = 0
+        self.background_mode = False  # 窗口隐藏时只跟踪播放状态
+
+        self.lyrics_index = LyricsIndex(os.path.join(get_data_dir(), "lyrics.db"))
+        self.warmup.lyrics_index = self.lyrics_index
+        self.remote_search = RemoteSearch(self.api, self)
+        self.remote_search.finished.connect(self.on_remote_search_finished)
+        self.remote_search.failed.connect(self.on_remote_search_failed)
+        self.search_generation = 0
+        self.search_has_local = False
+        self.search_window = None
+
+        # 上次播放状态(退出时和播放中定期保存)
+        self.session_store = SessionStore(get_data_dir())
+        self.restored_session = None
+        self.session_timer = QTimer(self)
+        self.session_timer.setInterval(30000)
+        self.session_timer.timeout.connect(self.save_session)
+
+        # 性能分析(--profile启动时开始，Ctrl+Shift+P随时开始/停止)
+        self.profiler = Profiler(self.options.profile or "cpu", os.path.join(get_data_dir(), "profiles"))
+        if self.options.profile:
+            self.profiler.start()
+
+        # 会话录制(--record)，用于无界面回放的性能回归测试
+        self.recorder = SessionRecorder(self.options.record)
+        if self.recorder.enabled:
+            self.api.recorder = self.recorder
+
+        # 界面卡顿检测(默认关闭)
+        self.watchdog = StallWatchdog(
+            self.settings.get("stall_threshold_ms", 200),
+            log_path=os.path.join(get_data_dir(), "stalls.log"),
+            parent=self
+        )
 
         # 初始化UI
         self.init_ui()
@@ -413,16 +4129,27 @@ class ModernMusicPlayer(QWidget):
         # 连接信号槽
         self.connect_signals()
 
-        # 键盘监听
+        # 键盘监听(首帧之后启动)
         self.key_listener = KeyListenerThread()
         self.key_listener.toggle_visibility.connect(self.toggle_visibility)
-        self.key_listener.start()
 
         # 歌词数据
         self.lyrics_data = []
+        self.lyric_times = []
+        self.lyric_times_source = None
         self.lyric_index = -1
         self.user_is_seeking = False
 
+        # 进度刷新按帧合并，每帧最多更新一次界面
+        self.pending_position = 0
+        self.progress_timer = QTimer(self)
+        self.progress_timer.setSingleShot(True)
+        self.progress_timer.setInterval(16)
+        self.progress_timer.timeout.connect(self.flush_progress)
+
+        # 用上次的快照填充界面(不联网)
+        self.restore_session()
+
     def init_ui(self):
         """初始化所有UI组件"""
         # 主布局
@@ -439,65 +4166,6 @@ class ModernMusicPlayer(QWidget):
         # 设置主布局
         self.setLayout(self.main_layout)
 
-        # 窗口样式
-        self.setStyleSheet("""
-            QWidget {
-                background: transparent;
-                color: #f0f0f0;
-                font-family: 'Microsoft YaHei', 'Segoe UI', sans-serif;
-            }
-            QLineEdit {
-                background: rgba(255, 255, 255, 0.1);
-                border: 1px solid rgba(255, 255, 255, 0.2);
-                border-radius: 15px;
-                padding: 12px 20px;
-                font-size: 16px;
-                color: white;
-                selection-background-color: rgba(0, 150, 255, 150);
-            }
-            QPushButton {
-                background: rgba(255, 255, 255, 0.1);
-                border: none;
-                border-radius: 15px;
-                padding: 10px 20px;
-                font-size: 16px;
-                color: white;
-            }
-            QPushButton:hover {
-                background: rgba(255, 255, 255, 0.2);
-            }
-            QPushButton:pressed {
-                background: rgba(255, 255, 255, 0.05);
-            }
-            QSlider::groove:horizontal {
-                height: 6px;
-                background: rgba(255, 255, 255, 0.2);
-                border-radius: 3px;
-            }
-            QSlider::handle:horizontal {
-                width: 16px;
-                height: 16px;
-                margin: -5px 0;
-                border-radius: 8px;
-                background: white;
-            }
-            QSlider::sub-page:horizontal {
-                background: qlineargradient(
-                    x1:0, y1:0, x2:1, y2:0,
-                    stop:0 #00b4ff, stop:1 #0080ff
-                );
-                border-radius: 3px;
-            }
-            QTextEdit {
-                background: rgba(255, 255, 255, 0.05);
-                border: 1px solid rgba(255, 255, 255, 0.1);
-                border-radius: 15px;
-                padding: 15px;
-                font-size: 16px;
-                color: white;
-            }
-        """)
-
     def init_left_panel(self):
         """初始化左侧面板"""
         left_panel = QFrame()
@@ -512,20 +4180,18 @@ class ModernMusicPlayer(QWidget):
         left_layout.setContentsMargins(20, 20, 20, 20)
         left_layout.setSpacing(20)
 
-        # 封面图
-        self.cover_label = QLabel()
-        self.cover_label.setAlignment(Qt.AlignCenter)
-        self.cover_label.setFixedSize(300, 300)
-        self.cover_label.setScaledContents(True)
-        self.cover_label.setStyleSheet("""
-            background: rgba(0, 0, 0, 0.3);
-            border-radius: 15px;
-        """)
-        
+        # 封面图(播放时旋转)
+        self.cover_view = RotatingCover(300, self.settings.get("cover_fps", 30))
+
         # 默认封面
         default_cover = QPixmap(300, 300)
         default_cover.fill(QColor(50, 50, 60))
-        self.cover_label.setPixmap(default_cover)
+        self.cover_view.set_cover(default_cover)
+
+        # 频谱(叠加在封面下部)
+        self.spectrum_view = SpectrumView(self.settings.get("spectrum_fps", 30), self.cover_view)
+        self.spectrum_view.setGeometry(0, 200, 300, 100)
+        self.spectrum_view.setVisible(bool(self.settings.get("spectrum_visualizer")))
 
         # 歌曲信息
         self.song_label = QLabel("未播放")
@@ -546,7 +4212,7 @@ class ModernMusicPlayer(QWidget):
         """)
 
         # 添加到左侧布局
-        left_layout.addWidget(self.cover_label)
+        left_layout.addWidget(self.cover_view, alignment=Qt.AlignHCenter)
         left_layout.addWidget(self.song_label)
         left_layout.addWidget(self.artist_label)
         left_layout.addStretch()
@@ -574,6 +4240,49 @@ class ModernMusicPlayer(QWidget):
         self.search_input.setClearButtonEnabled(True)
         self.search_input.setStyleSheet("font-size: 16px;")
 
+        # 歌词搜索模式(离线搜索已缓存的歌词)
+        self.lyric_mode_button = QPushButton("歌词")
+        self.lyric_mode_button.setCheckable(True)
+        self.lyric_mode_button.setFixedHeight(45)
+        self.lyric_mode_button.setToolTip("按歌词搜索已播放过的歌曲")
+        self.lyric_mode_button.setStyleSheet("""
+            QPushButton {
+                background: rgba(255, 255, 255, 0.1);
+                font-size: 14px;
+                padding: 10px 14px;
+            }
+            QPushButton:checked {
+                background: rgba(0, 180, 255, 0.5);
+            }
+        """)
+        self.lyric_mode_button.toggled.connect(self.on_lyric_mode_toggled)
+        # 历史联想(只查内存索引)
+        self.suggestion_model = QStandardItemModel(self)
+        self.completer = QCompleter(self.suggestion_model, self)
+        self.completer.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
+        self.completer.setCompletionRole(Qt.UserRole)
+        self.completer.setMaxVisibleItems(8)
+        self.completer.setWidget(self.search_input)
+        self.completer.popup().setStyleSheet("""
+            QListView {
+                background: rgba(30, 30, 40, 0.95);
+                border: 1px solid rgba(255, 255, 255, 0.2);
+                color: white;
+                font-size: 15px;
+                padding: 5px;
+            }
+            QListView::item:selected {
+                background: rgba(0, 180, 255, 0.3);
+            }
+        """)
+        self.search_input.textEdited.connect(self.update_suggestions)
+        self.completer.activated[QModelIndex].connect(self.on_suggestion_activated)
+
+        search_row = QHBoxLayout()
+        search_row.setSpacing(10)
+        search_row.addWidget(self.search_input, stretch=1)
+        search_row.addWidget(self.lyric_mode_button)
+
         # 搜索按钮
         self.search_button = QPushButton("搜索")
         self.search_button.setFixedHeight(45)
@@ -619,14 +4328,17 @@ class ModernMusicPlayer(QWidget):
         progress_layout.setSpacing(10)
         
         self.time_current = QLabel("00:00")
-        self.time_current.setStyleSheet("font-size: 14px; color: rgba(255, 255, 255, 0.7);")
+        self.time_current.setProperty("role", "caption")
         self.time_current.setFixedWidth(50)
         
-        self.progress_slider = QSlider(Qt.Horizontal)
-        self.progress_slider.setRange(0, 100)
+        # 进度条以毫秒为单位，范围在时长确定后设置
+        self.progress_slider = WaveformSlider()
+        self.progress_slider.setRange(0, 0)
+        self.progress_slider.setSingleStep(1000)
+        self.progress_slider.setPageStep(10000)
         
         self.time_total = QLabel("00:00")
-        self.time_total.setStyleSheet("font-size: 14px; color: rgba(255, 255, 255, 0.7);")
+        self.time_total.setProperty("role", "caption")
         self.time_total.setFixedWidth(50)
         
         progress_layout.addWidget(self.time_current)
@@ -721,7 +4433,7 @@ class ModernMusicPlayer(QWidget):
         # 初始化完成后更新登录状态
         if self.cookies:
             self.update_login_status("已登录")  # 会自动触发获取用户名逻辑
-        right_layout.addWidget(self.search_input)
+        right_layout.addLayout(search_row)
         right_layout.addWidget(self.search_button)
         right_layout.addWidget(self.lyrics_display, stretch=1)
         right_layout.addWidget(control_panel)
@@ -740,27 +4452,16 @@ class ModernMusicPlayer(QWidget):
             # 异步获取用户名
             def get_username():
                 try:
-                    # 将cookie字典转换为字符串格式
-                    cookie_str = "; ".join([f"{k}={v}" for k, v in self.cookies.items()])
-                    headers = {
-                        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-                        "Cookie": cookie_str
-                    }
-                    response = requests.get(
-                        f"{self.api_url}/user/account",
-                        headers=headers
-                    )
-                    if response.status_code == 200:
-                        data = response.json()
-                        if data.get('code') == 200:
-                            nickname = data.get('profile', {}).get('nickname', '用户')
-                            self.login_status.setText(f"你好！{nickname}")
-                            return
+                    data = self.api.get_json("/user/account", auth=True, ttl=3600)
+                    if data.get('code') == 200:
+                        nickname = (data.get('profile') or {}).get('nickname', '用户')
+                        self.ui.post("login_status", self.login_status.setText, f"你好！{nickname}")
+                        return
                     # 如果获取失败，显示默认状态
-                    self.login_status.setText("已登录")
+                    self.ui.post("login_status", self.login_status.setText, "已登录")
                 except Exception as e:
                     print(f"获取用户名失败: {e}")
-                    self.login_status.setText("已登录")
+                    self.ui.post("login_status", self.login_status.setText, "已登录")
             
             Thread(target=get_username, daemon=True).start()
         else:
@@ -768,15 +4469,6 @@ class ModernMusicPlayer(QWidget):
 
     def init_animations(self):
         """初始化动画效果"""
-        # 封面旋转动画
-        self.cover_rotation = 0
-        self.cover_animation = QPropertyAnimation(self.cover_label, b"rotation")
-        self.cover_animation.setDuration(20000)  # 20秒一圈
-        self.cover_animation.setStartValue(0)
-        self.cover_animation.setEndValue(360)
-        self.cover_animation.setLoopCount(-1)  # 无限循环
-        self.cover_animation.setEasingCurve(QEasingCurve.Linear)
-
         # 按钮悬停动画
         self.button_hover_anim = QPropertyAnimation(self.play_pause_button, b"geometry")
         self.button_hover_anim.setDuration(200)
@@ -785,38 +4477,78 @@ class ModernMusicPlayer(QWidget):
     def connect_signals(self):
         """连接所有信号槽"""
         self.search_button.clicked.connect(self.search_and_play)
+        self.search_input.returnPressed.connect(self.search_and_play)
+        QShortcut(QKeySequence("Ctrl+Shift+P"), self, self.profiler.toggle)
+        QShortcut(QKeySequence("Ctrl+D"), self, self.download_queue)
+        QShortcut(QKeySequence("Ctrl+Shift+V"), self, self.toggle_spectrum)
         self.play_pause_button.clicked.connect(self.toggle_play_pause)
         self.volume_slider.valueChanged.connect(self.update_volume)
         
         self.progress_slider.sliderPressed.connect(self.on_slider_pressed)
         self.progress_slider.sliderReleased.connect(self.on_slider_released)
         self.progress_slider.sliderMoved.connect(self.on_slider_moved)
-        
+        self.progress_slider.actionTriggered.connect(self.on_slider_action)
+
+    def paintEvent(self, event):
+        """绘制窗口，首帧画完后再初始化其余子系统"""
+        super().paintEvent(event)
+        if not self.first_frame_shown:
+            self.first_frame_shown = True
+            STARTUP_TRACE.mark("first_frame")
+            QTimer.singleShot(0, self.deferred_init)
+
+    def deferred_init(self):
+        """首帧之后的初始化：播放器、全局热键、本地库扫描和历史加载"""
+        self.init_media()
+        STARTUP_TRACE.mark("media")
+        self.key_listener.start()
+        self.session_timer.start()
+        self.control_server.start()
+        QTimer.singleShot(0, self.engine.downloads.resume)
+        if self.options.watchdog or self.settings.get("stall_watchdog"):
+            self.watchdog.start()
+        QTimer.singleShot(0, self.library.rescan)
+        QTimer.singleShot(0, self.history.load_async)
+        STARTUP_TRACE.mark("deferred_init")
+        STARTUP_TRACE.report()
+
+    def init_media(self):
+        """创建播放器(重复调用无副作用)"""
+        self.engine.init_media()
+
+    def on_media_ready(self):
+        """引擎创建播放器后连接界面需要的信号"""
         self.media_player.positionChanged.connect(self.on_position_changed)
         self.media_player.durationChanged.connect(self.on_duration_changed)
         self.media_player.playbackStateChanged.connect(self.on_playback_state_changed)
+        self.spectrum_view.attach(self.media_player)
 
-    def paintEvent(self, event):
-        """绘制窗口背景和边框"""
-        painter = QPainter(self)
-        painter.setRenderHint(QPainter.Antialiasing)
-        
-        # 绘制半透明背景
-        painter.setBrush(QBrush(QColor(20, 20, 30, 220)))
-        painter.setPen(Qt.NoPen)
-        painter.drawRoundedRect(self.rect(), 20, 20)
-        
-        # 绘制边框
-        border_gradient = QLinearGradient(0, 0, self.width(), self.height())
-        border_gradient.setColorAt(0, QColor(0, 180, 255, 100))
-        border_gradient.setColorAt(1, QColor(0, 100, 255, 100))
-        
-        painter.setBrush(Qt.NoBrush)
-        painter.setPen(QColor(0, 180, 255, 80))
-        painter.drawRoundedRect(self.rect().adjusted(1, 1, -1, -1), 20, 20)
+    def toggle_spectrum(self):
+        """显示/隐藏频谱(Ctrl+Shift+V)"""
+        self.spectrum_view.setVisible(self.spectrum_view.isHidden())
+
+    def download_queue(self):
+        """下载当前播放队列(Ctrl+D)"""
+        songs = self.queue or ([self.current_song] if self.current_song else [])
+        if not songs:
+            return
+        added = self.engine.download(songs)
+        self.show_message(f"已加入下载队列 {added} 首" if added else "队列中的歌曲都已下载")
+
+    def on_control_show(self, request):
+        """IPC的show命令：显示并激活窗口"""
+        self.show()
+        self.raise_()
+        self.activateWindow()
+
+    def quit_app(self):
+        """关闭窗口并退出(IPC的quit命令)"""
+        self.close()
+        QApplication.quit()
 
     def toggle_visibility(self):
         """切换窗口可见性"""
+        self.recorder.action("toggle_visibility")
         try:
             if self.isVisible():
                 # 先关闭所有子窗口
@@ -839,132 +4571,305 @@ class ModernMusicPlayer(QWidget):
         except Exception as e:
             print(f"切换可见性出错: {e}")
 
-    def show_search_results(self, songs):
+    def get_search_window(self):
+        """获取(首次使用时创建)会话内唯一的结果窗口"""
+        if self.search_window is None:
+            self.search_window = SearchResultsWindow(self, self.api)
+        self.profiler.action("打开搜索窗口")
+        return self.search_window
+
+    def show_search_results(self, songs, title="搜索结果"):
         """显示搜索结果窗口"""
-        self.search_window = SearchResultsWindow(self, songs, self.api_url)
-        self.search_window.show()
+        window = self.get_search_window()
+        window.reset(songs, title)
+        window.show()
+        window.raise_()
+        self.warmup.prefetch_song_urls(song["id"] for song in songs)
 
-    def play_song(self, song_id):
-        """播放指定ID的歌曲"""
-        try:
-            # 获取歌曲详情
-            detail_res = requests.get(f"{self.api_url}/song/detail", params={"ids": song_id}).json()
-            songs_detail = detail_res.get("songs", [])
-            if not songs_detail:
-                self.show_message("无法获取歌曲详情", "error")
-                return
-            
-            detail = songs_detail[0]
-            song_name = detail["name"]
-            artist_name = detail["ar"][0]["name"] if detail.get("ar") else "未知艺术家"
+    def on_song_changed(self, song):
+        """引擎开始播放新歌曲：更新标题、封面和歌词"""
+        self.restored_session = None
+        if not song.get("local_path"):
+            self.profiler.action("播放", every=10)
+        self.song_label.setText(song["name"])
+        self.artist_label.setText(song["ar"][0]["name"] if song.get("ar") else "未知艺术家")
 
-            # 获取播放链接 - 分离cookies和headers
-            headers = {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-            }
-            cookies = None
-            if hasattr(self, 'cookies') and self.cookies:
-                cookies = {
-                    "MUSIC_U": self.cookies['MUSIC_U'],
-                    "NMTID": self.cookies['NMTID']
-                }
-            
-            url_res = requests.get(f"{self.api_url}/song/url", params={'id': song_id}, headers=headers, cookies=cookies).json()
-            song_url = url_res.get("data", [{}])[0].get("url")
-            if not song_url:
-                self.show_message("无法获取播放链接", "error")
-                return
+        # 本地文件显示波形(尚未生成时分析完成后显示)
+        self.progress_slider.set_waveform(self.engine.analyzer.waveform(song["id"]) if song.get("local_path") else None)
 
-            # 更新UI
-            self.song_label.setText(song_name)
-            self.artist_label.setText(artist_name)
-            
-            # 加载封面
-            if "al" in detail and "picUrl" in detail["al"]:
-                self.load_cover(detail["al"]["picUrl"])
+        if song.get("local_path"):
+            self.cover_generation += 1  # 丢弃尚未显示的在线封面
+            if song.get("local_art"):
+                self.set_cover_image(QImage(song["local_art"]))
             else:
                 self.reset_cover()
+            self.load_local_lyrics(song["local_path"])
+            return
 
-            # 加载歌词
-            self.load_lyrics(song_id)
+        # 加载封面
+        if "al" in song and "picUrl" in song["al"]:
+            self.load_cover(song["al"]["picUrl"])
+        else:
+            self.cover_generation += 1
+            self.reset_cover()
 
-            # 播放音乐
-            self.media_player.setSource(QUrl(song_url))
-            self.media_player.play()
-            self.playing = True
-            self.play_pause_button.setText("⏸")
-            self.cover_animation.start()
+        # 加载歌词
+        self.load_lyrics(song["id"])
 
-        except Exception as e:
-            self.show_message(f"请求失败: {str(e)}", "error")
+    def load_local_lyrics(self, local_path):
+        """读取本地文件同名的.lrc歌词"""
+        lrc_path = os.path.splitext(local_path)[0] + ".lrc"
+        self.lyrics_data = []
+        self.lyric_index = -1
+        try:
+            with open(lrc_path, "r", encoding="utf-8") as f:
+                self.lyrics_data = self.parse_lyrics(f.read())
+        except OSError:
+            pass
+        self.lyrics_display.setText("\n".join([line for _, line in self.lyrics_data]) if self.lyrics_data else "无歌词")
+
+    def on_waveform_ready(self, song_id):
+        if self.current_song and str(self.current_song.get("id")) == song_id and self.current_song.get("local_path"):
+            self.progress_slider.set_waveform(self.engine.analyzer.waveform(song_id))
+
+    def on_playing_changed(self, playing):
+        self.play_pause_button.setText("⏸" if playing else "▶")
+        self.sync_cover_animation()
+
+    def volume_slider_follow(self, value):
+        """音量由IPC等其他来源修改时同步滑块"""
+        if self.volume_slider.value() != value:
+            self.volume_slider.setValue(value)
 
     def search_and_play(self):
         """搜索音乐并显示结果列表"""
         keyword = self.search_input.text().strip()
+        self.recorder.action("search", keyword=keyword, lyric_mode=self.lyric_mode_button.isChecked())
         if not keyword:
-            QMessageBox.warning(self, "提示", "请输入歌曲名称")
+            # 已登录时空搜索显示每日推荐(通常已被预热)
+            if self.cookies:
+                self.show_daily_recommendations()
+            else:
+                QMessageBox.warning(self, "提示", "请输入歌曲名称")
+            return
+
+        if self.lyric_mode_button.isChecked():
+            self.search_lyrics(keyword)
+            return
+
+        # 歌单链接或"歌单:ID"直接加载歌单，"我的歌单"列出用户歌单
+        playlist_match = self.PLAYLIST_PATTERN.search(keyword)
+        if playlist_match:
+            self.show_playlist(int(playlist_match.group(1)))
+            return
+        if keyword in ("歌单", "我的歌单") and self.cookies:
+            self.show_user_playlists()
             return
 
+        self.history.record_query(keyword)
+
+        # 先显示本地结果，远程结果到达后合并
+        self.search_generation += 1
+        self.search_has_local = False
         try:
-            # 搜索歌曲 - 分离cookies和headers
-            headers = {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-            }
-            cookies = None
-            if hasattr(self, 'cookies') and self.cookies:
-                cookies = {
-                    "MUSIC_U": self.cookies['MUSIC_U'],
-                    "NMTID": self.cookies['NMTID']
-                }
-                
-            res = requests.get(f"{self.api_url}/search", params={"keywords": keyword}, headers=headers, cookies=cookies).json()
-            songs = res.get("result", {}).get("songs", [])
-            if not songs:
-                self.show_message("未找到歌曲", "warning")
-                return
-            
+            local_songs = self.library.search(keyword)
+        except Exception as e:
+            print(f"本地搜索失败: {e}")
+            local_songs = []
+        if local_songs:
+            self.search_has_local = True
+            self.show_search_results(local_songs)
+
+        self.warmup.notify_foreground()
+        self.remote_search.start(self.search_generation, keyword)
+
+    def update_suggestions(self, text):
+        """按键时根据历史记录显示联想"""
+        self.suggestion_model.clear()
+        entries = self.history.suggest(text) if self.history.loaded else []
+        if not entries:
+            self.completer.popup().hide()
+            return
+        for entry in entries:
+            prefix = "♪ " if entry["kind"] == "song" else "🕘 "
+            item = QStandardItem(prefix + entry["text"])
+            item.setData(entry["text"] if entry["kind"] == "query" else text, Qt.UserRole)
+            item.setData(entry, Qt.UserRole + 1)
+            self.suggestion_model.appendRow(item)
+        self.completer.complete()
+
+    def on_suggestion_activated(self, index):
+        """选择联想项：历史歌曲直接播放，历史搜索词重新搜索"""
+        entry = index.data(Qt.UserRole + 1)
+        if not entry:
+            return
+        if entry["kind"] == "song" and entry.get("song"):
+            self.recorder.action("play_history", song=entry["song"])
+            self.engine.play_queue([entry["song"]], 0)
+        else:
+            self.search_input.setText(entry["text"])
+            self.search_and_play()
+
+    def on_lyric_mode_toggled(self, checked):
+        """切换歌词搜索模式"""
+        self.search_input.setPlaceholderText("🔍 输入一句歌词..." if checked else "🔍 搜索歌曲、歌手或专辑...")
+
+    def search_lyrics(self, keyword):
+        """在本地歌词索引中搜索(不访问网络)"""
+        songs = self.lyrics_index.search(keyword)
+        if not songs:
+            self.show_message("没有找到包含该歌词的歌曲", "warning")
+            return
+        self.show_search_results(songs, "歌词搜索结果")
+
+    def on_remote_search_finished(self, generation, songs):
+        """远程搜索完成"""
+        if generation != self.search_generation:
+            return  # 已有更新的搜索
+        self.warmup.foreground_done()
+        if self.search_has_local and self.search_window and self.search_window.isVisible():
+            self.search_window.merge_songs(songs)
+            self.warmup.prefetch_song_urls(song["id"] for song in songs)
+        elif songs:
             # 显示搜索结果对话框
             self.show_search_results(songs)
+        elif not self.search_has_local:
+            self.show_message("未找到歌曲", "warning")
 
-        except Exception as e:
-            self.show_message(f"请求失败: {str(e)}", "error")
+    def on_remote_search_failed(self, generation, error):
+        """远程搜索失败"""
+        if generation != self.search_generation:
+            return
+        self.warmup.foreground_done()
+        if not self.search_has_local:
+            self.show_message(f"请求失败: {error}", "error")
+
+    def show_daily_recommendations(self):
+        """显示每日推荐歌曲(缓存未过期时直接显示，否则在后台请求)"""
+        cached = self.api.cached_json("/recommend/songs", auth=True)
+        if cached is not None:
+            self.on_daily_recommendations(cached)
+            return
+        self.fetch_in_background("daily", lambda: self.api.get_json(
+            "/recommend/songs", auth=True, ttl=seconds_until_daily_refresh()), self.on_daily_recommendations)
+
+    def on_daily_recommendations(self, res):
+        songs = res.get("data", {}).get("dailySongs", [])
+        if not songs:
+            self.show_message("获取每日推荐失败", "warning")
+            return
+        self.api.store_song_details(songs)
+        self.show_search_results(songs)
+
+    def fetch_in_background(self, key, fetch, on_done):
+        """在工作线程中请求接口，结果(或错误提示)经UiDispatcher回到界面；请求期间预热让出网络"""
+        self.warmup.notify_foreground()
+
+        def _run():
+            try:
+                result = fetch()
+            except ValueError as e:
+                self.ui.post(key, self.show_message, str(e), "warning")
+            except Exception as e:
+                self.ui.post(key, self.show_message, f"请求失败: {str(e)}", "error")
+            else:
+                self.ui.post(key, on_done, result)
+            finally:
+                self.warmup.foreground_done()
+
+        Thread(target=_run, daemon=True).start()
+
+    def show_playlist(self, playlist_id):
+        """在结果窗口中分页加载歌单"""
+        window = self.get_search_window()
+        window.load_playlist(playlist_id)
+        window.show()
+        window.raise_()
+
+    def show_user_playlists(self):
+        """列出用户歌单，双击打开(缓存未过期时直接显示，否则在后台请求)"""
+        try:
+            cached = self.fetch_user_playlists(cache_only=True)
+        except ValueError as e:
+            self.show_message(str(e), "warning")
+            return
+        if cached is not None:
+            self.on_user_playlists(cached)
+            return
+        self.fetch_in_background("playlists", self.fetch_user_playlists, self.on_user_playlists)
+
+    def fetch_user_playlists(self, cache_only=False):
+        """请求账号和歌单列表；cache_only时只查缓存，有任一项未缓存返回None"""
+        def get(path, params=None):
+            if cache_only:
+                return self.api.cached_json(path, params, auth=True)
+            return self.api.get_json(path, params=params, auth=True, ttl=3600)
+
+        account = get("/user/account")
+        if account is None:
+            return None
+        uid = (account.get("account") or {}).get("id") or (account.get("profile") or {}).get("userId")
+        if not uid:
+            raise ValueError("获取用户信息失败")
+        res = get("/user/playlist", {"uid": uid})
+        if res is None:
+            return None
+        return [{
+            "type": "playlist",
+            "id": pl["id"],
+            "name": pl.get("name", "歌单"),
+            "ar": [{"name": f"{pl.get('trackCount', 0)}首"}],
+            "al": {"picUrl": pl.get("coverImgUrl", "")},
+            "dt": 0,
+        } for pl in res.get("playlist", [])]
+
+    def on_user_playlists(self, playlists):
+        if not playlists:
+            self.show_message("没有歌单", "warning")
+            return
+        self.show_search_results(playlists, "我的歌单")
 
     def load_cover(self, url):
-        """加载封面图片"""
+        """后台加载封面图片(工作线程只解码QImage，显示交给GUI线程)"""
+        self.cover_generation += 1
+        generation = self.cover_generation
+
         def _load():
             try:
-                img_data = requests.get(url).content
-                pixmap = QPixmap()
-                pixmap.loadFromData(img_data)
-                
-                # 创建圆形遮罩
-                rounded = QPixmap(pixmap.size())
-                rounded.fill(Qt.transparent)
-                
-                painter = QPainter(rounded)
-                painter.setRenderHint(QPainter.Antialiasing)
-                painter.setBrush(QBrush(pixmap))
-                painter.setPen(Qt.NoPen)
-                painter.drawRoundedRect(pixmap.rect(), 15, 15)
-                painter.end()
-                
-                self.cover_label.setPixmap(rounded)
+                image = QImage.fromData(self.api.get_bytes(url))
             except Exception as e:
                 print(f"加载封面失败: {e}")
-                self.reset_cover()
+                image = QImage()
+            self.ui.post("cover", self.on_cover_loaded, generation, image)
 
         Thread(target=_load, daemon=True).start()
 
+    def on_cover_loaded(self, generation, image):
+        """显示后台加载的封面，已切歌时丢弃"""
+        if generation == self.cover_generation:
+            self.set_cover_image(image)
+
+    def set_cover_image(self, image):
+        """显示封面图片(QImage)"""
+        if image.isNull():
+            self.reset_cover()
+        else:
+            self.set_cover_pixmap(QPixmap.fromImage(image))
+
+    def set_cover_pixmap(self, pixmap):
+        """显示封面(由封面控件预渲染成圆盘)"""
+        self.cover_view.set_cover(pixmap)
+
     def reset_cover(self):
         """重置封面为默认图片"""
         default_cover = QPixmap(300, 300)
         default_cover.fill(QColor(50, 50, 60))
-        self.cover_label.setPixmap(default_cover)
+        self.cover_view.set_cover(default_cover)
 
     def load_lyrics(self, song_id):
         """加载歌词"""
         try:
-            res = requests.get(f"{self.api_url}/lyric", params={"id": song_id}).json()
+            res = self.api.lyric(song_id)
             lrc_str = res.get("lrc", {}).get("lyric", "")
             
             if not lrc_str:
@@ -976,6 +4881,10 @@ class ModernMusicPlayer(QWidget):
             self.lyric_index = -1
             self.lyrics_display.setText("\n".join([line for _, line in self.lyrics_data]))
 
+            # 写入本地歌词索引，供离线按歌词搜索
+            if self.current_song and str(self.current_song.get("id")) == str(song_id):
+                self.lyrics_index.add(self.current_song, res)
+
         except Exception as e:
             print(f"加载歌词失败: {e}")
             self.lyrics_display.setText("无歌词")
@@ -983,40 +4892,140 @@ class ModernMusicPlayer(QWidget):
 
     def parse_lyrics(self, lrc_text):
         """解析歌词文本"""
-        import re
-        pattern = re.compile(r"\[(\d+):(\d+)\.(\d+)\](.*)")
-        lyrics = []
-        
-        for line in lrc_text.splitlines():
-            m = pattern.match(line)
-            if m:
-                minutes = int(m.group(1))
-                seconds = int(m.group(2))
-                millis = int(m.group(3))
-                text = m.group(4).strip()
-                time_sec = minutes * 60 + seconds + millis / 1000
-                lyrics.append((time_sec, text))
-        
-        lyrics.sort(key=lambda x: x[0])
-        return lyrics
+        return parse_lrc(lrc_text)
+
+    def session_snapshot(self):
+        """当前播放状态的快照"""
+        song = self.current_song
+        if self.restored_session:
+            position = self.restored_session.get("position", 0)
+            duration = self.restored_session.get("duration", 0)
+        elif self.media_player is not None:
+            position = self.media_player.position()
+            duration = self.media_player.duration()
+        else:
+            position = duration = 0
+
+        snapshot = {
+            "song": SessionStore.snapshot_song(song) if song else None,
+            "position": position,
+            "duration": duration,
+            "volume": self.volume_slider.value(),
+            "queue_index": self.queue_index,
+        }
+        # 封面和歌词只记录引用，内容在缓存里
+        if song and song.get("local_art"):
+            snapshot["cover"] = {"local_art": song["local_art"]}
+        elif song and (song.get("al") or {}).get("picUrl"):
+            snapshot["cover"] = {"url": song["al"]["picUrl"]}
+        if song and song.get("local_path"):
+            snapshot["lyrics"] = {"lrc_path": os.path.splitext(song["local_path"])[0] + ".lrc"}
+        elif song:
+            snapshot["lyrics"] = {"song_id": song.get("id")}
+        return snapshot
+
+    def save_session(self):
+        """保存播放状态快照"""
+        if not self.current_song:
+            return
+        self.session_store.save(self.session_snapshot(), self.queue, f"{os.getpid()}:{self.queue_version}")
+
+    def restore_session(self):
+        """从快照恢复歌曲信息、封面、歌词、进度、音量和队列，不访问网络"""
+        snapshot = self.session_store.load()
+        if not snapshot:
+            return
+        self.volume_slider.setValue(snapshot.get("volume", 100))
+        song = snapshot.get("song")
+        if not song:
+            return
+
+        self.current_song = song
+        self.restored_session = snapshot
+        self.queue = snapshot.get("queue", [])
+        self.queue_index = snapshot.get("queue_index", -1) if self.queue else -1
+        self.song_label.setText(song.get("name", "未知歌曲"))
+        self.artist_label.setText(song["ar"][0]["name"] if song.get("ar") else "未知艺术家")
+
+        # 封面：本地封面文件或缓存中的图片
+        cover = snapshot.get("cover") or {}
+        image = QImage()
+        if cover.get("local_art"):
+            image.load(cover["local_art"])
+        elif cover.get("url"):
+            data = self.cache.get_bytes("bytes", cover["url"])
+            if data:
+                image.loadFromData(data)
+        self.set_cover_image(image)
+
+        # 歌词：同名.lrc文件或缓存中的歌词
+        lyrics = snapshot.get("lyrics") or {}
+        lrc_text = ""
+        if lyrics.get("lrc_path"):
+            try:
+                with open(lyrics["lrc_path"], "r", encoding="utf-8") as f:
+                    lrc_text = f.read()
+            except OSError:
+                pass
+        elif lyrics.get("song_id") is not None:
+            res = self.api.cached_lyric(lyrics["song_id"])
+            lrc_text = (res or {}).get("lrc", {}).get("lyric", "")
+        self.lyrics_data = self.parse_lyrics(lrc_text) if lrc_text else []
+        self.lyric_index = -1
+        self.lyrics_display.setText("\n".join([line for _, line in self.lyrics_data]) if self.lyrics_data else "无歌词")
+
+        # 进度
+        position, duration = snapshot.get("position", 0), snapshot.get("duration", 0)
+        if duration > 0:
+            self.progress_slider.setRange(0, duration)
+            self.progress_slider.setValue(position)
+            self.time_total.setText(self.format_time(duration))
+            self.time_current.setText(self.format_time(position))
+        self.update_lyric_for_position(position)
+
+    def resume_session(self):
+        """播放恢复的歌曲：此时才解析播放链接(过期的链接会重新获取)，并跳到保存的位置"""
+        snapshot = self.restored_session
+        song = snapshot["song"]
+        position = snapshot.get("position", 0) or None
+        if song.get("local_path"):
+            if not os.path.exists(song["local_path"]):
+                self.restored_session = None
+                self.show_message("本地文件已不存在", "error")
+                return
+            self.pending_seek = position
+            self.engine.play_local(song)
+        else:
+            self.api.store_song_details([song])
+            self.engine.play_song(song["id"], position)
+
+    def closeEvent(self, event):
+        """关闭时保存播放状态"""
+        self.save_session()
+        if self.watchdog.running:
+            self.watchdog.stop()
+            print(self.watchdog.summary())
+        if self.options.trace_out:
+            METRICS.export_chrome_trace(self.options.trace_out)
+            print(METRICS.summary())
+        self.profiler.stop()
+        self.recorder.save(logged_in=bool(self.cookies))
+        self.control_server.stop()
+        super().closeEvent(event)
 
     def toggle_play_pause(self):
         """切换播放/暂停状态"""
-        if self.playing:
-            self.media_player.pause()
-            self.play_pause_button.setText("▶")
-            self.playing = False
-            self.cover_animation.pause()
-        else:
-            self.media_player.play()
-            self.play_pause_button.setText("⏸")
-            self.playing = True
-            self.cover_animation.resume()
+        self.recorder.action("toggle_play")
+        if self.restored_session and not self.playing:
+            # 恢复的会话还没有播放源，此时才重新获取播放链接
+            self.resume_session()
+            return
+        self.engine.toggle_play_pause()
 
     def update_volume(self, value):
         """更新音量"""
-        volume = value / 100
-        self.audio_output.setVolume(volume)
+        self.recorder.action("volume", value=value)
+        self.engine.set_volume(value)
         self.volume_label.setText(f"{value}%")
         
         # 更新音量按钮图标
@@ -1034,61 +5043,143 @@ class ModernMusicPlayer(QWidget):
         self.user_is_seeking = True
 
     def on_slider_released(self):
-        """进度条释放事件"""
+        """进度条释放事件(拖动过程只预览，松开时才跳转一次)"""
         if self.media_player.duration() > 0:
-            new_pos = int(self.media_player.duration() * self.progress_slider.value() / 100)
-            self.media_player.setPosition(new_pos)
+            self.recorder.action("seek", position=self.progress_slider.value())
+            self.media_player.setPosition(self.progress_slider.value())
         self.user_is_seeking = False
 
     def on_slider_moved(self, value):
-        """进度条拖动事件"""
+        """进度条拖动事件，预览目标时间和歌词"""
         if self.media_player.duration() > 0:
-            pos = int(self.media_player.duration() * value / 100)
-            self.time_current.setText(self.format_time(pos))
+            self.update_time_label(value)
+            self.update_lyric_for_position(value)
+
+    def on_slider_action(self, action):
+        """点击进度条空白处或键盘步进时直接跳转"""
+        if self.user_is_seeking or action in (QSlider.SliderNoAction, QSlider.SliderMove):
+            return
+        if self.media_player.duration() > 0:
+            self.recorder.action("seek", position=self.progress_slider.sliderPosition())
+            self.media_player.setPosition(self.progress_slider.sliderPosition())
 
     def on_position_changed(self, position):
-        """播放位置变化事件"""
+        """播放位置变化事件(播放追踪和下一首预解析由引擎处理)"""
         if self.user_is_seeking:
             return
 
-        duration = self.media_player.duration()
-        if duration > 0:
-            # 更新进度条
-            self.progress_slider.blockSignals(True)
-            self.progress_slider.setValue(int(position / duration * 100))
-            self.progress_slider.blockSignals(False)
-            
-            # 更新时间显示
-            self.time_current.setText(self.format_time(position))
+        # 后台模式只跟踪播放状态，界面在重新显示时一次性更新
+        if self.background_mode:
+            return
+        self.pending_position = position
+        if not self.progress_timer.isActive():
+            self.progress_timer.start()
 
-        # 更新歌词
-        if not self.lyrics_data:
+    def flush_progress(self):
+        """每帧最多执行一次的进度刷新"""
+        if self.user_is_seeking or self.background_mode:
             return
+        self.refresh_progress(self.pending_position)
 
-        pos_sec = position / 1000
-        index = 0
-        for i, (time_sec, _) in enumerate(self.lyrics_data):
-            if time_sec > pos_sec:
-                break
-            index = i
+    def refresh_progress(self, position):
+        """更新进度条、时间和当前歌词，只在显示内容变化时重绘"""
+        if self.media_player.duration() > 0:
+            self.update_slider_position(position)
+            self.update_time_label(position)
+        self.update_lyric_for_position(position)
+
+    def update_slider_position(self, position):
+        """滑块像素位置变化时才更新进度条"""
+        slider = self.progress_slider
+        span = slider.width()
+        old_pixel = QStyle.sliderPositionFromValue(slider.minimum(), slider.maximum(), slider.value(), span)
+        new_pixel = QStyle.sliderPositionFromValue(slider.minimum(), slider.maximum(), position, span)
+        if old_pixel == new_pixel:
+            return
+        slider.blockSignals(True)
+        slider.setValue(position)
+        slider.blockSignals(False)
+
+    def update_time_label(self, position):
+        """显示的秒数变化时才更新时间标签"""
+        text = self.format_time(position)
+        if text != self.time_current.text():
+            self.time_current.setText(text)
+
+    def update_lyric_for_position(self, position):
+        """二分查找当前歌词行，行号变化时才刷新歌词显示"""
+        if not self.lyrics_data:
+            return
+        if self.lyric_times_source is not self.lyrics_data:
+            self.lyric_times_source = self.lyrics_data
+            self.lyric_times = [time_sec for time_sec, _ in self.lyrics_data]
 
+        index = max(bisect_right(self.lyric_times, position / 1000) - 1, 0)
         if index != self.lyric_index:
             self.lyric_index = index
             self.update_lyrics_display()
 
     def on_duration_changed(self, duration):
         """歌曲时长变化事件"""
+        if self.background_mode:
+            return
+        self.progress_slider.blockSignals(True)
+        self.progress_slider.setRange(0, max(duration, 0))
+        self.progress_slider.blockSignals(False)
         self.time_total.setText(self.format_time(duration))
 
     def on_playback_state_changed(self, state):
         """播放状态变化事件"""
-        if state == QMediaPlayer.PlayingState:
-            self.cover_animation.start()
-        elif state == QMediaPlayer.PausedState:
-            self.cover_animation.pause()
-        else:  # StoppedState
-            self.cover_animation.stop()
-            self.cover_label.setPixmap(self.cover_label.pixmap())  # 重置旋转
+        self.sync_cover_animation()
+
+    def sync_cover_animation(self):
+        """根据播放状态和窗口是否可见启停封面旋转和频谱"""
+        if self.media_player is None:
+            return
+        state = self.media_player.playbackState()
+        self.spectrum_view.set_running(state == self.media_player.PlayingState and not self.background_mode)
+        if state == self.media_player.PlayingState and not self.background_mode:
+            self.cover_view.start()
+        elif state == self.media_player.StoppedState:
+            self.cover_view.stop()
+        else:
+            self.cover_view.pause()
+
+    def set_background_mode(self, enabled):
+        """窗口隐藏/最小化时进入后台模式，暂停所有仅用于界面的更新和动画"""
+        if enabled == self.background_mode:
+            return
+        self.background_mode = enabled
+        if enabled:
+            self.sync_cover_animation()
+        else:
+            self.catch_up_ui()
+
+    def catch_up_ui(self):
+        """从后台模式恢复时，一次性把界面更新到当前播放状态"""
+        if self.media_player is None:
+            return
+        self.on_duration_changed(self.media_player.duration())
+        self.play_pause_button.setText("⏸" if self.playing else "▶")
+        self.lyric_index = -1
+        self.refresh_progress(self.media_player.position())
+        self.sync_cover_animation()
+
+    def showEvent(self, event):
+        """窗口显示事件"""
+        super().showEvent(event)
+        self.set_background_mode(self.isMinimized())
+
+    def hideEvent(self, event):
+        """窗口隐藏事件"""
+        super().hideEvent(event)
+        self.set_background_mode(True)
+
+    def changeEvent(self, event):
+        """窗口状态变化事件(最小化也视为后台)"""
+        if event.type() == QEvent.WindowStateChange:
+            self.set_background_mode(self.isMinimized() or not self.isVisible())
+        super().changeEvent(event)
 
     def update_lyrics_display(self):
         if not self.lyrics_data:
@@ -1153,18 +5244,6 @@ class ModernMusicPlayer(QWidget):
         
         msg.exec()
 
-    def mousePressEvent(self, event):
-        """鼠标按下事件(用于窗口拖动)"""
-        if event.button() == Qt.LeftButton:
-            self.offset = event.globalPosition().toPoint() - self.pos()
-            event.accept()
-
-    def mouseMoveEvent(self, event):
-        """鼠标移动事件(用于窗口拖动)"""
-        if event.buttons() & Qt.LeftButton:
-            self.move(event.globalPosition().toPoint() - self.offset)
-            event.accept()
-
     def keyPressEvent(self, event):
         """键盘事件"""
         if event.key() == Qt.Key_Escape:
@@ -1177,43 +5256,16 @@ class ModernMusicPlayer(QWidget):
         else:
             super().keyPressEvent(event)
 
-    def load_cookie(self):
-        """从注册表加载cookie"""
-        try:
-            import winreg
-            key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, r"Software\RTLite", 0, winreg.KEY_READ)
-            value, _ = winreg.QueryValueEx(key, "Cookie")
-            winreg.CloseKey(key)
-            return {
-                "MUSIC_U": value.split("MUSIC_U=")[1].split(";")[0] if "MUSIC_U=" in value else "",
-                "NMTID": value.split("NMTID=")[1].split(";")[0] if "NMTID=" in value else ""
-            }
-        except WindowsError as e:
-            if e.errno == 2:  # 键不存在
-                return None
-            print(f"从注册表加载cookie失败: {e}")
-            return None
-        except Exception as e:
-            print(f"加载cookie失败: {e}")
-            return None
-        
     def save_cookie(self, cookie):
-        """保存cookie到注册表"""
-        try:
-            import winreg
-            key = winreg.CreateKey(winreg.HKEY_CURRENT_USER, r"Software\RTLite")
-            winreg.SetValueEx(key, "Cookie", 0, winreg.REG_SZ, cookie)
-            winreg.CloseKey(key)
-        except Exception as e:
-            print(f"保存cookie到注册表失败: {e}")
+        """保存cookie(登录窗口调用)"""
+        self.engine.save_cookie(cookie)
 
-class QRLoginWindow(QWidget):
+class QRLoginWindow(FramelessWindowMixin, QWidget):
     """二维码登录窗口"""
     def __init__(self, api_url, parent=None):
         super().__init__(parent)
         self.api_url = api_url
         self.parent = parent
-        self.drag_position = None  # 初始化拖动位置变量
         self.setWindowTitle("扫码登录")
         self.setWindowFlags(Qt.Window | Qt.WindowStaysOnTopHint | Qt.FramelessWindowHint)
         self.setAttribute(Qt.WA_TranslucentBackground)
@@ -1226,13 +5278,7 @@ class QRLoginWindow(QWidget):
         
         # 标题
         self.title_label = QLabel("扫码登录")
-        self.title_label.setStyleSheet("""
-            QLabel {
-                color: white;
-                font-size: 18px;
-                font-weight: bold;
-            }
-        """)
+        self.title_label.setProperty("role", "title")
         self.title_label.setAlignment(Qt.AlignCenter)
         
         # 二维码标签 - 添加鼠标点击事件
@@ -1248,28 +5294,12 @@ class QRLoginWindow(QWidget):
         
         # 状态标签
         self.status_label = QLabel("正在生成二维码...")
-        self.status_label.setStyleSheet("""
-            QLabel {
-                color: white;
-                font-size: 16px;
-            }
-        """)
+        self.status_label.setProperty("role", "message")
         self.status_label.setAlignment(Qt.AlignCenter)
         
         # 手动输入Cookie按钮
         self.manual_cookie_btn = QPushButton("手动输入Cookie")
-        self.manual_cookie_btn.setStyleSheet("""
-            QPushButton {
-                background: rgba(255, 255, 255, 0.1);
-                border-radius: 15px;
-                padding: 10px 20px;
-                color: white;
-                font-size: 16px;
-            }
-            QPushButton:hover {
-                background: rgba(255, 255, 255, 0.2);
-            }
-        """)
+        self.manual_cookie_btn.setProperty("role", "secondary")
         # 确保连接正确并添加调试输出
         def on_manual_cookie_click():
             self.show_cookie_input_dialog()
@@ -1277,18 +5307,7 @@ class QRLoginWindow(QWidget):
         
         # 关闭按钮
         self.close_button = QPushButton("关闭")
-        self.close_button.setStyleSheet("""
-            QPushButton {
-                background: rgba(255, 255, 255, 0.1);
-                border-radius: 15px;
-                padding: 10px 20px;
-                color: white;
-                font-size: 16px;
-            }
-            QPushButton:hover {
-                background: rgba(255, 255, 255, 0.2);
-            }
-        """)
+        self.close_button.setProperty("role", "secondary")
         self.close_button.clicked.connect(self.close)
         
         # 添加到布局
@@ -1303,6 +5322,7 @@ class QRLoginWindow(QWidget):
     
     def start_login(self):
         """启动扫码登录流程"""
+        import requests
         # 获取二维码key
         try:
             # 添加时间戳防止缓存
@@ -1383,27 +5403,12 @@ class QRLoginWindow(QWidget):
         
         # 标题
         title = QLabel("请输入网易云音乐Cookie:")
-        title.setStyleSheet("""
-            QLabel {
-                color: white;
-                font-size: 18px;
-                font-weight: bold;
-            }
-        """)
+        title.setProperty("role", "title")
         
         # 多行输入框
         text_edit = QTextEdit()
-        text_edit.setStyleSheet("""
-            QTextEdit {
-                background: rgba(255, 255, 255, 0.1);
-                border: 1px solid rgba(255, 255, 255, 0.2);
-                border-radius: 10px;
-                padding: 15px;
-                color: white;
-                font-size: 16px;
-                min-height: 200px;
-            }
-        """)
+        text_edit.setProperty("role", "input")
+        text_edit.setMinimumHeight(200)
         text_edit.setLineWrapMode(QTextEdit.WidgetWidth)
         
         # 按钮布局
@@ -1412,40 +5417,11 @@ class QRLoginWindow(QWidget):
         
         # 确认按钮
         btn_ok = QPushButton("确定")
-        btn_ok.setStyleSheet("""
-            QPushButton {
-                background: qlineargradient(
-                    x1:0, y1:0, x2:1, y2:0,
-                    stop:0 #00b4ff, stop:1 #0080ff
-                );
-                border-radius: 15px;
-                padding: 10px 20px;
-                color: white;
-                font-size: 16px;
-                font-weight: bold;
-            }
-            QPushButton:hover {
-                background: qlineargradient(
-                    x1:0, y1:0, x2:1, y2:0,
-                    stop:0 #00c4ff, stop:1 #0090ff
-                );
-            }
-        """)
+        btn_ok.setProperty("role", "primary")
         
         # 取消按钮
         btn_cancel = QPushButton("取消")
-        btn_cancel.setStyleSheet("""
-            QPushButton {
-                background: rgba(255, 255, 255, 0.1);
-                border-radius: 15px;
-                padding: 10px 20px;
-                color: white;
-                font-size: 16px;
-            }
-            QPushButton:hover {
-                background: rgba(255, 255, 255, 0.2);
-            }
-        """)
+        btn_cancel.setProperty("role", "secondary")
         
         btn_layout.addWidget(btn_ok)
         btn_layout.addWidget(btn_cancel)
@@ -1517,6 +5493,7 @@ class QRLoginWindow(QWidget):
     
     def timerEvent(self, event):
         """定时器事件 - 检查登录状态"""
+        import requests
         if event.timerId() == self.check_timer:
             try:
                 # 添加时间戳和noCookie参数防止502错误
@@ -1597,22 +5574,21 @@ class QRLoginWindow(QWidget):
                                 self.parent.update_login_status("已登录")
                         
                         get_user_info()  # 立即执行
-                        # 尝试播放一首歌测试登录状态
+                        # 获取每日推荐测试登录状态，结果写入缓存供之后使用
                         try:
-                            headers = {
-                                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-                                "Cookie": cookie
-                            }
-                            test_res = requests.get(
-                                f"{self.api_url}/recommend/songs",
-                                headers=headers
-                            ).json()
+                            test_res = self.parent.api.get_json(
+                                "/recommend/songs",
+                                auth=True,
+                                ttl=seconds_until_daily_refresh()
+                            )
                             if test_res.get("code") == 200:
                                 self.status_label.setText("登录成功！")
+                                self.parent.api.store_song_details(test_res.get("data", {}).get("dailySongs", []))
                             else:
                                 self.status_label.setText("登录状态验证失败")
                         except Exception as e:
                             print(f"验证登录状态失败: {e}")
+                        self.parent.warmup.schedule_login_warmup()
                     else:
                         self.status_label.setText("获取cookie失败")
                     QTimer.singleShot(1000, self.close)  # 1秒后关闭
@@ -1620,40 +5596,9 @@ class QRLoginWindow(QWidget):
             except Exception as e:
                 self.status_label.setText(f"检查登录状态失败: {str(e)}")
                 self.killTimer(self.check_timer)
-    
-    def paintEvent(self, event):
-        """绘制窗口背景和边框"""
-        painter = QPainter(self)
-        painter.setRenderHint(QPainter.Antialiasing)
-        
-        # 绘制半透明背景
-        painter.setBrush(QBrush(QColor(20, 20, 30, 220)))
-        painter.setPen(Qt.NoPen)
-        painter.drawRoundedRect(self.rect(), 20, 20)
-        
-        # 绘制边框
-        border_gradient = QLinearGradient(0, 0, self.width(), self.height())
-        border_gradient.setColorAt(0, QColor(0, 180, 255, 100))
-        border_gradient.setColorAt(1, QColor(0, 100, 255, 100))
-        
-        painter.setBrush(Qt.NoBrush)
-        painter.setPen(QColor(0, 180, 255, 80))
-        painter.drawRoundedRect(self.rect().adjusted(1, 1, -1, -1), 20, 20)
-
-    def mousePressEvent(self, event):
-        """鼠标按下事件(用于窗口拖动)"""
-        if event.button() == Qt.LeftButton:
-            self.drag_position = event.globalPosition().toPoint() - self.pos()
-            event.accept()
-
-    def mouseMoveEvent(self, event):
-        """鼠标移动事件(用于窗口拖动)"""
-        if event.buttons() & Qt.LeftButton and self.drag_position:
-            self.move(event.globalPosition().toPoint() - self.drag_position)
-            event.accept()
 
 
-class CookieInputDialog(QDialog):
+class CookieInputDialog(FramelessWindowMixin, QDialog):
     """自定义Cookie输入对话框"""
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -1669,26 +5614,11 @@ class CookieInputDialog(QDialog):
         
         # 标题
         title = QLabel("请输入网易云音乐Cookie:")
-        title.setStyleSheet("""
-            QLabel {
-                color: white;
-                font-size: 18px;
-                font-weight: bold;
-            }
-        """)
+        title.setProperty("role", "title")
         
         # 输入框
         self.text_edit = QTextEdit()
-        self.text_edit.setStyleSheet("""
-            QTextEdit {
-                background: rgba(255, 255, 255, 0.1);
-                border: 1px solid rgba(255, 255, 255, 0.2);
-                border-radius: 10px;
-                padding: 15px;
-                color: white;
-                font-size: 16px;
-            }
-        """)
+        self.text_edit.setProperty("role", "input")
         
         # 按钮布局
         btn_layout = QHBoxLayout()
@@ -1696,41 +5626,12 @@ class CookieInputDialog(QDialog):
         
         # 确认按钮
         btn_ok = QPushButton("确定")
-        btn_ok.setStyleSheet("""
-            QPushButton {
-                background: qlineargradient(
-                    x1:0, y1:0, x2:1, y2:0,
-                    stop:0 #00b4ff, stop:1 #0080ff
-                );
-                border-radius: 15px;
-                padding: 10px 20px;
-                color: white;
-                font-size: 16px;
-                font-weight: bold;
-            }
-            QPushButton:hover {
-                background: qlineargradient(
-                    x1:0, y1:0, x2:1, y2:0,
-                    stop:0 #00c4ff, stop:1 #0090ff
-                );
-            }
-        """)
+        btn_ok.setProperty("role", "primary")
         btn_ok.clicked.connect(self.accept)
         
         # 取消按钮
         btn_cancel = QPushButton("取消")
-        btn_cancel.setStyleSheet("""
-            QPushButton {
-                background: rgba(255, 255, 255, 0.1);
-                border-radius: 15px;
-                padding: 10px 20px;
-                color: white;
-                font-size: 16px;
-            }
-            QPushButton:hover {
-                background: rgba(255, 255, 255, 0.2);
-            }
-        """)
+        btn_cancel.setProperty("role", "secondary")
         btn_cancel.clicked.connect(self.reject)
         
         btn_layout.addWidget(btn_ok)
@@ -1743,36 +5644,9 @@ class CookieInputDialog(QDialog):
     def get_cookie(self):
         """获取输入的Cookie"""
         return self.text_edit.toPlainText().strip()
-    
-    def paintEvent(self, event):
-        """绘制窗口背景和边框"""
-        painter = QPainter(self)
-        painter.setRenderHint(QPainter.Antialiasing)
-        
-        # 绘制半透明背景
-        painter.setBrush(QBrush(QColor(20, 20, 30, 220)))
-        painter.setPen(Qt.NoPen)
-        painter.drawRoundedRect(self.rect(), 20, 20)
-        
-        # 绘制边框
-        painter.setBrush(Qt.NoBrush)
-        painter.setPen(QColor(0, 180, 255, 80))
-        painter.drawRoundedRect(self.rect().adjusted(1, 1, -1, -1), 20, 20)
-
-    def mousePressEvent(self, event):
-        """鼠标按下事件(用于窗口拖动)"""
-        if event.button() == Qt.LeftButton:
-            self.drag_position = event.globalPosition().toPoint() - self.pos()
-            event.accept()
-
-    def mouseMoveEvent(self, event):
-        """鼠标移动事件(用于窗口拖动)"""
-        if event.buttons() & Qt.LeftButton and self.drag_position:
-            self.move(event.globalPosition().toPoint() - self.drag_position)
-            event.accept()
 
 
-class ExitConfirmationWindow(QWidget):
+class ExitConfirmationWindow(FramelessWindowMixin, QWidget):
     """退出确认窗口"""
     def __init__(self, parent):
         super().__init__()
@@ -1789,23 +5663,12 @@ class ExitConfirmationWindow(QWidget):
         
         # 标题
         self.title_label = QLabel("退出确认")
-        self.title_label.setStyleSheet("""
-            QLabel {
-                color: white;
-                font-size: 18px;
-                font-weight: bold;
-            }
-        """)
+        self.title_label.setProperty("role", "title")
         self.title_label.setAlignment(Qt.AlignCenter)
         
         # 提示文本
         self.message_label = QLabel("确定要退出RTLite吗?")
-        self.message_label.setStyleSheet("""
-            QLabel {
-                color: white;
-                font-size: 16px;
-            }
-        """)
+        self.message_label.setProperty("role", "message")
         self.message_label.setAlignment(Qt.AlignCenter)
         
         # 按钮布局
@@ -1814,41 +5677,12 @@ class ExitConfirmationWindow(QWidget):
         
         # 确认按钮
         self.confirm_button = QPushButton("确定")
-        self.confirm_button.setStyleSheet("""
-            QPushButton {
-                background: qlineargradient(
-                    x1:0, y1:0, x2:1, y2:0,
-                    stop:0 #00b4ff, stop:1 #0080ff
-                );
-                border-radius: 15px;
-                padding: 10px 20px;
-                color: white;
-                font-size: 16px;
-                font-weight: bold;
-            }
-            QPushButton:hover {
-                background: qlineargradient(
-                    x1:0, y1:0, x2:1, y2:0,
-                    stop:0 #00c4ff, stop:1 #0090ff
-                );
-            }
-        """)
+        self.confirm_button.setProperty("role", "primary")
         self.confirm_button.clicked.connect(self.on_confirm)
         
         # 取消按钮
         self.cancel_button = QPushButton("取消")
-        self.cancel_button.setStyleSheet("""
-            QPushButton {
-                background: rgba(255, 255, 255, 0.1);
-                border-radius: 15px;
-                padding: 10px 20px;
-                color: white;
-                font-size: 16px;
-            }
-            QPushButton:hover {
-                background: rgba(255, 255, 255, 0.2);
-            }
-        """)
+        self.cancel_button.setProperty("role", "secondary")
         self.cancel_button.clicked.connect(self.close)
         
         self.button_layout.addWidget(self.confirm_button)
@@ -1857,39 +5691,12 @@ class ExitConfirmationWindow(QWidget):
         self.main_layout.addWidget(self.title_label)
         self.main_layout.addWidget(self.message_label)
         self.main_layout.addLayout(self.button_layout)
-    
-    def paintEvent(self, event):
-        """绘制窗口背景和边框"""
-        painter = QPainter(self)
-        painter.setRenderHint(QPainter.Antialiasing)
-        
-        # 绘制半透明背景
-        painter.setBrush(QBrush(QColor(20, 20, 30, 220)))
-        painter.setPen(Qt.NoPen)
-        painter.drawRoundedRect(self.rect(), 20, 20)
-        
-        # 绘制边框
-        painter.setBrush(Qt.NoBrush)
-        painter.setPen(QColor(0, 180, 255, 80))
-        painter.drawRoundedRect(self.rect().adjusted(1, 1, -1, -1), 20, 20)
 
     def on_confirm(self):
         """确认退出"""
         self.parent.close()
         self.close()
 
-    def mousePressEvent(self, event):
-        """鼠标按下事件(用于窗口拖动)"""
-        if event.button() == Qt.LeftButton:
-            self.drag_position = event.globalPosition().toPoint() - self.pos()
-            event.accept()
-
-    def mouseMoveEvent(self, event):
-        """鼠标移动事件(用于窗口拖动)"""
-        if event.buttons() & Qt.LeftButton and self.drag_position:
-            self.move(event.globalPosition().toPoint() - self.drag_position)
-            event.accept()
-
     def closeEvent(self, event):
         """关闭事件"""
         # 先关闭子窗口
@@ -1899,13 +5706,64 @@ class ExitConfirmationWindow(QWidget):
         event.accept()
 
 
+def parse_args(argv):
+    """解析命令行参数，未识别的参数交给Qt"""
+    parser = argparse.ArgumentParser(prog="RTLite")
+    parser.add_argument("--startup-trace", action="store_true", help="输出启动各阶段耗时")
+    parser.add_argument("--watchdog", action="store_true", help="检测界面卡顿并记录调用栈")
+    parser.add_argument("--trace-out", metavar="FILE", help="退出时导出Chrome trace并输出接口延迟统计")
+    parser.add_argument("--profile", choices=("cpu", "mem"), help="启动即开始性能分析，退出时输出结果")
+    parser.add_argument("--record", metavar="FILE", help="录制操作和接口响应，退出时写入FILE(用bench.replay回放)")
+    parser.add_argument("--api-url", metavar="URL", help="接口地址(默认https://ncm.zhenxin.me，测试时可指向本地替身)")
+    parser.add_argument("--no-gui", action="store_true", help="不创建窗口，只运行播放引擎，通过rtlitectl.py控制")
+    return parser.parse_known_args(argv)
+
+
+def run_headless(args, qt_args):
+    """无界面模式：播放引擎加IPC控制接口，Ctrl+C或quit命令退出"""
+    import signal
+    app = QCoreApplication(sys.argv[:1] + qt_args)
+    engine = PlayerEngine(args)
+    engine.message.connect(lambda text, msg_type: print(f"[{msg_type}] {text}"))
+    server = ControlServer(engine)
+    server.register("quit", lambda request: QTimer.singleShot(0, app.quit))
+    if not server.start():
+        return 1
+    engine.init_media()
+    QTimer.singleShot(0, engine.library.rescan)
+    QTimer.singleShot(0, engine.downloads.resume)
+    QTimer.singleShot(0, engine.history.load_async)  # 与界面模式相同，播放记录在已有热度上累加
+
+    # 事件循环中Python收不到信号，定时让解释器有机会处理Ctrl+C
+    signal.signal(signal.SIGINT, lambda *_: app.quit())
+    signal_timer = QTimer()
+    signal_timer.timeout.connect(lambda: None)
+    signal_timer.start(200)
+
+    print(f"RTLite无界面模式，控制地址: {control_address()}")
+    code = app.exec()
+    server.stop()
+    if args.trace_out:
+        METRICS.export_chrome_trace(args.trace_out)
+        print(METRICS.summary())
+    return code
+
+
 if __name__ == "__main__":
-    app = QApplication(sys.argv)
+    args, qt_args = parse_args(sys.argv[1:])
+    if args.no_gui:
+        sys.exit(run_headless(args, qt_args))
+    STARTUP_TRACE.enabled = args.startup_trace
+    STARTUP_TRACE.mark("imports")
+    app = QApplication(sys.argv[:1] + qt_args)
+    STARTUP_TRACE.mark("qapplication")
     
     # 设置应用程序字体
     font = QFont("Microsoft YaHei", 10)
     app.setFont(font)
+    app.setStyleSheet(APP_STYLESHEET)
     
-    player = ModernMusicPlayer()
+    player = ModernMusicPlayer(args)
+    STARTUP_TRACE.mark("main_window")
     player.show()
     sys.exit(app.exec())
@@ -0,0 +1,221 @@
+"""批量解析歌曲：把歌曲ID、歌曲链接或搜索关键词解析为详情、播放链接和歌词，逐行输出JSONL
+
+python rtlitebatch.py ids.txt -o songs.jsonl            # 中断后用同样的命令继续，已完成的行会跳过
+cat keywords.txt | python rtlitebatch.py - --fields detail,url
+python rtlitebatch.py ids.txt -o out.jsonl --concurrency 8 --rate 20
+
+输入每行一项：纯数字为歌曲ID，含song?id=的链接取其中的ID，其余按关键词搜索取第一首；
+空行和#开头的行忽略。详情和播放链接按批合并请求(逗号分隔的ID)，歌词逐首请求，
+所有请求共用一个速率限制。复用RTLite的接口层和缓存(与界面共享登录Cookie)。
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from threading import Lock
+
+from main import (
+    DEFAULT_API_URL, ApiClient, PlayerEngine, RateBudget, ResponseCache, compact_song, get_data_dir
+)
+
+SONG_LINK_PATTERN = re.compile(r"song\?id=(\d+)")
+FIELDS = ("detail", "url", "lyric")
+
+
+class RateGate:
+    """ApiClient的gate：所有工作线程共用一个请求速率"""
+    def __init__(self, requests_per_sec):
+        self.budget = RateBudget(1 << 40, requests_per_sec)
+        self.requests = 0
+        self.bytes = 0
+        self.lock = Lock()
+
+    def before_request(self):
+        self.budget.acquire_request(lambda: None)
+        with self.lock:
+            self.requests += 1
+
+    def consume_bytes(self, n):
+        with self.lock:
+            self.bytes += n
+
+
+def parse_item(line):
+    """输入行 -> ("id", 歌曲ID) / ("query", 关键词)，忽略的行返回None"""
+    line = line.strip()
+    if not line or line.startswith("#"):
+        return None
+    if line.isdigit():
+        return "id", int(line)
+    match = SONG_LINK_PATTERN.search(line)
+    if match:
+        return "id", int(match.group(1))
+    return "query", line
+
+
+def load_done(path):
+    """已输出的结果中成功的输入(用于中断后继续)；失败的行会重新解析"""
+    done = set()
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # 中断时写了一半的行
+                if "error" not in record:
+                    done.add(record["input"])
+    except FileNotFoundError:
+        pass
+    return done
+
+
+class BatchResolver:
+    """按批解析：关键词先逐个搜索，再对整批ID合并请求详情和播放链接"""
+    def __init__(self, api, gate, fields):
+        self.api = api
+        self.gate = gate
+        self.fields = fields
+
+    def search(self, keyword):
+        res = self.api.get_json("/search", params={"keywords": keyword, "limit": 1}, auth=True, gate=self.gate)
+        songs = res.get("result", {}).get("songs", [])
+        return songs[0]["id"] if songs else None
+
+    def resolve(self, items):
+        """解析一批输入，返回结果记录列表(顺序与输入相同)"""
+        records = []
+        ids = []
+        for raw, (kind, value) in items:
+            record = {"input": raw}
+            try:
+                song_id = self.search(value) if kind == "query" else value
+            except Exception as e:
+                record["error"] = f"搜索失败: {e}"
+                song_id = None
+            else:
+                if song_id is None:
+                    record["error"] = "未找到歌曲"
+            record["id"] = song_id
+            records.append(record)
+            if song_id is not None:
+                ids.append(song_id)
+
+        details, urls = {}, {}
+        batch_error = None
+        try:
+            # 详情、链接都缓存在ApiClient里，批量接口失败时整批记为失败
+            if "detail" in self.fields:
+                details = self.api.song_details(ids, gate=self.gate)
+            if "url" in self.fields:
+                urls = self.api.song_urls(ids, gate=self.gate)
+        except Exception as e:
+            batch_error = f"请求失败: {e}"
+
+        for record in records:
+            song_id = record["id"]
+            if song_id is None or "error" in record:
+                continue
+            if batch_error:
+                record["error"] = batch_error
+                continue
+            if "detail" in self.fields:
+                if song_id not in details:
+                    record["error"] = "无法获取歌曲详情"
+                    continue
+                record["detail"] = compact_song(details[song_id])
+            if "url" in self.fields:
+                record["url"] = urls.get(song_id)
+            if "lyric" in self.fields:
+                try:
+                    res = self.api.lyric(song_id, gate=self.gate)
+                    record["lyric"] = res.get("lrc", {}).get("lyric", "")
+                except Exception as e:
+                    record["error"] = f"歌词请求失败: {e}"
+        return records
+
+
+def read_items(source, done):
+    """读取输入并去掉已完成和重复的项，返回[(原始行, (类型, 值))]"""
+    items = []
+    seen = set(done)
+    for line in source:
+        parsed = parse_item(line)
+        raw = line.strip()
+        if parsed and raw not in seen:
+            seen.add(raw)
+            items.append((raw, parsed))
+    return items
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="rtlitebatch", description="批量解析歌曲详情、播放链接和歌词")
+    parser.add_argument("input", help="输入文件，-为标准输入")
+    parser.add_argument("-o", "--output", help="结果JSONL文件(追加写入，可中断后继续)；默认输出到标准输出")
+    parser.add_argument("--fields", default=",".join(FIELDS), help="要解析的内容，逗号分隔(detail,url,lyric)")
+    parser.add_argument("--batch-size", type=int, default=50, help="每批合并请求的歌曲数")
+    parser.add_argument("--concurrency", type=int, default=4, help="同时解析的批数")
+    parser.add_argument("--rate", type=float, default=10, help="每秒最多请求数(所有线程合计)")
+    parser.add_argument("--api-url", metavar="URL", help=f"接口地址(默认{DEFAULT_API_URL})")
+    args = parser.parse_args(argv)
+
+    fields = {field.strip() for field in args.fields.split(",") if field.strip()}
+    unknown = fields - set(FIELDS)
+    if unknown:
+        parser.error(f"未知字段: {', '.join(sorted(unknown))}")
+
+    done = load_done(args.output) if args.output else set()
+    if args.input == "-":
+        items = read_items(sys.stdin, done)
+    else:
+        with open(args.input, "r", encoding="utf-8") as f:
+            items = read_items(f, done)
+    if done:
+        print(f"跳过已完成的 {len(done)} 项", file=sys.stderr)
+
+    cookies = PlayerEngine.load_cookie()
+    cache = ResponseCache(os.path.join(get_data_dir(), "cache"))
+    api = ApiClient((args.api_url or DEFAULT_API_URL).rstrip("/"), cache, lambda: cookies)
+    gate = RateGate(args.rate)
+    resolver = BatchResolver(api, gate, fields)
+
+    out = open(args.output, "a", encoding="utf-8") if args.output else sys.stdout
+    batches = [items[i:i + args.batch_size] for i in range(0, len(items), args.batch_size)]
+    started = time.perf_counter()
+    resolved = failed = 0
+    pool = ThreadPoolExecutor(max_workers=max(1, args.concurrency))
+    try:
+        futures = [pool.submit(resolver.resolve, batch) for batch in batches]
+        for future in as_completed(futures):
+            # 每批完成即写出并刷新，中断时最多丢失正在进行的批
+            for record in future.result():
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                if "error" in record:
+                    failed += 1
+                else:
+                    resolved += 1
+            out.flush()
+            elapsed = time.perf_counter() - started
+            print(f"\r{resolved + failed}/{len(items)}  {(resolved + failed) / elapsed:.1f} 首/秒  "
+                  f"请求 {gate.requests}", end="", file=sys.stderr)
+    except KeyboardInterrupt:
+        pool.shutdown(wait=False, cancel_futures=True)
+        print("\n已中断，重新运行同样的命令可继续", file=sys.stderr)
+        return 130
+    finally:
+        pool.shutdown(wait=False)
+        if out is not sys.stdout:
+            out.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"\n完成 {resolved} 首，失败 {failed} 首，用时 {elapsed:.1f} s，"
+          f"{(resolved + failed) / max(elapsed, 1e-9):.1f} 首/秒，请求 {gate.requests} 次，"
+          f"{gate.bytes / 1024:.0f} KB", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
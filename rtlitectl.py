@@ -0,0 +1,141 @@
+"""RTLite命令行控制：通过本机IPC控制正在运行的RTLite(界面模式或--no-gui)
+
+python rtlitectl.py status
+python rtlitectl.py play --query 晴天       # 搜索并播放第一首
+python rtlitectl.py play --id 186016
+python rtlitectl.py pause | resume | toggle | next | show | quit
+python rtlitectl.py seek 90                # 跳到1:30，+10/-10为相对跳转
+python rtlitectl.py volume 60
+python rtlitectl.py search 晴天 --limit 5
+python rtlitectl.py download --queue        # 下载当前播放队列，也可用--id(可重复)或--query
+python rtlitectl.py downloads              # 下载任务统计
+
+只依赖标准库，便于在脚本和快捷键工具中调用。--json输出原始回复。
+"""
+import argparse
+import json
+import os
+import re
+import socket
+import sys
+import tempfile
+
+
+def control_address():
+    """与main.control_address()相同的地址规则"""
+    user = re.sub(r"\W", "", os.environ.get("USERNAME") or os.environ.get("USER") or "user")
+    if sys.platform == "win32":
+        return f"RTLite-{user}"
+    return os.path.join(tempfile.gettempdir(), f"RTLite-{user}.sock")
+
+
+def send(request, timeout=10):
+    """发送一个请求并返回回复(dict)"""
+    data = (json.dumps(request, ensure_ascii=False) + "\n").encode("utf-8")
+    address = control_address()
+    if sys.platform == "win32":
+        # QLocalServer在Windows上是命名管道
+        with open(rf"\\.\pipe\{address}", "r+b", buffering=0) as pipe:
+            pipe.write(data)
+            return json.loads(pipe.readline().decode("utf-8"))
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(address)
+        sock.sendall(data)
+        reply = b""
+        while not reply.endswith(b"\n"):
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            reply += chunk
+    return json.loads(reply.decode("utf-8"))
+
+
+def format_time(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 60:02d}:{seconds % 60:02d}"
+
+
+def print_status(status):
+    song = status["song"]
+    state = "播放中" if status["playing"] else "已暂停"
+    if song:
+        print(f"{state}: {song['name']} - {song['artist'] or '未知艺术家'}")
+        print(f"进度: {format_time(status['position'])} / {format_time(status['duration'])}")
+    else:
+        print("没有正在播放的歌曲")
+    queue = status["queue"]
+    print(f"音量: {status['volume']}%  队列: {queue['index'] + 1}/{queue['length']}")
+
+
+def build_request(args):
+    if args.cmd == "play":
+        request = {"cmd": "play"}
+        if args.id:
+            request["id"] = args.id
+        elif args.query:
+            request["query"] = args.query
+        return request
+    if args.cmd == "seek":
+        # +10/-10为相对当前位置，否则为绝对位置
+        if args.position[0] in "+-":
+            return {"cmd": "seek", "offset": float(args.position)}
+        return {"cmd": "seek", "position": float(args.position)}
+    if args.cmd == "volume":
+        return {"cmd": "volume", "value": args.value}
+    if args.cmd == "search":
+        return {"cmd": "search", "query": args.query, "limit": args.limit}
+    if args.cmd == "download":
+        return {"cmd": "download", "ids": args.id, "query": args.query, "queue": args.queue}
+    return {"cmd": args.cmd}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="rtlitectl", description="控制正在运行的RTLite")
+    parser.add_argument("--json", action="store_true", help="输出原始JSON回复")
+    commands = parser.add_subparsers(dest="cmd", required=True)
+    for name in ("status", "pause", "resume", "toggle", "next", "show", "quit", "downloads"):
+        commands.add_parser(name)
+    play = commands.add_parser("play", help="播放指定歌曲、搜索播放或继续播放")
+    play.add_argument("--id", help="歌曲ID")
+    play.add_argument("--query", help="搜索关键词，播放第一首")
+    seek = commands.add_parser("seek", help="跳转(秒)，+N/-N为相对跳转")
+    seek.add_argument("position")
+    volume = commands.add_parser("volume", help="设置音量(0-100)")
+    volume.add_argument("value", type=int)
+    search = commands.add_parser("search", help="搜索歌曲")
+    search.add_argument("query")
+    search.add_argument("--limit", type=int, default=10)
+    download = commands.add_parser("download", help="下载歌曲到本地")
+    download.add_argument("--id", action="append", default=[], help="歌曲ID(可重复)")
+    download.add_argument("--query", help="搜索关键词，下载第一首")
+    download.add_argument("--queue", action="store_true", help="下载当前播放队列")
+    args = parser.parse_args(argv)
+
+    try:
+        reply = send(build_request(args))
+    except (OSError, ValueError) as e:
+        print(f"无法连接RTLite({control_address()}): {e}", file=sys.stderr)
+        return 2
+
+    if args.json:
+        print(json.dumps(reply, ensure_ascii=False, indent=2))
+    elif not reply["ok"]:
+        print(f"错误: {reply['error']}", file=sys.stderr)
+    elif args.cmd == "search":
+        for song in reply["result"]:
+            print(f"{song['id']:>12}  {format_time(song['duration'])}  {song['name']} - {song['artist']}")
+    elif isinstance(reply["result"], dict) and "playing" in reply["result"]:
+        print_status(reply["result"])
+    elif args.cmd == "download":
+        print(f"已加入下载队列 {reply['result']['queued']} 首")
+    elif args.cmd == "downloads":
+        names = {"queued": "排队", "downloading": "下载中", "done": "已完成", "failed": "失败"}
+        print("  ".join(f"{names.get(state, state)} {n}" for state, n in reply["result"].items()) or "没有下载任务")
+    elif args.cmd not in ("quit", "show"):
+        print_status(send({"cmd": "status"})["result"])
+    return 0 if reply["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,41 @@
+"""测试公共设置：offscreen平台、独立的数据目录(关闭预热)、不可达的接口地址"""
+import json
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+OFFLINE_API_URL = "http://127.0.0.1:9"  # 意外发出的请求立即失败，不访问真实服务
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+os.environ["APPDATA"] = tempfile.mkdtemp(prefix="rtlite-test-")
+os.makedirs(os.path.join(os.environ["APPDATA"], "RTLite"))
+with open(os.path.join(os.environ["APPDATA"], "RTLite", "settings.json"), "w", encoding="utf-8") as f:
+    json.dump({"warmup_enabled": False}, f)
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(scope="session")
+def app():
+    from PySide6.QtWidgets import QApplication
+    import main
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    app.setStyleSheet(main.APP_STYLESHEET)
+    return app
+
+
+@pytest.fixture
+def player(app):
+    """显示出来的主窗口(跳过首帧后的初始化：不创建播放器、不启动热键和扫描)"""
+    import main
+    player = main.ModernMusicPlayer(main.parse_args(["--api-url", OFFLINE_API_URL])[0])
+    player.first_frame_shown = True
+    player.show()
+    app.processEvents()
+    yield player
+    player.close()
+    player.deleteLater()
+    app.sendPostedEvents()
+    app.processEvents()
@@ -0,0 +1,69 @@
+"""响度均衡：输出音量预留全库最大提升增益作为余量，用户音量100%时偏轻的歌相对偏响的歌变响"""
+import math
+
+import pytest
+
+from conftest import OFFLINE_API_URL
+
+SONGS = [("quiet", -24.0, 0.1), ("loud", -8.0, 1.0)]  # 歌曲ID, 积分响度(LUFS), 采样峰值
+
+
+class FakeAudioOutput:
+    def __init__(self):
+        self.volume = None
+
+    def setVolume(self, volume):
+        self.volume = volume
+
+
+@pytest.fixture
+def engine(app):
+    import main
+    engine = main.PlayerEngine(main.parse_args(["--api-url", OFFLINE_API_URL])[0])
+    engine.audio_output = FakeAudioOutput()
+    analyzer = engine.analyzer
+    with analyzer.lock:
+        analyzer.conn.executemany("INSERT OR REPLACE INTO loudness VALUES (?, ?, ?, 0)", SONGS)
+        analyzer.conn.commit()
+    analyzer.max_gain = None
+    yield engine
+    with analyzer.lock:
+        analyzer.conn.executemany("DELETE FROM loudness WHERE song_id = ?", [(song[0],) for song in SONGS])
+        analyzer.conn.commit()
+    engine.deleteLater()
+
+
+def played_level(engine, song_id):
+    """播放时的响度(LUFS) = 歌曲响度 + 输出音量(dB)"""
+    engine.update_gain({"id": song_id})
+    lufs = dict((song[0], song[1]) for song in SONGS)[song_id]
+    return lufs + 20 * math.log10(engine.audio_output.volume), engine.audio_output.volume
+
+
+def test_quiet_track_raised_at_full_volume(engine):
+    engine.set_volume(100)
+
+    engine.settings["loudness_normalization"] = False
+    quiet_off, _ = played_level(engine, "quiet")
+    loud_off, _ = played_level(engine, "loud")
+
+    engine.settings["loudness_normalization"] = True
+    quiet_on, quiet_volume = played_level(engine, "quiet")
+    loud_on, loud_volume = played_level(engine, "loud")
+
+    assert loud_off - quiet_off == pytest.approx(16.0)
+    # 偏轻的歌用满输出，偏响的歌让出余量，两首歌听起来一样响
+    assert quiet_volume == pytest.approx(1.0)
+    assert loud_volume < quiet_volume
+    assert quiet_on - loud_on == pytest.approx(0.0, abs=0.01)
+    assert quiet_on - loud_on > quiet_off - loud_off
+
+
+def test_output_volume_never_exceeds_user_volume(engine):
+    engine.set_volume(50)
+    for song_id, _, _ in SONGS:
+        _, volume = played_level(engine, song_id)
+        assert volume <= 0.5 + 1e-9
+    # 未分析的歌曲按已达到目标响度处理，同样扣除余量
+    engine.update_gain({"id": "unanalyzed"})
+    assert engine.audio_output.volume == pytest.approx(0.5 * 10 ** (-8 / 20))
@@ -0,0 +1,65 @@
+"""搜索结果窗口整个会话只创建一次，反复搜索后控件数和内存保持平稳"""
+import tracemalloc
+
+from PySide6.QtCore import QBuffer, QByteArray, QIODevice, QObject
+from PySide6.QtGui import QColor, QImage
+
+SEARCHES = 300
+WARMUP = 20
+
+
+class LocalCovers:
+    """只返回内存中封面数据的API替身"""
+    def __init__(self):
+        image = QImage(120, 120, QImage.Format_RGB32)
+        image.fill(QColor(40, 120, 200))
+        data = QByteArray()
+        buffer = QBuffer(data)
+        buffer.open(QIODevice.WriteOnly)
+        image.save(buffer, "PNG")
+        self.data = bytes(data)
+
+    def song_detail(self, song_id, gate=None):
+        return {"id": song_id, "al": {"picUrl": f"local://{song_id}"}}
+
+    def get_bytes(self, url, gate=None):
+        return self.data
+
+
+def songs(search, count=50):
+    return [{
+        "id": 300000 + search * count + i, "name": f"歌曲 {search}-{i}",
+        "ar": [{"name": f"歌手 {i % 7}"}], "al": {"name": f"专辑 {i}", "picUrl": f"local://{search}/{i}"},
+        "dt": 200000,
+    } for i in range(count)]
+
+
+def settle(app, window):
+    window.cover_loader.executor.submit(lambda: None).result()  # 等待已提交的封面加载
+    for _ in range(3):
+        app.processEvents()
+
+
+def test_search_window_reused_and_bounded(app, player):
+    window = player.get_search_window()
+    window.cover_loader.api = LocalCovers()
+    top_levels = len(app.topLevelWidgets())
+
+    for search in range(WARMUP):
+        player.show_search_results(songs(search))
+        settle(app, window)
+    children = len(window.findChildren(QObject))
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+
+    for search in range(WARMUP, WARMUP + SEARCHES):
+        player.show_search_results(songs(search))
+        settle(app, window)
+        assert player.search_window is window
+
+    grown = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    assert len(app.topLevelWidgets()) == top_levels
+    assert len(window.findChildren(QObject)) <= children + 5
+    assert len(window.cover_loader.pixmaps) <= window.cover_loader.cache_limit
+    assert grown < 1024 * 1024, f"{SEARCHES}次搜索后Python内存增长 {grown / 1024:.0f} KB"
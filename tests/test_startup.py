@@ -0,0 +1,60 @@
+"""启动路径(--startup-trace)：首帧之前不创建播放器、不加载重依赖，首帧时间在预算内
+
+在独立进程中启动，导入耗时和启动计时起点都与真实启动相同。开发机上首帧约150 ms，
+预算留出两倍多的余量；较慢的CI机器可用RTLITE_FIRST_FRAME_BUDGET_MS调整。
+"""
+import json
+import os
+import subprocess
+import sys
+
+from conftest import OFFLINE_API_URL, ROOT
+
+FIRST_FRAME_BUDGET_MS = float(os.environ.get("RTLITE_FIRST_FRAME_BUDGET_MS", 400))
+HEAVY_MODULES = ("PySide6.QtMultimedia", "numpy", "requests", "keyboard")
+
+# 与main.py入口相同的启动步骤；deferred_init只记录调用时机，不启动热键和播放器
+SCRIPT = r"""
+import json, sys
+import main
+from PySide6.QtWidgets import QApplication
+
+args, qt_args = main.parse_args(["--startup-trace", "--api-url", sys.argv[1]])
+main.STARTUP_TRACE.enabled = args.startup_trace
+main.STARTUP_TRACE.mark("imports")
+app = QApplication(sys.argv[:1] + qt_args)
+main.STARTUP_TRACE.mark("qapplication")
+app.setStyleSheet(main.APP_STYLESHEET)
+
+state = {}
+main.ModernMusicPlayer.deferred_init = lambda self: state.setdefault("deferred_after_first_frame", self.first_frame_shown)
+player = main.ModernMusicPlayer(args)
+main.STARTUP_TRACE.mark("main_window")
+state["media_before_show"] = player.media_player
+player.show()
+while not player.first_frame_shown:
+    app.processEvents()
+state["media_at_first_frame"] = player.media_player
+state["heavy_modules"] = sorted(name for name in sys.argv[2:] if name in sys.modules)
+while "deferred_after_first_frame" not in state:
+    app.processEvents()
+state["phases"] = {phase: (at - main.STARTUP_TRACE.begin) * 1000 for phase, at in main.STARTUP_TRACE.phases}
+print("STATE " + json.dumps(state))
+"""
+
+
+def test_first_frame_before_heavy_init():
+    output = subprocess.run([sys.executable, "-c", SCRIPT, OFFLINE_API_URL, *HEAVY_MODULES],
+                            capture_output=True, text=True, encoding="utf-8", errors="replace",
+                            cwd=ROOT, env=dict(os.environ, PYTHONPATH=ROOT), timeout=120)
+    lines = [line for line in output.stdout.splitlines() if line.startswith("STATE ")]
+    assert lines, output.stderr[-2000:]
+    state = json.loads(lines[-1][len("STATE "):])
+
+    assert state["media_before_show"] is None
+    assert state["media_at_first_frame"] is None
+    assert state["deferred_after_first_frame"] is True
+    assert state["heavy_modules"] == []
+    phases = state["phases"]
+    assert list(phases) == ["imports", "qapplication", "main_window", "first_frame"]
+    assert phases["first_frame"] < FIRST_FRAME_BUDGET_MS, f"首帧 {phases['first_frame']:.0f} ms"